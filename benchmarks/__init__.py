@@ -0,0 +1 @@
+"""Benchmarks for measuring performance changes. Not needed to run the program."""
@@ -0,0 +1,81 @@
+"""Benchmarks the parse pool on a corpus of saved zillow property pages.
+Runs every page through 1 worker, then doubles the workers up to the number of
+cores, printing pages per second and the speedup over 1 worker.
+
+Usage: python -m benchmarks.parsing <directory of .html pages> [max workers]
+Synthetic pages can be written with: python -m src.standin.corpus --pages DIR
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+from src.data.parse_pool import create_parse_pool, analyze_page, \
+    PARSE_WORKERS
+# Fixed so the benchmark doesn't need the network
+from src.standin.corpus import INTEREST_RATE, INTEREST_RATES
+
+
+def load_corpus(directory) -> list:
+    """Loads (url, page) for every .html file. The file name is the zpid."""
+
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as file:
+            page = file.read()
+        url = f"https://www.zillow.com/homedetails/{name[:-len('.html')]}/"
+        corpus.append((url, page))
+
+    return corpus
+
+
+def time_parse_pool(corpus, workers) -> float:
+    """Seconds to parse the whole corpus with the given number of workers"""
+
+    with create_parse_pool(INTEREST_RATE, workers=workers, offline=True,
+                           interest_rates=INTEREST_RATES) as pool:
+        # Start every worker before timing so startup isn't measured.
+        wait([pool.submit(time.sleep, 0.1) for _ in range(workers)])
+
+        start = time.perf_counter()
+        wait([pool.submit(analyze_page, url, page) for url, page in corpus])
+        return time.perf_counter() - start
+
+
+def worker_counts(max_workers) -> list:
+    """1, 2, 4, ... up to and including max_workers"""
+
+    counts = [1]
+    while counts[-1] * 2 < max_workers:
+        counts.append(counts[-1] * 2)
+    if max_workers > 1:
+        counts.append(max_workers)
+
+    return counts
+
+
+def main() -> None:
+    """Main function"""
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+
+    corpus = load_corpus(sys.argv[1])
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else PARSE_WORKERS
+    print(f"{len(corpus)} pages\n")
+    print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+
+    base = None
+    for workers in worker_counts(max_workers):
+        seconds = time_parse_pool(corpus, workers)
+        base = base or seconds
+        print(f"{workers:>8} {seconds:>9.2f} {len(corpus) / seconds:>9.1f} "
+              f"{base / seconds:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""Benchmark suite for the calculations, parsing, storage, an offline run and
+a run against the local stand-in server.
+Every case runs on the synthetic corpus in src/standin/corpus.py so results
+are comparable between runs and machines. Cases that touch output/ run in a
+temporary directory, the real output/ is never modified.
+
+Results are written as JSON and compared to a stored baseline. A case that is
+slower than its baseline by more than the threshold is a regression, which
+makes the command exit with 1.
+
+Usage: python -m benchmarks.suite [--quick] [--only CASE ...]
+                                  [--out FILE] [--baseline FILE]
+                                  [--save-baseline] [--threshold FRACTION]
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from src.data import user
+from src.data.archive import archive_page, LISTING, RATES
+from src.data.calculations import basic_calculations, mortgage_amortization, \
+    returns_analysis, break_even_analysis, calculate_analysis, \
+    write_property_analyses, dump_property_analyses, get_inputs, PropertyInfo
+from src.data.financing import evaluate_financing, get_best_financing
+from src.data.formulas import FORMULAS, amortization_table
+from src.data.graph import Evaluation
+from src.data.user import WebScraper
+from src.pipeline import run_pipeline
+from src.reparse import reparse_archive
+from src.standin.corpus import generate_corpus, generate_analyses, \
+    get_listing_url, get_scraped_facts, INTEREST_RATE, INTEREST_RATES
+from src.standin.pages import render_listing_page, render_rates_page
+from src.standin.server import StandIn, create_server
+from src.web import get_property_info
+from src.web.endpoints import ZILLOW_URL
+from src.web.get_current_interest_rates import InterestRates
+from src.web.get_property_info import set_page_property_info
+from src.web.property_keys import get_property_key_from_url
+from src.web.push_best_deals_to_email import _find_best_deals
+
+BASELINE_FILE = os.path.join('benchmarks', 'baseline.json')
+RESULTS_FILE = os.path.join('output', 'benchmark_results.json')
+REGRESSION_THRESHOLD = 0.2  # Fraction slower than the baseline
+DISTINCT_ANALYSES = 200  # Analyses calculated for the storage cases
+UPDATED_ANALYSES = 100  # Analyses written into the stored ones per run
+
+
+@dataclass
+class Sizes:
+    """How much work each case does. --quick uses QUICK_SIZES."""
+    repeat: int
+    properties: int
+    pages: int
+    stored_analyses: tuple
+    offline_run: int
+    pipeline_run: int
+
+
+FULL_SIZES = Sizes(repeat=5, properties=500, pages=200,
+                   stored_analyses=(1_000, 10_000, 100_000), offline_run=300,
+                   pipeline_run=200)
+QUICK_SIZES = Sizes(repeat=3, properties=50, pages=30,
+                    stored_analyses=(1_000, 10_000), offline_run=40,
+                    pipeline_run=30)
+
+
+def time_runs(run, repeat, setup=None) -> list:
+    """Seconds of every run. setup is called before each run, untimed."""
+
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    return seconds
+
+
+def result(seconds, items) -> dict:
+    """Record of a case. The fastest run is compared to the baseline since
+    it is the least affected by the rest of the machine.
+    """
+
+    return {
+        'seconds': min(seconds),
+        'median': statistics.median(seconds),
+        'runs': len(seconds),
+        'items': items,
+        'per_item_ms': min(seconds) / items * 1000
+    }
+
+
+def bench_amortization(sizes) -> dict:
+    """Amortization table of a single property.
+    Called directly since mortgage_amortization() is memoized.
+    """
+
+    _set_property(next(generate_corpus(1))[1])
+    monthly_payment = PropertyInfo.evaluation['monthly_payment']
+
+    def run():
+        amortization_table(PropertyInfo.interest_rate_monthly,
+                           PropertyInfo.months, PropertyInfo.loan,
+                           monthly_payment)
+
+    return result(time_runs(run, sizes.repeat * 4), 1)
+
+
+def bench_returns_analysis(sizes) -> dict:
+    """returns_analysis() of a single property, amortization already done.
+    Every run starts a new evaluation so nothing else is memoized.
+    """
+
+    _set_property(next(generate_corpus(1))[1])
+    inputs = dict(get_inputs(), amortization_table=mortgage_amortization())
+
+    def run():
+        for _ in range(100):
+            PropertyInfo.evaluation = Evaluation(FORMULAS, inputs)
+            returns_analysis()
+
+    return result(time_runs(run, sizes.repeat), 100)
+
+
+def bench_break_evens(sizes) -> dict:
+    """break_even_analysis() of a single property, starting a new evaluation
+    every run
+    """
+
+    _set_property(next(generate_corpus(1))[1])
+    inputs = get_inputs()
+
+    def run():
+        for _ in range(100):
+            PropertyInfo.evaluation = Evaluation(FORMULAS, inputs)
+            break_even_analysis()
+
+    return result(time_runs(run, sizes.repeat), 100)
+
+
+def bench_financing(sizes) -> dict:
+    """Every financing option of a single property and the best ones"""
+
+    _set_property(next(generate_corpus(1))[1])
+    InterestRates.interest_rates.update(INTEREST_RATES)
+    inputs = get_inputs()
+
+    def run():
+        for _ in range(100):
+            get_best_financing(*evaluate_financing(inputs))
+
+    return result(time_runs(run, sizes.repeat), 100)
+
+
+def bench_calculations_batch(sizes) -> dict:
+    """calculate_analysis() over many properties"""
+
+    corpus = [get_scraped_facts(facts)
+              for _, facts in generate_corpus(sizes.properties)]
+    WebScraper.interest_rate = INTEREST_RATE
+
+    def run():
+        for facts in corpus:
+            user.set_facts(facts)
+            calculate_analysis()
+
+    return result(time_runs(run, sizes.repeat), len(corpus))
+
+
+def bench_extraction(sizes) -> dict:
+    """Parsing a saved property page and extracting every value from it"""
+
+    pages = [(get_listing_url(ZILLOW_URL, zpid, facts),
+              render_listing_page(facts))
+             for zpid, facts in generate_corpus(sizes.pages)]
+    get_property_info.OFFLINE = True
+
+    def run():
+        for url, page in pages:
+            set_page_property_info(url=url, page=page)
+            user.set_info()
+
+    try:
+        return result(time_runs(run, sizes.repeat), len(pages))
+    finally:
+        get_property_info.OFFLINE = False
+
+
+def bench_write_property_analyses(sizes) -> dict:
+    """write_property_analyses() of a batch into every stored size.
+    Returns a record per size.
+    """
+
+    stored = _get_stored_analyses(max(sizes.stored_analyses))
+    keys = list(stored)
+
+    results = {}
+    for size in sizes.stored_analyses:
+        analysis_json = {key: stored[key] for key in keys[:size]}
+        updated_keys = keys[:UPDATED_ANALYSES]
+        updated = [{key: _with_new_price(stored[key])}
+                   for key in updated_keys]
+
+        with _temporary_output():
+            repeat = 1 if size >= 100_000 else sizes.repeat
+            seconds = time_runs(
+                lambda: write_property_analyses(updated_keys, updated),
+                repeat, setup=lambda: dump_property_analyses(analysis_json)
+            )
+        results[f"write_property_analyses_{size}"] = result(seconds, size)
+
+    return results
+
+
+def bench_find_best_deals(sizes) -> dict:
+    """_find_best_deals() from the deal index of every stored size, as
+    saved along with analysis.json. Returns a record per size.
+    """
+
+    stored = _get_stored_analyses(max(sizes.stored_analyses))
+    keys = list(stored)
+
+    results = {}
+    for size in sizes.stored_analyses:
+        analysis_json = {key: stored[key] for key in keys[:size]}
+        with _temporary_output():
+            dump_property_analyses(analysis_json)
+            seconds = time_runs(_find_best_deals, sizes.repeat)
+        results[f"find_best_deals_{size}"] = result(seconds, size)
+
+    return results
+
+
+def bench_offline_run(sizes) -> dict:
+    """Re-parsing an archive of pages into analysis.json, the whole path of a
+    run except the network. Includes starting the parse pool.
+    """
+
+    with _temporary_output():
+        urls = []
+        for zpid, facts in generate_corpus(sizes.offline_run):
+            url = get_listing_url(ZILLOW_URL, zpid, facts)
+            archive_page(LISTING, url, render_listing_page(facts),
+                         key=get_property_key_from_url(url))
+            urls.append(url)
+        # Only the properties in urls.json are re-parsed.
+        with open(os.path.join('output', 'urls.json'), 'w') as json_file:
+            json.dump({'Property': {url: [] for url in urls}}, json_file)
+        archive_page(RATES, 'rates',
+                     render_rates_page({'30-year fixed-rate': INTEREST_RATE}))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = time_runs(reparse_archive, sizes.repeat)
+
+    return result(seconds, sizes.offline_run)
+
+
+def bench_pipeline_run(sizes) -> dict:
+    """run_pipeline() fetching the corpus from the stand-in server, the whole
+    path of a run over a local network. Includes starting the parse pool.
+    """
+
+    server = create_server(StandIn(num_listings=sizes.pipeline_run), port=0)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    urls = [get_listing_url(base_url, zpid, facts)
+            for zpid, facts in generate_corpus(sizes.pipeline_run)]
+    WebScraper.interest_rate = INTEREST_RATE
+    InterestRates.interest_rates.update(INTEREST_RATES)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        with _temporary_output(), _county_office_at(base_url), \
+                contextlib.redirect_stdout(io.StringIO()):
+            seconds = time_runs(lambda: run_pipeline(urls), sizes.repeat,
+                                setup=_clear_output)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return result(seconds, len(urls))
+
+
+# Cases that return a single record, and cases that return a record per size
+CASES = {
+    'amortization': bench_amortization,
+    'returns_analysis': bench_returns_analysis,
+    'financing': bench_financing,
+    'break_evens': bench_break_evens,
+    'calculations_batch': bench_calculations_batch,
+    'extraction': bench_extraction,
+    'offline_run': bench_offline_run,
+    'pipeline_run': bench_pipeline_run
+}
+SIZED_CASES = {
+    'write_property_analyses': bench_write_property_analyses,
+    'find_best_deals': bench_find_best_deals
+}
+
+
+def run_suite(sizes, only=None) -> dict:
+    """Runs the cases, or only the named ones. Returns the results."""
+
+    results = {}
+    for name, case in {**CASES, **SIZED_CASES}.items():
+        if only and name not in only:
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        if name in SIZED_CASES:
+            results.update(case(sizes))
+        else:
+            results[name] = case(sizes)
+
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'cases': results
+    }
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD) -> list:
+    """Prints every case next to its baseline. Returns the regressed cases.
+    Compares the time per item so a --quick run can use a full baseline.
+    """
+
+    regressions = []
+    print(f"{'case':<34} {'ms/item':>10} {'baseline':>10} {'change':>8}")
+    for name, record in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            print(f"{name:<34} {record['per_item_ms']:>10.4f} {'-':>10} "
+                  f"{'new':>8}")
+            continue
+
+        change = record['per_item_ms'] / base['per_item_ms'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print(f"{name:<34} {record['per_item_ms']:>10.4f} "
+              f"{base['per_item_ms']:>10.4f} {change:>+8.1%}{flag}")
+
+    return regressions
+
+
+@functools.lru_cache(maxsize=1)
+def _get_stored_analyses(size) -> dict:
+    """Analyses of the corpus for the storage cases, calculated once"""
+    return generate_analyses(size, distinct=DISTINCT_ANALYSES)
+
+
+def _set_property(facts) -> None:
+    """Sets a property for the calculations"""
+
+    user.set_facts(get_scraped_facts(facts))
+    WebScraper.interest_rate = INTEREST_RATE
+    basic_calculations()
+
+
+def _with_new_price(property_analysis) -> dict:
+    """Copy of an analysis with a changed price, so it is always written"""
+
+    property_analysis = dict(property_analysis)
+    property_analysis['Property Info'] = dict(
+        property_analysis['Property Info'])
+    property_analysis['Property Info']['Price ($)'] += 1
+    return property_analysis
+
+
+@contextlib.contextmanager
+def _temporary_output():
+    """Runs in a temporary directory with an empty output/"""
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'output'))
+        os.chdir(directory)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+def _clear_output() -> None:
+    """Empties output/ so every run analyzes the properties anew"""
+
+    shutil.rmtree('output')
+    os.makedirs('output')
+
+
+@contextlib.contextmanager
+def _county_office_at(base_url):
+    """Looks up property taxes on base_url instead of the county office. The
+    environment variable is for parse pool workers that are spawned rather
+    than forked, which import the endpoints again.
+    """
+
+    variable = 'REAL_ESTATE_CALCULATOR_BOT_COUNTY_OFFICE_URL'
+    old_url, old_variable = get_property_info.COUNTY_OFFICE_URL, \
+        os.environ.get(variable)
+    get_property_info.COUNTY_OFFICE_URL = os.environ[variable] = base_url
+    try:
+        yield
+    finally:
+        get_property_info.COUNTY_OFFICE_URL = old_url
+        if old_variable is None:
+            del os.environ[variable]
+        else:
+            os.environ[variable] = old_variable
+
+
+def main() -> None:
+    """Parses arguments, runs the suite and compares to the baseline"""
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller sizes, skips 100k stored analyses')
+    parser.add_argument('--only', nargs='+', metavar='CASE',
+                        choices=list(CASES) + list(SIZED_CASES))
+    parser.add_argument('--out', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float,
+                        default=REGRESSION_THRESHOLD,
+                        help='fraction slower than the baseline that fails')
+    args = parser.parse_args()
+
+    results = run_suite(QUICK_SIZES if args.quick else FULL_SIZES, args.only)
+
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {}
+        print(f"No baseline at {args.baseline}, run with --save-baseline.")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressed more than "
+              f"{args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
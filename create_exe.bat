@@ -27,6 +27,15 @@ del %name%".spec"
 rmdir /s /q "__pycache__" "build"
 
 
+set name="Reparse Archive"
+set src="run_reparse_archive.py"
+
+venv\Scripts\pyinstaller.exe -F -n %name% -p "venv\Lib\site-packages" --distpath ./bin %src%
+
+del %name%".spec"
+rmdir /s /q "__pycache__" "build"
+
+
 set name="Print Single Property Analysis"
 set src="run_single_property_analysis_print_only.py"
 
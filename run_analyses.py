@@ -1,12 +1,17 @@
 """Main script to run"""
 
+import multiprocessing
+
 from src.analyses import main as main_
+from src.profiling import run_profiled
 
 
 def main():
-    """Main function"""
-    main_()
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
 
 
 if __name__ == '__main__':
+    # Parse pool workers of a frozen exe run this instead of main().
+    multiprocessing.freeze_support()
     main()
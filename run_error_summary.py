@@ -0,0 +1,28 @@
+"""Prints the scraper functions that failed the most and the most common
+errors from output/errors.jsonl, then how often each field was found.
+Useful to spot a zillow layout change.
+"""
+
+import argparse
+
+from src.data.error_log import print_error_summary, get_since
+from src.web.parser_health import print_parser_health
+
+
+def main():
+    """Main function"""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float,
+                        help='only errors in the last HOURS, default all')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='extractors and errors to list')
+    args = parser.parse_args()
+
+    since = get_since(args.hours) if args.hours is not None else None
+    print_error_summary(since=since, limit=args.limit)
+    print_parser_health()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""Evaluates every analyzed property for each investor profile in
+profiles.json and saves their deals to output/investor_analyses.json.
+Uses analysis.json, only the interest rates are requested.
+"""
+
+from src.investor_profiles import main as main_
+from src.profiling import run_profiled
+
+
+def main():
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
+
+
+if __name__ == '__main__':
+    main()
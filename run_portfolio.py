@@ -0,0 +1,16 @@
+"""Totals of buying the analyzed properties of a saved search or a tag
+together, such as capital required, cashflow and loan balance over time.
+Pass --what-if to buy, sell and change assumptions from the terminal.
+"""
+
+from src.portfolio import main as main_
+from src.profiling import run_profiled
+
+
+def main():
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
+
+
+if __name__ == '__main__':
+    main()
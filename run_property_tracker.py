@@ -1,11 +1,12 @@
 """Use before analyses.py to choose urls."""
 
 from src.property_tracker import main as main_
+from src.profiling import run_profiled
 
 
 def main():
-    """Main function"""
-    main_()
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,17 @@
+"""Recalculates every analysis from the facts already scraped, under the
+current values.py and interest rate. No property page is requested.
+Pass --rate to use that interest rate, --no-save to only see how the deals
+would change.
+"""
+
+from src.reanalyze import main as main_
+from src.profiling import run_profiled
+
+
+def main():
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,25 @@
 """This allows refreshing the listings from all the search URLs without requiring user input. Useful for automation."""
 
+import multiprocessing
+
 from src.analyses import main as run
+from src.profiling import run_profiled
 from src.property_tracker import add_link
 
 
-def main() -> None:
-    """Main function"""
+def refresh_and_analyze() -> None:
+    """Refreshes the listings then analyzes them"""
 
     add_link(refresh_no_input=True)
     run()
 
 
+def main() -> None:
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(refresh_and_analyze)
+
+
 if __name__ == '__main__':
+    # Parse pool workers of a frozen exe run this instead of main().
+    multiprocessing.freeze_support()
     main()
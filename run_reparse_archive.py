@@ -0,0 +1,19 @@
+"""Re-analyzes every property from the pages archived in output/archive.
+No pages are downloaded. Useful after a scraper was fixed for a zillow change.
+"""
+
+import multiprocessing
+
+from src.reparse import main as main_
+from src.profiling import run_profiled
+
+
+def main():
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(main_)
+
+
+if __name__ == '__main__':
+    # Parse pool workers of a frozen exe run this instead of main().
+    multiprocessing.freeze_support()
+    main()
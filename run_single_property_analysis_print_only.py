@@ -2,19 +2,26 @@
 Useful if only need to check a single property.
 """
 
-from src.data import update_values, print_property_info, \
-    print_analysis, print_sql_amortization_table
+from src.data.calculations import update_values, print_property_info, \
+    print_analysis, print_financing, print_sql_amortization_table
+from src.profiling import run_profiled
 
 
-def main() -> None:
-    """Main function"""
+def print_single_property() -> None:
+    """Analyzes the property entered by the user and prints it"""
 
     update_values(save_to_file=False)
     print_sql_amortization_table()
     print_property_info()
     print_analysis()
+    print_financing()
     input('Press Enter to close program...')
 
 
+def main() -> None:
+    """Main function. Pass --profile to profile the run."""
+    run_profiled(print_single_property)
+
+
 if __name__ == '__main__':
     main()
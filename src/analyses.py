@@ -9,25 +9,28 @@ Then program gets the info for all houses in the 'Property' object.
 import json
 import os.path
 import time
+from datetime import datetime
 from dataclasses import dataclass
 
-from src.data.calculations import update_values, get_property_analysis, \
-    write_property_analyses, is_new_analyses
+from src.data.calculations import is_new_analyses, \
+    load_property_analyses, dump_property_analyses
 from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
+from src.data.error_log import print_error_summary
+from src.data.facts import load_facts, dump_facts
 from src.data.user import set_interest_rate
+from src.investor_profiles import run_profiles
+from src.metrics import reset, write_metrics, print_summary
+from src.pipeline import run_pipeline
 from src.property_tracker import EXIT_TIMER
-from src.web.get_property_info import TIME_BETWEEN_REQUESTS
+from src.web.parser_health import save_parser_health, print_parser_health
+from src.web.property_keys import coalesce_urls, migrate_legacy_keys
 from src.web.push_best_deals_to_email import email_best_deals
 
-GET_REQUEST_EXPECTED_TIME = 1.5
-
 
 @dataclass
 class State:
     """Stores the state of the analysis"""
 
-    keys: list
-    property_analyses: list
     url_removed: bool
 
 
@@ -36,70 +39,42 @@ def _get_interest_rate() -> None:
     set_interest_rate()
 
 
-def _analyze_property(state, url) -> None:
-    """Analyze a single property"""
+def _analyze_properties(state, urls_json) -> None:
+    """Gets info for all properties and saves them to analysis.json"""
 
-    # If statement ignores property if there was an error getting the data.
-    if update_values(url=url, save_to_file=False, update_interest_rate=False):
-        print()  # Moves to next line
-        key, property_analysis = get_property_analysis()
-        state.keys.append(key)
-        state.property_analyses.append(property_analysis)
-    else:
-        print(f" {BAD}!!! ERROR ANALYZING THIS PROPERTY. "
-              f"CHECK \\output\\errors.log FOR DETAILS. !!!{END}"
-              )
+    # Individually added properties go first, then those from search urls.
+    urls = list(urls_json.setdefault('Property', dict()))
+    for search_url in urls_json.setdefault('Search', dict()):
+        urls += urls_json['Search'][search_url]
+    _migrate_legacy_keys(urls)
 
-    time.sleep(TIME_BETWEEN_REQUESTS)
+    # The same property can be in several searches or under a different url.
+    urls, num_duplicates = coalesce_urls(urls)
+    if num_duplicates:
+        print(f"{OK}--- Skipping {GOOD}{num_duplicates}{OK} duplicate "
+              f"property URLs...{END}")
 
+    # The time remaining is reported as it goes, from the measured throughput.
+    print(f"{OK}--- Analyzing {GOOD}{len(urls)}{OK} properties...{END}\n")
 
-def _analyze_properties(state, urls_json) -> None:
-    """Gets info for all properties and saves them to analysis.json"""
+    is_new_analyses().clear()
+    run_pipeline(urls, skipped=num_duplicates)
 
-    # Tell user how long analysis is expected to take
-    num_property_urls = len(urls_json.setdefault('Property', dict()))
-    num_search_urls = 0
-    for search_url in urls_json.setdefault('Search', dict()):
-        num_search_urls += len(urls_json['Search'][search_url])
-    num_urls = num_search_urls + num_property_urls
-    TIME_CONST = GET_REQUEST_EXPECTED_TIME + TIME_BETWEEN_REQUESTS
-    expected_time = int(num_urls * TIME_CONST)
-    index = 0
-    print(f"{OK}--- Analyzing properties... Expected duration: {GOOD}"
-          f"{expected_time}s{END}\n"
-          )
-
-    # Gets analysis and writes to file for the individually added properties
-    for url in urls_json.setdefault('Property', dict()):
-        print(f"{OK}TIME REMAINING: "
-              f"{GOOD}{-int(-(expected_time - index * TIME_CONST))}s{END}",
-              "---", url, end=""
-              )
-        _analyze_property(state, url)
-        index += 1
-    write_property_analyses(state.keys, state.property_analyses)
+    _check_if_analysis_json_updated(state)
 
-    # If above changed the file, save that fact to print closing text.
-    if any(is_new_analyses()) or state.url_removed:
-        updated = True
-    else:
-        updated = False
 
-    # Could just call write_property_analyses() once after loops,
-    # but want to separate these to act like a save point.
-    state.keys.clear(), state.property_analyses.clear()
-    for search_url in urls_json.setdefault('Search', dict()):
-        for url in urls_json['Search'][search_url]:
-            print(f"{OK}TIME REMAINING: "
-                  f"{GOOD}{-int(-(expected_time - index * TIME_CONST))}s{END}",
-                  "---", url, end=""
-                  )
-            _analyze_property(state, url)
-            index += 1
-    write_property_analyses(state.keys, state.property_analyses)
+def _migrate_legacy_keys(urls) -> None:
+    """Moves analyses and facts of urls stored under their legacy keys, see
+    property_keys.py, so they aren't analyzed again as new properties
+    """
+
+    analysis_json = load_property_analyses()
+    if migrate_legacy_keys(analysis_json, urls):
+        dump_property_analyses(analysis_json)
 
-    if updated:
-        _check_if_analysis_json_updated(state, check=True)
+    facts_json = load_facts()
+    if migrate_legacy_keys(facts_json, urls):
+        dump_facts(facts_json)
 
 
 def _check_if_analysis_json_updated(state, check=False) -> None:
@@ -118,8 +93,6 @@ def main() -> None:
     """Main function"""
 
     state = State(
-        keys=[],
-        property_analyses=[],
         url_removed=False
     )
 
@@ -127,9 +100,19 @@ def main() -> None:
         with open(os.path.join('output', 'urls.json')) as json_file:
             urls_json = json.load(json_file)
 
+        reset()
+        started = datetime.now().isoformat(timespec='seconds')
         _get_interest_rate()
         _analyze_properties(state, urls_json)
         email_best_deals()
+        write_metrics()
+        print_summary()
+        print_parser_health(save_parser_health())
+        print_error_summary(since=started)
+        try:
+            run_profiles()
+        except ValueError as error:
+            print(f"\n{BAD}!!! Investor profiles skipped: {error} !!!{END}")
 
     except FileNotFoundError:
         print(f"\n{BAD}!!! Error: No URLs exist... !!!{END}")
@@ -0,0 +1,110 @@
+"""Which deals were already emailed, so a run only emails what changed.
+
+output/alert_state.json has the price and Cash on Cash Return of every
+property when it was last alerted. A deal is alerted when it is new, when it
+crossed back above MINIMUM_ConC_PERCENT, when its price dropped or when its
+return improved by enough. A deal stays alerted until its return falls
+HYSTERESIS_PERCENT below the threshold, so a property hovering around the
+threshold isn't emailed again every time it crosses it.
+
+Alerts are found from the deal index, only the deals above the threshold and
+the properties already alerted are looked at.
+"""
+
+import json
+import os.path
+from dataclasses import dataclass
+from datetime import datetime
+
+from values import MINIMUM_ConC_PERCENT
+
+ALERT_STATE_FILE = os.path.join('output', 'alert_state.json')
+HYSTERESIS_PERCENT = 1  # ConC below the threshold a deal must fall to reset
+MIN_PRICE_DROP = 0.01  # Fraction the price must drop by to alert again
+MIN_IMPROVEMENT_PERCENT = 2  # ConC gain since last alerted to alert again
+
+# Reasons for an alert
+NEW, CROSSED, PRICE_DROP, IMPROVED = 'new', 'back above threshold', \
+    'price drop', 'improved'
+
+
+@dataclass
+class Alert:
+    """A deal to email and why"""
+    key: str
+    score: float
+    analysis: dict
+    reason: str
+
+
+def load_alert_state() -> dict:
+    """Key: price, score, when it was alerted and if it is still a deal"""
+
+    try:
+        with open(ALERT_STATE_FILE) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_alert_state(state) -> None:
+    """Overwrites ALERT_STATE_FILE"""
+
+    temp_path = f"{ALERT_STATE_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(state, file, indent=4)
+    os.replace(temp_path, ALERT_STATE_FILE)
+
+
+def get_alerts(deal_index, state) -> list:
+    """Deals in the index that should be emailed, best first.
+    Updates state for properties that are no longer deals.
+    """
+
+    alerts = []
+    for key, analysis in deal_index['deals'].items():
+        score = deal_index['scores'][key]
+        reason = _get_reason(state.get(key), score, analysis)
+        if reason is not None:
+            alerts.append(Alert(key, score, analysis, reason))
+
+    # Deals alerted before that aren't above the threshold anymore
+    for key in list(state):
+        if key in deal_index['deals']:
+            continue
+        score = deal_index['scores'].get(key)
+        if score is None:  # No longer analyzed
+            del state[key]
+        elif score < MINIMUM_ConC_PERCENT - HYSTERESIS_PERCENT:
+            state[key]['active'] = False
+
+    alerts.sort(key=lambda alert: alert.score, reverse=True)
+    return alerts
+
+
+def mark_alerted(state, alerts) -> None:
+    """Records alerts as sent"""
+
+    now = datetime.now().isoformat(timespec='seconds')
+    for alert in alerts:
+        state[alert.key] = {
+            'price': alert.analysis['Property Info']['Price ($)'],
+            'score': alert.score,
+            'alerted_at': now,
+            'active': True
+        }
+
+
+def _get_reason(alerted, score, analysis):
+    """Why a deal should be alerted, None if it shouldn't be"""
+
+    if alerted is None:
+        return NEW
+    if not alerted['active']:
+        return CROSSED
+    if analysis['Property Info']['Price ($)'] \
+            <= alerted['price'] * (1 - MIN_PRICE_DROP):
+        return PRICE_DROP
+    if score >= alerted['score'] + MIN_IMPROVEMENT_PERCENT:
+        return IMPROVED
+    return None
@@ -0,0 +1,105 @@
+"""Compressed archive of every page fetched from the web.
+
+Pages are stored once per unique content under output/archive/objects, named
+by their sha256. output/archive/index.jsonl has a line per fetch with the
+property key, url, kind of page and fetch time. This allows re-parsing every
+property after fixing a scraper without downloading anything again.
+Uses zstd if the zstandard package is installed, otherwise gzip.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from src.metrics import timed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_PAGES = True
+ARCHIVE_DIR = os.path.join('output', 'archive')
+INDEX_FILE = os.path.join(ARCHIVE_DIR, 'index.jsonl')
+
+# Kinds of pages that are archived
+LISTING, TAX, SEARCH, RATES = 'listing', 'tax', 'search', 'rates'
+
+_index_lock = threading.Lock()
+
+
+@timed('persist_seconds', store='archive', operation='dump')
+def archive_page(kind, url, page, key=None) -> None:
+    """Stores page in the archive if it isn't already and indexes the fetch"""
+
+    if not ARCHIVE_PAGES or not page:
+        return
+
+    data = page.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+    codec = 'zstd' if zstandard else 'gzip'
+    path = _get_object_path(sha256, codec)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zstandard.ZstdCompressor().compress(data) if zstandard \
+            else gzip.compress(data)
+
+        # Written under a temporary name so a crash never leaves half a page.
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(compressed)
+        os.replace(temp_path, path)
+
+    entry = {'key': key, 'url': url, 'kind': kind, 'sha256': sha256,
+             'codec': codec, 'fetched': time.time()}
+    with _index_lock:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        with open(INDEX_FILE, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+
+
+def read_page(entry) -> str:
+    """Gets the page of an index entry from the archive"""
+
+    with open(_get_object_path(entry['sha256'], entry['codec']), 'rb'
+              ) as file:
+        data = file.read()
+
+    if entry['codec'] == 'zstd':
+        if zstandard is None:
+            raise ImportError("The zstandard package is needed to read pages "
+                              "archived with zstd.")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return gzip.decompress(data).decode('utf-8')
+
+
+def get_latest_entries(kind) -> dict:
+    """Most recent index entry of the given kind for each key"""
+
+    latest = {}
+    try:
+        with open(INDEX_FILE) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:  # Line cut off by a crash
+                    continue
+                if entry['kind'] == kind and entry['fetched'] >= \
+                        latest.get(entry['key'], entry)['fetched']:
+                    latest[entry['key']] = entry
+    except FileNotFoundError:
+        pass
+
+    return latest
+
+
+def _get_object_path(sha256, codec) -> str:
+    """Path of an archived page, split in folders by the start of its hash"""
+
+    extension = 'zst' if codec == 'zstd' else 'gz'
+    return os.path.join(ARCHIVE_DIR, 'objects', sha256[:2],
+                        f"{sha256}.html.{extension}")
@@ -0,0 +1,135 @@
+"""Calculates the returns of many properties under many sets of assumptions at
+once with numpy, instead of one property at a time like calculations.py.
+
+The FORMULAS graph is evaluated on arrays with a row per set of assumptions
+and a column per property, so a single evaluate() covers every property for
+every investor profile. Instead of the whole amortization table, the year of
+principal paid down comes from its closed form. The results are the same as
+returns_analysis() gives.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.data import user
+from src.data.calculations import PropertyInfo, format_returns, \
+    format_break_evens, set_property_info, get_property_analysis
+from src.data.financing import evaluate_financing, get_best_financing
+from src.data.formulas import FORMULAS, RETURNS, ASSUMPTIONS, BREAK_EVENS, \
+    get_loan_fees
+from src.data.graph import Evaluation
+from src.data.user import WebScraper, UserValues
+from src.web.get_property_info import set_property_urls
+from values import MINIMUM_ConC_PERCENT
+
+
+@dataclass
+class PropertyBatch:
+    """Scraped values of many properties, an element per property"""
+    keys: list
+    urls: list
+    price: np.ndarray
+    property_taxes: np.ndarray
+    num_units: np.ndarray
+    rent_per_unit: np.ndarray
+
+
+def get_property_batch(facts_json) -> PropertyBatch:
+    """Batch of the properties in facts_json, from src/data/facts.py"""
+
+    keys = list(facts_json)
+    facts = [facts_json[key]['facts'] for key in keys]
+    return PropertyBatch(
+        keys,
+        [facts_json[key]['url'] for key in keys],
+        *(np.array([values[name] for values in facts], dtype=float)
+          for name in ('price', 'property_taxes', 'num_units',
+                       'rent_per_unit'))
+    )
+
+
+def evaluate(batch, assumptions) -> Evaluation:
+    """Evaluation of FORMULAS for every property under every set of
+    assumptions. assumptions is a list of dicts of ASSUMPTIONS along with
+    'interest_rate'. Every metric but amortization_table can be read from it,
+    as an array broadcastable to shape (assumptions, properties).
+    """
+
+    evaluation = Evaluation(FORMULAS, get_batch_inputs(batch, assumptions))
+
+    # Closed form of the balance after the first 12 payments
+    rate = evaluation['interest_rate_monthly']
+    loan = evaluation['loan']
+    growth_year = (1 + rate) ** 12
+    balance = loan * growth_year \
+        + evaluation['monthly_payment'] * (growth_year - 1) / rate
+    evaluation.set('principal_paydown', loan - balance)
+
+    return evaluation
+
+
+def get_batch_inputs(batch, assumptions) -> dict:
+    """Inputs of FORMULAS, a row per set of assumptions and a column per
+    property. The fees come from the loan type of each set.
+    """
+
+    assumptions = [{**values, **get_loan_fees(values['loan_type'])}
+                   for values in assumptions]
+    inputs = {name: np.array([values[name] for values in assumptions],
+                             dtype=float)[:, np.newaxis]
+              for name in assumptions[0] if name != 'loan_type'}
+    for name in ('price', 'property_taxes', 'num_units', 'rent_per_unit'):
+        inputs[name] = getattr(batch, name)[np.newaxis, :]
+    return inputs
+
+
+def get_user_assumptions() -> dict:
+    """Assumptions of UserValues, the interest rate of the session and
+    MINIMUM_ConC_PERCENT
+    """
+
+    assumptions = {name: getattr(UserValues, name) for name in ASSUMPTIONS}
+    assumptions['interest_rate'] = WebScraper.interest_rate
+    assumptions['minimum_conc_percent'] = MINIMUM_ConC_PERCENT
+    return assumptions
+
+
+def analyze_batch(facts_json) -> dict:
+    """Analysis of every property in facts_json under the current UserValues
+    and interest rate, as in analysis.json. Only formatting them is done a
+    property at a time.
+    """
+
+    batch = get_property_batch(facts_json)
+    if not batch.keys:
+        return {}
+    assumptions = [get_user_assumptions()]
+    evaluation = evaluate(batch, assumptions)
+    financing = evaluate_financing(get_batch_inputs(batch, assumptions))
+    shape = (1, len(batch.keys))
+    columns = {name: np.broadcast_to(evaluation[name], shape)[0]
+               for name in ('loan', 'property_taxes_monthly', 'insurance_cost',
+                            'monthly_payment', *RETURNS.values(),
+                            *BREAK_EVENS.values())}
+
+    analyses = {}
+    for column, key in enumerate(batch.keys):
+        record = facts_json[key]
+        user.set_facts(record['facts'])
+        set_property_urls(record['url'], record['url_property_taxes'])
+        for name in ('loan', 'property_taxes_monthly', 'insurance_cost'):
+            setattr(PropertyInfo, name, float(columns[name][column]))
+        PropertyInfo.amortization_table = {
+            'Monthly Payment': [float(columns['monthly_payment'][column])]}
+        PropertyInfo.analysis = format_returns({
+            name: float(columns[metric][column])
+            for name, metric in RETURNS.items()})
+        PropertyInfo.break_evens = format_break_evens({
+            name: float(columns[metric][column])
+            for name, metric in BREAK_EVENS.items()})
+        PropertyInfo.financing = get_best_financing(*financing, column)
+        set_property_info()
+        analyses.update(get_property_analysis()[1])
+
+    return analyses
@@ -1,18 +1,29 @@
-"""Hub for all the calculations needed"""
+"""Hub for all the calculations needed.
+The formulas themselves are in formulas.py.
+"""
 
 import json
+import math
 import os.path
 from dataclasses import dataclass
-from traceback import format_tb
-
-import numpy_financial as npf
 
 from src.data import user
 from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
 from src.data.database import amortization_table, drop_amortization_table, \
     create_amortization_table, add_amortization_data, get_amortization_table
+from src.data.deal_index import mark_changed, update_deal_index, \
+    save_deal_index
+from src.data.error_log import log_error
+from src.data.financing import evaluate_financing, get_best_financing, \
+    format_option
+from src.data.formulas import FORMULAS, RETURNS, ASSUMPTIONS, SCRAPED, \
+    BREAK_EVENS, get_loan_fees
+from src.data.graph import Evaluation
 from src.data.user import WebScraper, UserValues
+from src.metrics import timer, timed
 from src.web.get_property_info import set_page_property_info, get_url
+from src.web.property_keys import get_property_key_from_url
+from values import MINIMUM_ConC_PERCENT
 
 
 @dataclass
@@ -27,20 +38,27 @@ class PropertyInfo:
     amortization_table: dict
     analysis: dict
     property_info: dict
+    evaluation: Evaluation  # Of FORMULAS for the current property
+    financing_options: tuple  # From financing.evaluate_financing()
+    financing: dict
+    break_evens: dict
     estimations = {}
     new_analysis_list = []
 
 
 def update_values(url=None,
                   save_to_file=True,
-                  update_interest_rate=True
+                  update_interest_rate=True,
+                  page=None
                   ) -> bool:
-    """Updates the values when a new property is being evaluated."""
+    """Updates the values when a new property is being evaluated.
+    Pass page if the property page was already fetched.
+    """
 
     # These are what gets the html pages
     if update_interest_rate:
         user.set_interest_rate()
-    set_page_property_info(url=url)
+    set_page_property_info(url=url, page=page)
 
     # Logs errors if there are any and stop analysis of this specific
     # property ONLY.
@@ -50,49 +68,50 @@ def update_values(url=None,
 
     # THE GOAL IS FOR THIS BLOCK TO NEVER BE EXECUTED.
     # IF IT DOES, THE PROGRAM STOPS THE ANALYSIS FOR THIS SPECIFIC PROPERTY.
-    # This logs the error to ..\output\errors.log, what ever it is.
-    # Complete with the problematic property url, traceback,
-    # and type of exception.
+    # This logs the error to ..\output\errors.jsonl, what ever it is.
+    # Complete with the problematic property url, the scraper function that
+    # failed, traceback and type of exception.
     except Exception as exception:
-        exception_name = exception.__class__.__qualname__
-
-        extra = ""
-        if exception_name == 'AttributeError':
-            extra = "--- (IS THE PROPERTY OFF MARKET? IF SO YOU CAN DELETE " \
-                    "THE URL IF IT WAS INDIVIDUALLY ADDED TO PROPERTY URLs. " \
-                    "IF IT WAS ADDED BY A SEARCH URL, IGNORE THIS PROPERTY " \
-                    "INSTEAD. FOR EITHER OPTION, " \
-                    "RUN property_tracker.py.)---"
-
         # When printing analysis of a single property, url=None.
         # This allows that URL to be saved as well.
         if not url:
             url = get_url()
+        log_error(url, exception)
 
-        # Get exception name as well as traceback info for easy debugging.
-        tb_title = "Traceback (most recent call last):"
-        traceback = format_tb(exception.__traceback__)
-        tb_string = ""
-        for tb in traceback:
-            tb_string += tb
+        # Ends current analysis
+        return False
 
-        # "###" can be used to navigate between errors in log file.
-        error = f"### {url}: [\n" \
-                f"{tb_title}\n" \
-                f"{tb_string}" \
-                f"{exception_name}: {exception}\n" \
-                f"]{extra}\n\n"
+    calculate_analysis()
 
-        with open(os.path.join('output', 'errors.log'), 'a') as file:
-            file.write(error)
+    if save_to_file:
+        save_analysis()
+
+    return True
+
+
+def calculate_analysis() -> None:
+    """Calculates the analysis from the values set by user.set_info()"""
+
+    with timer('calculation_seconds', step='basic'):
+        basic_calculations()
+    with timer('calculation_seconds', step='amortization'):
+        PropertyInfo.amortization_table = mortgage_amortization()
+    with timer('calculation_seconds', step='returns'):
+        PropertyInfo.analysis = returns_analysis()
+    with timer('calculation_seconds', step='break_even'):
+        PropertyInfo.break_evens = break_even_analysis()
+    with timer('calculation_seconds', step='financing'):
+        PropertyInfo.financing_options = evaluate_financing(get_inputs())
+        PropertyInfo.financing = get_best_financing(
+            *PropertyInfo.financing_options)
+    set_property_info()
 
-        # Ends current analysis
-        return False
 
-    basic_calculations()
+def set_property_info() -> None:
+    """Sets the property info saved along with the analysis, from the values
+    the calculations set in PropertyInfo
+    """
 
-    PropertyInfo.amortization_table = mortgage_amortization()
-    PropertyInfo.analysis = returns_analysis()
     PropertyInfo.property_info = {
         "Address": WebScraper.address,
         "Price ($)": WebScraper.price,
@@ -131,191 +150,78 @@ def update_values(url=None,
     #     if not found:
     #         PropertyInfo.estimations[key] = value
 
-    if save_to_file:
-        save_analysis()
 
-    return True
+def basic_calculations() -> None:
+    """Starts evaluating FORMULAS for the values set by user.set_info() and
+    sets the basic values module wide
+    """
 
+    PropertyInfo.evaluation = Evaluation(FORMULAS, get_inputs())
+    for name in ('down_payment', 'loan', 'interest_rate_monthly', 'months',
+                 'property_taxes_monthly', 'insurance_cost'):
+        setattr(PropertyInfo, name, PropertyInfo.evaluation[name])
 
-def basic_calculations() -> None:
-    """Basic calculations necessary module wide"""
 
-    PropertyInfo.down_payment = \
-        WebScraper.price * UserValues.down_payment_percent
-    PropertyInfo.loan = WebScraper.price - PropertyInfo.down_payment
-    PropertyInfo.interest_rate_monthly = WebScraper.interest_rate / 12
-    PropertyInfo.months = UserValues.years * 12
-    PropertyInfo.property_taxes_monthly = WebScraper.property_taxes / 12
+def get_inputs() -> dict:
+    """Inputs of FORMULAS from WebScraper and UserValues"""
+
+    inputs = {name: getattr(WebScraper, name) for name in SCRAPED}
+    inputs.update((name, getattr(UserValues, name)) for name in ASSUMPTIONS)
+    inputs.update(get_loan_fees(UserValues.loan_type))
+    inputs['minimum_conc_percent'] = MINIMUM_ConC_PERCENT
+    return inputs
 
 
 def get_property_key() -> str:
     """Get key used to hash different properties"""
-    return f"https://www.zillow.com/homedetails/{get_url().split('/')[-2]}/"
+    return get_property_key_from_url(get_url())
 
 
 def mortgage_amortization() -> dict:
-    """Returns amortization table for given args.
-    If no args, defaults to constants in calculations.py
-
-    Table includes: 'Period', 'Monthly Payment', 'Principal Payment',
-    'Interest Payment', 'Loan Balance', and 'Loan Constant'
+    """Amortization table of the current property. Calculated once, see
+    formulas.amortization_table()
     """
+    return PropertyInfo.evaluation['amortization_table']
 
-    period = 1
-    monthly_payment = npf.pmt(PropertyInfo.interest_rate_monthly,
-                              PropertyInfo.months, PropertyInfo.loan
-                              )
-    monthly_principal = npf.ppmt(PropertyInfo.interest_rate_monthly, period,
-                                 PropertyInfo.months, PropertyInfo.loan
-                                 )
-    monthly_interest = npf.ipmt(PropertyInfo.interest_rate_monthly, period,
-                                PropertyInfo.months, PropertyInfo.loan
-                                )
-    loan_balance = npf.fv(PropertyInfo.interest_rate_monthly, period,
-                          monthly_payment, PropertyInfo.loan
-                          )
-
-    amortization = {
-        'Period': [period], 'Monthly Payment': [monthly_payment],
-        'Principal Payment': [monthly_principal],
-        'Interest Payment': [monthly_interest],
-        'Loan Balance': [loan_balance]
-    }
-
-    for i in range(2, PropertyInfo.months + 1):
-        period = i
-        monthly_principal = npf.ppmt(PropertyInfo.interest_rate_monthly, period,
-                                     PropertyInfo.months, PropertyInfo.loan
-                                     )
-        monthly_interest = npf.ipmt(PropertyInfo.interest_rate_monthly, period,
-                                    PropertyInfo.months, PropertyInfo.loan
-                                    )
-        loan_balance = npf.fv(PropertyInfo.interest_rate_monthly, period,
-                              monthly_payment, PropertyInfo.loan
-                              )
-
-        amortization['Period'].append(period)
-        amortization['Monthly Payment'].append(monthly_payment)
-        amortization['Principal Payment'].append(monthly_principal)
-        amortization['Interest Payment'].append(monthly_interest)
-        amortization['Loan Balance'].append(loan_balance)
-
-    return amortization
-
-
-def purchase_analysis() -> float:
-    """Amount required to purchase the property"""
-
-    closing_cost = PropertyInfo.loan * UserValues.closing_percent
-
-    return PropertyInfo.down_payment + UserValues.fix_up_cost + closing_cost
-
-
-def income_analysis() -> float:
-    """Effective gross income of the property"""
-
-    rent = WebScraper.rent_per_unit * WebScraper.num_units
-    gross_potential_income = rent * 12
-    vacancy_cost = -(gross_potential_income * UserValues.vacancy_percent)
-    effective_gross_income = gross_potential_income + vacancy_cost
-
-    return effective_gross_income
-
-
-def expenses_analysis() -> float:
-    """Cost of owning of the property"""
-
-    effective_gross_income = income_analysis()
-
-    maintenance_cost = -(
-            effective_gross_income * UserValues.maintenance_percent)
-    management_cost = -(effective_gross_income * UserValues.management_percent)
-    property_taxes_cost = -WebScraper.property_taxes
-    PropertyInfo.insurance_cost = -(WebScraper.price * 0.00425)
-    total_cost = maintenance_cost + management_cost + \
-                 property_taxes_cost + PropertyInfo.insurance_cost
 
-    return total_cost
-
-
-def profit_analysis() -> tuple:
-    """Cashflow, net income, and yearly cost of property"""
-
-    effective_gross_income = income_analysis()
-    total_cost = expenses_analysis()
-    net_operating_income = effective_gross_income + total_cost
-
-    debt_service = PropertyInfo.amortization_table['Monthly Payment'][0] * 12
-    cashflow = net_operating_income + debt_service
-
-    yearly_cost = total_cost + debt_service
+def returns_analysis() -> dict:
+    """Yearly returns of the property along with extra details"""
 
-    return cashflow, net_operating_income, yearly_cost
+    return format_returns({name: PropertyInfo.evaluation[metric]
+                           for name, metric in RETURNS.items()})
 
 
-def depreciation_analysis() -> float:
-    """Taxes saved by depreciation of the property"""
+def format_returns(returns) -> dict:
+    """Returns by their name in RETURNS as strings, the way print_analysis()
+    expects them. Percentages are rounded.
+    """
 
-    depreciation_short_total = (WebScraper.price + UserValues.fix_up_cost) * \
-                               UserValues.depreciation_short_percent
-    depreciation_short_yearly = depreciation_short_total / 5
+    return {
+        name: f"{round(float(value), 2)}%"
+        if RETURNS[name].endswith('_percent') else f"${value:.2f}"
+        for name, value in returns.items()
+    }
 
-    depreciation_long_total = (WebScraper.price + UserValues.fix_up_cost) * \
-                              UserValues.depreciation_long_percent
-    depreciation_long_yearly = depreciation_long_total / 27.5
 
-    tax_exposure_decrease = \
-        (depreciation_short_yearly + depreciation_long_yearly) * \
-        UserValues.tax_bracket
+def break_even_analysis() -> dict:
+    """Rents and rates at which the property breaks even, see BREAK_EVENS"""
 
-    return tax_exposure_decrease
+    return format_break_evens({name: PropertyInfo.evaluation[metric]
+                               for name, metric in BREAK_EVENS.items()})
 
 
-def returns_analysis() -> dict:
-    """Yearly returns of the property along with extra details"""
+def format_break_evens(break_evens) -> dict:
+    """Break-evens by their name in BREAK_EVENS as in analysis.json. Fractions
+    are rounded to 4 decimals, dollars to cents, None if there's none.
+    """
 
-    capital_required = purchase_analysis()
-    cashflow, net_operating_income, yearly_cost = profit_analysis()
-    effective_gross_income = income_analysis()
-    tax_exposure_decrease = depreciation_analysis()
-    principal_paydown = -sum(
-        PropertyInfo.amortization_table['Principal Payment'][0:12]
-    )
-    total_return = cashflow + tax_exposure_decrease + principal_paydown
-
-    return_on_investment_percent = round(total_return / capital_required * 100,
-                                         2
-                                         )
-    c_on_c_return_percent = round(cashflow / capital_required * 100, 2)
-    caprate_percent = round(net_operating_income / WebScraper.price * 100, 2)
-    cashflow_per_month = cashflow / 12
-    max_offer = (
-                        (
-                                effective_gross_income * 0.75 + -WebScraper.property_taxes - 600) *
-                        (0.37 / 0.12)) / \
-                (UserValues.closing_percent + UserValues.down_payment_percent) - \
-                UserValues.fix_up_cost
-    emergency_fund = -yearly_cost / 2 if UserValues.is_first_rental \
-        else -yearly_cost / 4
-
-    return_on_investment_string = f"{return_on_investment_percent}%"
-    c_on_c_return_string = f"{c_on_c_return_percent}%"
-    caprate_string = f"{caprate_percent}%"
-    cashflow_per_month_string = f"${cashflow_per_month:.2f}"
-    max_offer_string = f"${max_offer:.2f}"
-    emergency_fund_string = f"${emergency_fund:.2f}"
-
-    final_returns = {
-        'Return On Investment': return_on_investment_string,
-        'Cash on Cash Return': c_on_c_return_string,
-        'Caprate': caprate_string,
-        'Cashflow per month': cashflow_per_month_string,
-        'Max Offer (Approximately)': max_offer_string,
-        'Emergency Fund (Recommended)': emergency_fund_string
+    return {
+        name: None if not math.isfinite(value)
+        else float(f"{value:.4f}") if name.endswith('(Fraction)')
+        else float(f"{value:.2f}")
+        for name, value in break_evens.items()
     }
 
-    return final_returns
-
 
 def write_urls(urls, overwrite=False, search=False, delete=False) -> None:
     """Saves user inputted search URL. Does not preserve order."""
@@ -356,20 +262,14 @@ def write_urls(urls, overwrite=False, search=False, delete=False) -> None:
                     for search_url in urls:
                         for url in urls_json[key].get(search_url, []):
                             analysis_json.pop(
-                                f"https://www.zillow.com/homedetails/"
-                                f"{url.split('/')[-2]}/", None
+                                get_property_key_from_url(url), None
                             )
                 else:
                     for url in urls:
                         analysis_json.pop(
-                            f"https://www.zillow.com/homedetails/"
-                            f"{url.split('/')[-2]}/", None
+                            get_property_key_from_url(url), None
                         )
-                with open(os.path.join(
-                        'output', 'analysis.json'
-                ), 'w'
-                ) as json_file:
-                    json.dump(analysis_json, json_file, indent=4)
+                dump_property_analyses(analysis_json)
             except (FileNotFoundError, json.JSONDecodeError, TypeError):
                 pass
 
@@ -430,21 +330,15 @@ def write_urls(urls, overwrite=False, search=False, delete=False) -> None:
                     if search_url not in urls:
                         for url in urls_json[key].get(search_url, []):
                             analysis_json.pop(
-                                f"https://www.zillow.com/homedetails/"
-                                f"{url.split('/')[-2]}/", None
+                                get_property_key_from_url(url), None
                             )
             else:
                 for url in urls_json.setdefault(key, {}):
                     if url not in urls:
                         analysis_json.pop(
-                            f"https://www.zillow.com/homedetails/"
-                            f"{url.split('/')[-2]}/", None
+                            get_property_key_from_url(url), None
                         )
-            with open(os.path.join(
-                    'output', 'analysis.json'
-            ), 'w'
-            ) as json_file:
-                json.dump(analysis_json, json_file, indent=4)
+            dump_property_analyses(analysis_json)
         except (FileNotFoundError, json.JSONDecodeError, TypeError):
             pass
 
@@ -486,6 +380,8 @@ def get_property_analysis() -> tuple:
             "Property Taxes URL": get_url(taxes_url=True),
             "Property Info": PropertyInfo.property_info,
             "Analysis": print_analysis(dump=True),
+            "Financing": PropertyInfo.financing,
+            "Break-Even": PropertyInfo.break_evens,
             "Estimations": PropertyInfo.estimations
         }
     }
@@ -506,13 +402,11 @@ def write_property_analysis(key, property_analysis) -> None:
                 != analysis_json.get(key, dict()).get("Property Info", dict()
                                                       ).get("Price ($)", 0):
             analysis_json.update(property_analysis)
-            with open(os.path.join('output', 'analysis.json'), 'w'
-                      ) as json_file:
-                json.dump(analysis_json, json_file, indent=4)
+            mark_changed(key)
+            dump_property_analyses(analysis_json)
     except (FileNotFoundError, json.JSONDecodeError,
             TypeError):  # Explained in save_urls() above
-        with open(os.path.join('output', 'analysis.json'), 'w') as json_file:
-            json.dump(property_analysis, json_file, indent=4)
+        dump_property_analyses(property_analysis)
 
 
 def write_property_analyses(keys, property_analyses) -> None:
@@ -520,37 +414,55 @@ def write_property_analyses(keys, property_analyses) -> None:
 
     PropertyInfo.new_analysis_list.clear()
 
+    # Uses IO buffering to store data in dict,
+    # then only writes to file once when everything is done.
+    analysis_json = load_property_analyses()
+    for key, property_analysis in zip(keys, property_analyses):
+        merge_property_analysis(analysis_json, key, property_analysis)
+
+    if any(is_new_analyses()):
+        dump_property_analyses(analysis_json)
+
+
+@timed('persist_seconds', store='analysis.json', operation='load')
+def load_property_analyses() -> dict:
+    """Loads analysis.json. Empty if it doesn't exist or is invalid."""
+
     try:
         with open(os.path.join('output', 'analysis.json')) as json_file:
             analysis_json = json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-        # Uses IO buffering to store data in dict,
-        # then only writes to file once when everything is done.
-        for key, property_analysis in zip(keys, property_analyses):
-            if property_analysis[key]["Property Info"]["Price ($)"] \
-                    != analysis_json.get(key, dict()) \
-                    .get("Property Info", dict()).get("Price ($)", 0):
-                analysis_json.update(property_analysis)
-                PropertyInfo.new_analysis_list.append(True)
+    # Explained in save_urls() above
+    return analysis_json if isinstance(analysis_json, dict) else {}
 
-        if any(is_new_analyses()):
-            with open(os.path.join('output', 'analysis.json'), 'w'
-                      ) as json_file:
-                json.dump(analysis_json, json_file, indent=4)
 
-    except (FileNotFoundError, json.JSONDecodeError,
-            TypeError):  # Explained in save_urls() above
+def merge_property_analysis(analysis_json, key, property_analysis,
+                            overwrite=False) -> bool:
+    """Adds a property analysis to analysis_json if its price changed,
+    or always if overwrite. Returns whether it was added.
+    """
 
-        PropertyInfo.new_analysis_list.append(True)
+    if not overwrite and property_analysis[key]["Property Info"]["Price ($)"] \
+            == analysis_json.get(key, dict()) \
+            .get("Property Info", dict()).get("Price ($)", 0):
+        return False
+
+    analysis_json.update(property_analysis)
+    mark_changed(key)
+    PropertyInfo.new_analysis_list.append(True)
+    return True
 
-        # Creating a dict to store the multiple analyses.
-        # Allows writing to file once.
-        analysis_json = {}
-        for _, property_analysis in zip(keys, property_analyses):
-            analysis_json.update(property_analysis)
 
-        with open(os.path.join('output', 'analysis.json'), 'w') as json_file:
-            json.dump(analysis_json, json_file, indent=4)
+@timed('persist_seconds', store='analysis.json', operation='dump')
+def dump_property_analyses(analysis_json) -> None:
+    """Overwrites analysis.json with analysis_json and updates the deal index"""
+
+    deal_index = update_deal_index(analysis_json)
+    with open(os.path.join('output', 'analysis.json'), 'w') as json_file:
+        json.dump(analysis_json, json_file, indent=4)
+    save_deal_index(deal_index)
 
 
 def is_new_analyses() -> list:
@@ -766,8 +678,9 @@ def print_analysis(dump=False) -> any:
                 color = GOOD
             elif stripped_val >= WebScraper.price * 1.1:
                 color = GREAT
-        else:
-            stripped_val = float(value.lstrip('$'))
+        else:  # Any other metric in formulas.RETURNS
+            is_dollar_sign = not value.endswith('%')
+            stripped_val = float(value.lstrip('$').rstrip('%'))
 
         if dump:
             if is_dollar_sign:
@@ -798,3 +711,32 @@ def print_analysis(dump=False) -> any:
         "----------------------------------------"
     )
     print()
+
+
+def print_financing() -> None:
+    """Prints every financing option of the property, the best in color"""
+
+    names, evaluation = PropertyInfo.financing_options
+    if evaluation is None:
+        return
+
+    best = {option['Loan'] for option in PropertyInfo.financing.values()}
+    print("Financing options:")
+    print()
+    print(f"{'Loan':<22}{'Down':>8}{'Rate':>9}{'Payment':>12}{'ConC':>10}"
+          f"{'Cashflow':>12}")
+    for row in range(len(names)):
+        option = format_option(names, evaluation, row)
+        color = GREAT if option['Loan'] in best else ''
+        print(f"{color}{option['Loan']:<22}"
+              f"{option['Down Payment (Fraction)'] * 100:>7.1f}%"
+              f"{option['Interest Rate (Fraction)'] * 100:>8.3f}%"
+              f"{option['Mortgage Payment [Monthly] ($)']:>12,.2f}"
+              f"{option['Cash on Cash Return']:>10}"
+              f"{option['Cashflow per month']:>12}{END if color else ''}")
+    print()
+    print(
+        "----------------------------------------"
+        "----------------------------------------"
+    )
+    print()
@@ -0,0 +1,138 @@
+"""Index of the deals in analysis.json, ranked by Cash on Cash Return.
+
+output/deal_index.json keeps the score of every property and the whole
+analysis of only those above MINIMUM_ConC_PERCENT, so emailing the best
+deals reads a small file instead of every analysis. The index is updated
+when analysis.json is saved, only parsing the analyses that changed since
+merge_property_analysis() marks them.
+
+The index records the modification time of analysis.json it matches and the
+threshold it used. If analysis.json was changed some other way or the
+threshold in values.py changed, it is rebuilt from analysis.json.
+"""
+
+import heapq
+import json
+import os.path
+from dataclasses import dataclass
+
+from values import MINIMUM_ConC_PERCENT
+
+DEAL_INDEX_FILE = os.path.join('output', 'deal_index.json')
+ANALYSIS_FILE = os.path.join('output', 'analysis.json')
+
+
+@dataclass
+class DealIndex:
+    """Keys of the analyses merged since analysis.json was last saved"""
+    changed = set()
+
+
+def get_deal_score(property_analysis) -> float:
+    """Cash on Cash Return of an analysis in analysis.json, in percent"""
+
+    return float(
+        property_analysis['Analysis']['Cash on Cash Return']
+        .lstrip('$').rstrip('%')
+    )
+
+
+def mark_changed(key) -> None:
+    """Marks the analysis of key to be indexed when analysis.json is saved"""
+    DealIndex.changed.add(key)
+
+
+def build_deal_index(analysis_json) -> dict:
+    """Index of every analysis in analysis_json"""
+
+    index = {'threshold': MINIMUM_ConC_PERCENT, 'analysis_mtime': None,
+             'scores': {}, 'deals': {}}
+    for key, property_analysis in analysis_json.items():
+        _index_analysis(index, key, property_analysis)
+
+    return index
+
+
+def update_deal_index(analysis_json) -> dict:
+    """Index brought up to date with analysis_json, before it is saved to
+    analysis.json. Save it with save_deal_index() once analysis.json is.
+    """
+
+    index = load_deal_index()
+    changed, DealIndex.changed = DealIndex.changed, set()
+    if index is None:
+        index = build_deal_index(analysis_json)
+    else:
+        for key in set(index['scores']).difference(analysis_json):
+            del index['scores'][key]
+            index['deals'].pop(key, None)
+        for key in changed.union(set(analysis_json).difference(
+                index['scores'])):
+            if key in analysis_json:
+                _index_analysis(index, key, analysis_json[key])
+
+    return index
+
+
+def save_deal_index(index) -> None:
+    """Saves the index as matching the current analysis.json"""
+
+    index['analysis_mtime'] = _get_analysis_mtime()
+    temp_path = f"{DEAL_INDEX_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(index, file)
+    os.replace(temp_path, DEAL_INDEX_FILE)
+
+
+def load_deal_index():
+    """The index if it matches analysis.json and the threshold, else None"""
+
+    try:
+        with open(DEAL_INDEX_FILE) as file:
+            index = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if index.get('threshold') != MINIMUM_ConC_PERCENT \
+            or index.get('analysis_mtime') != _get_analysis_mtime():
+        return None
+    return index
+
+
+def get_best_deals(index, k=None) -> list:
+    """(key, score, analysis) of the k best deals above the threshold,
+    best first. Every deal if k is None.
+    """
+
+    deals = index['deals']
+    if k is None:
+        k = len(deals)
+    best = heapq.nlargest(k, deals, key=index['scores'].__getitem__)
+
+    return [(key, index['scores'][key], deals[key]) for key in best]
+
+
+def _index_analysis(index, key, property_analysis) -> None:
+    """Scores an analysis and keeps it if it is a deal"""
+
+    try:
+        score = get_deal_score(property_analysis)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        index['scores'].pop(key, None)
+        index['deals'].pop(key, None)
+        return
+
+    index['scores'][key] = score
+    if score > MINIMUM_ConC_PERCENT:
+        index['deals'][key] = property_analysis
+    else:
+        index['deals'].pop(key, None)
+
+
+def _get_analysis_mtime():
+    """Modification time of analysis.json in ns, None if it doesn't exist"""
+
+    try:
+        return os.stat(ANALYSIS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
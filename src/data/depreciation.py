@@ -0,0 +1,67 @@
+"""Year by year depreciation of properties, split in recovery classes.
+
+A cost segregation study splits the basis (price and fix up cost) between
+5-year personal property, 15-year land improvements and the 27.5-year
+residential building, the rest being land. Each class is depreciated
+straight-line under the mid-month convention: the month it's placed in
+service counts as half a month, so the deductions span one more tax year
+than the class.
+
+The fraction of the basis deducted each year only depends on the class and
+the month, so it's calculated once and shared. A schedule is the basis times
+those fractions, for a property or a whole batch as arrays.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+# Recovery years of each class, by the name of its input in FORMULAS
+RECOVERY_YEARS = {
+    'depreciation_short_percent': 5,
+    'depreciation_medium_percent': 15,
+    'depreciation_long_percent': 27.5
+}
+SCHEDULE_YEARS = 29  # Tax years the longest class can span
+
+
+@lru_cache(maxsize=None)
+def get_fractions(recovery_years, placed_in_service_month) -> np.ndarray:
+    """Fraction of the basis of a class deducted each tax year,
+    SCHEDULE_YEARS long. Read-only since every call shares it.
+    """
+
+    first_year = (12.5 - placed_in_service_month) / 12 / recovery_years
+    deducted = np.minimum(
+        first_year + np.arange(SCHEDULE_YEARS) / recovery_years, 1)
+    fractions = np.diff(deducted, prepend=0)
+    fractions.flags.writeable = False
+    return fractions
+
+
+def get_class_fractions(recovery_years, placed_in_service_month
+                        ) -> np.ndarray:
+    """get_fractions() of a month or an array of months, with the years on a
+    new last axis
+    """
+
+    months = np.asarray(placed_in_service_month)
+    if months.ndim == 0:
+        return get_fractions(recovery_years, int(months))
+    return np.stack([get_fractions(recovery_years, int(month))
+                     for month in months.ravel()]
+                    ).reshape(months.shape + (SCHEDULE_YEARS,))
+
+
+def get_depreciation_schedule(basis, split, placed_in_service_month
+                              ) -> np.ndarray:
+    """Depreciation of each tax year, with the years on a new last axis.
+    split has the fraction of the basis in each class, by the names in
+    RECOVERY_YEARS. Any argument can be an array, they're broadcast.
+    """
+
+    schedule = 0
+    for name, recovery_years in RECOVERY_YEARS.items():
+        schedule = schedule + np.expand_dims(basis * split[name], -1) \
+            * get_class_fractions(recovery_years, placed_in_service_month)
+    return schedule
@@ -0,0 +1,234 @@
+"""Structured log of the properties that failed to be analyzed.
+
+Every failure is a JSON line in output/errors.jsonl with the property key,
+url, stage, the scraper function (extractor) that raised, the exception and
+a signature. The signature is a hash of the exception type and the frames
+of this project that raised it, so the same bug on a thousand properties has
+one signature. output/error_signatures.json keeps the traceback of each
+signature once, with how many times and when it happened.
+
+A zillow layout change shows up as one extractor failing on most properties,
+print_error_summary() ranks them. Run it with run_error_summary.py.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from traceback import extract_tb, format_tb
+
+from src.data.colors_for_print import BAD, OK, GOOD, END
+from src.web.property_keys import get_property_key_from_url
+
+ERRORS_FILE = os.path.join('output', 'errors.jsonl')
+SIGNATURES_FILE = os.path.join('output', 'error_signatures.json')
+MAX_ERRORS_BYTES = 10 * 2**20  # Moved to errors.jsonl.1 past this size
+MAX_MESSAGE_LENGTH = 500
+
+# Stages a property can fail in
+FETCH, EXTRACT, CALCULATE, ANALYZE = 'fetch', 'extract', 'calculate', 'analyze'
+
+# Modules whose frames decide the stage when it isn't given
+EXTRACT_MODULES = ('get_property_info.py', 'user.py')
+CALCULATE_MODULES = ('calculations.py', 'database.py')
+EXTRACTOR_MODULE = 'get_property_info.py'
+
+OFF_MARKET_HINT = "Is the property off market? If so delete the url if it " \
+                  "was individually added, or ignore it if it came from a " \
+                  "search url. Either is done with run_property_tracker.py."
+
+
+@dataclass
+class ErrorLog:
+    """Signatures loaded from SIGNATURES_FILE, None until the first error"""
+    signatures = None
+    lock = threading.Lock()
+
+
+def format_error(url, exception, stage=None) -> dict:
+    """Record of the failure of a property for write_error().
+    The stage is found from the traceback unless given.
+    Plain values only so it can be sent from a parse pool worker.
+    """
+
+    frames = [frame for frame in extract_tb(exception.__traceback__)
+              if f"{os.sep}src{os.sep}" in frame.filename]
+    exception_name = exception.__class__.__qualname__
+
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'key': get_property_key_from_url(url) if url else None,
+        'url': url,
+        'stage': stage or _get_stage(frames),
+        'extractor': _get_extractor(frames),
+        'exception': exception_name,
+        'message': str(exception)[:MAX_MESSAGE_LENGTH],
+        'signature': _get_signature(exception_name, frames),
+        'traceback': ''.join(format_tb(exception.__traceback__))
+    }
+
+
+def write_error(error) -> None:
+    """Appends an error from format_error() to ERRORS_FILE and counts its
+    signature in SIGNATURES_FILE
+    """
+
+    error = dict(error)
+    traceback = error.pop('traceback')
+
+    with ErrorLog.lock:
+        if os.path.exists(ERRORS_FILE) \
+                and os.path.getsize(ERRORS_FILE) > MAX_ERRORS_BYTES:
+            os.replace(ERRORS_FILE, f"{ERRORS_FILE}.1")
+        with open(ERRORS_FILE, 'a') as file:
+            file.write(json.dumps(error) + '\n')
+
+        if ErrorLog.signatures is None:
+            ErrorLog.signatures = load_signatures()
+        signature = ErrorLog.signatures.get(error['signature'])
+        if signature is None:
+            signature = ErrorLog.signatures[error['signature']] = {
+                'stage': error['stage'],
+                'extractor': error['extractor'],
+                'exception': error['exception'],
+                'traceback': traceback,
+                'count': 0,
+                'first_seen': error['time']
+            }
+            if error['exception'] == 'AttributeError':
+                signature['hint'] = OFF_MARKET_HINT
+        signature['count'] += 1
+        signature['last_seen'] = error['time']
+        signature['last_url'] = error['url']
+        signature['last_message'] = error['message']
+
+        # Written under a temporary name so a crash never leaves half a file.
+        temp_path = f"{SIGNATURES_FILE}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(ErrorLog.signatures, file, indent=4)
+        os.replace(temp_path, SIGNATURES_FILE)
+
+
+def log_error(url, exception, stage=None) -> None:
+    """Formats and writes the error of a property"""
+    write_error(format_error(url, exception, stage))
+
+
+def load_signatures() -> dict:
+    """Signature: its traceback, counts and when it was seen"""
+
+    try:
+        with open(SIGNATURES_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def load_errors(since=None) -> list:
+    """Errors in ERRORS_FILE, only those at or after since if it is given"""
+
+    errors = []
+    for path in (f"{ERRORS_FILE}.1", ERRORS_FILE):
+        try:
+            with open(path) as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    error = json.loads(line)
+                    if since is None or error['time'] >= since:
+                        errors.append(error)
+        except FileNotFoundError:
+            continue
+
+    return errors
+
+
+def summarize_errors(errors) -> dict:
+    """Failing extractors and signatures ranked by how often they failed.
+    Failures outside of an extractor are under their stage instead.
+    """
+
+    extractors = {}
+    signatures = {}
+    properties = set()
+    for error in errors:
+        name = error['extractor'] or f"({error['stage']})"
+        extractors[name] = extractors.get(name, 0) + 1
+        signatures[error['signature']] = \
+            signatures.get(error['signature'], 0) + 1
+        properties.add(error['key'])
+
+    return {
+        'errors': len(errors),
+        'properties': len(properties),
+        'extractors': sorted(extractors.items(), key=lambda item: item[1],
+                             reverse=True),
+        'signatures': sorted(signatures.items(), key=lambda item: item[1],
+                             reverse=True)
+    }
+
+
+def print_error_summary(since=None, limit=10) -> None:
+    """Prints the failing extractors and the most common errors"""
+
+    summary = summarize_errors(load_errors(since))
+    if not summary['errors']:
+        print(f"{GOOD}No errors{' since ' + since if since else ''}.{END}")
+        return
+
+    signatures = load_signatures()
+    print(f"\n{OK}--- {BAD}{summary['errors']}{OK} errors on "
+          f"{BAD}{summary['properties']}{OK} properties"
+          f"{' since ' + since if since else ''}. Failing extractors:{END}")
+    for name, count in summary['extractors'][:limit]:
+        print(f"{count:>8} ({count / summary['errors']:>4.0%})  {name}")
+
+    print(f"\n{OK}--- Most common errors:{END}")
+    for signature, count in summary['signatures'][:limit]:
+        details = signatures.get(signature, {})
+        print(f"{count:>8}  {signature}  {details.get('exception')} in "
+              f"{details.get('extractor') or details.get('stage')}: "
+              f"{details.get('last_message', '')[:100]}")
+        if details.get('last_url'):
+            print(f"{'':>10}e.g. {details['last_url']}")
+    print(f"{OK}Tracebacks by signature in {SIGNATURES_FILE}{END}")
+
+
+def get_since(hours) -> str:
+    """Isoformat time hours ago, for print_error_summary()"""
+    return (datetime.now() - timedelta(hours=hours)).isoformat(
+        timespec='seconds')
+
+
+def _get_stage(frames) -> str:
+    """Stage of the innermost frame of this project"""
+
+    for frame in reversed(frames):
+        module = os.path.basename(frame.filename)
+        if module in EXTRACT_MODULES:
+            return EXTRACT
+        if module in CALCULATE_MODULES:
+            return CALCULATE
+    return ANALYZE
+
+
+def _get_extractor(frames):
+    """Scraper function that raised, None if it wasn't in a scraper"""
+
+    for frame in reversed(frames):
+        if os.path.basename(frame.filename) == EXTRACTOR_MODULE:
+            return frame.name
+    return None
+
+
+def _get_signature(exception_name, frames) -> str:
+    """Hash of the exception type and the code it went through. Uses the
+    source line rather than its number so unrelated edits keep signatures.
+    """
+
+    parts = [exception_name] + [
+        f"{os.path.basename(frame.filename)}:{frame.name}:{frame.line}"
+        for frame in frames]
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:12]
@@ -0,0 +1,103 @@
+"""Store of the values scraped from each property, apart from its analysis.
+
+output/facts.json has what user.get_facts() scraped for every property, its
+urls and when its page was fetched. Analyses depend on values.py and the
+interest rate, the facts don't, so src/reanalyze.py recalculates every
+analysis from them without requesting a single page.
+
+Properties analyzed before the store existed have their facts recovered from
+analysis.json by get_all_facts(). Whether their values were found or
+defaulted isn't known, they count as found.
+"""
+
+import json
+import os.path
+from datetime import datetime
+
+from src.metrics import timed
+
+FACTS_FILE = os.path.join('output', 'facts.json')
+
+
+@timed('persist_seconds', store='facts.json', operation='load')
+def load_facts() -> dict:
+    """Key: facts, urls and fetch time. Empty if there's no FACTS_FILE."""
+
+    try:
+        with open(FACTS_FILE) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+@timed('persist_seconds', store='facts.json', operation='dump')
+def dump_facts(facts_json) -> None:
+    """Overwrites FACTS_FILE"""
+
+    temp_path = f"{FACTS_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(facts_json, file)
+    os.replace(temp_path, FACTS_FILE)
+
+
+def merge_facts(facts_json, record, fetched_at=None) -> None:
+    """Adds the facts of a record from analyze_page() to facts_json.
+    fetched_at is a timestamp, now if not given.
+    """
+
+    key = record['key']
+    property_analysis = record['analysis'][key]
+    facts_json[key] = {
+        'facts': record['facts'],
+        'url': property_analysis['Property URL'],
+        'url_property_taxes': property_analysis['Property Taxes URL'],
+        'fetched_at': datetime.fromtimestamp(fetched_at).isoformat(
+            timespec='seconds') if fetched_at is not None
+        else datetime.now().isoformat(timespec='seconds')
+    }
+
+
+def get_all_facts(analysis_json, facts_json) -> dict:
+    """Facts of every property in analysis_json, recovered from its analysis
+    if it isn't in facts_json
+    """
+
+    all_facts = {}
+    for key, property_analysis in analysis_json.items():
+        if key in facts_json:
+            all_facts[key] = facts_json[key]
+            continue
+        try:
+            all_facts[key] = _get_facts_from_analysis(property_analysis)
+        except (KeyError, TypeError):
+            continue
+
+    return all_facts
+
+
+def _get_facts_from_analysis(property_analysis) -> dict:
+    """Facts record of an analysis in analysis.json"""
+
+    info = property_analysis['Property Info']
+    return {
+        'facts': {
+            'address': info['Address'],
+            'price': info['Price ($)'],
+            'year': info['Year Built'],
+            'description': info['Description'],
+            'sqft': info['House Size (sqft)'],
+            'price_per_sqft': info['Price/sqft ($)'],
+            'lot_size': info['Lot Size (sqft)'],
+            'parking': info['Parking'],
+            # Only saved monthly, rounded to the cent
+            'property_taxes': round(info['Property Taxes [Monthly] ($)'] * 12),
+            'num_units': info['Units'],
+            'rent_per_unit': info['Rent Per Unit ($)'],
+            'found_property_taxes': True,
+            'found_num_units': True,
+            'found_rent_per_unit': True
+        },
+        'url': property_analysis['Property URL'],
+        'url_property_taxes': property_analysis['Property Taxes URL'],
+        'fetched_at': None
+    }
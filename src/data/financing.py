@@ -0,0 +1,109 @@
+"""Every way of financing a property, evaluated at once.
+
+Each option in FINANCING becomes a row of the FORMULAS evaluation, so a
+property, or a batch of them as columns, is evaluated for every loan type and
+length in one pass. Conventional loans use the down payment of values.py,
+FHA and VA their minimum, with their fees from formulas.LOAN_FEES. Options
+the rates page has no rate for are skipped.
+
+Conventional loans with less than 20% down would pay private mortgage
+insurance, which isn't modeled.
+"""
+
+import numpy as np
+
+from src.data.formulas import FORMULAS, get_loan_fees
+from src.data.graph import Evaluation
+from src.data.user import get_interest_rate
+
+# Name: loan type, years and down payment. None for the one in values.py.
+FINANCING = {
+    'Conventional 30-year': ('Conventional', 30, None),
+    'Conventional 20-year': ('Conventional', 20, None),
+    'Conventional 15-year': ('Conventional', 15, None),
+    'Conventional 10-year': ('Conventional', 10, None),
+    'FHA 30-year': ('FHA', 30, 0.035),
+    'VA 30-year': ('VA', 30, 0)
+}
+
+# Name in analysis.json: metric the best option has the most of
+BEST_BY = {
+    'Best by ConC': 'c_on_c_return_percent',
+    'Best by Cashflow': 'cashflow'
+}
+
+
+def get_options(down_payment_percent) -> dict:
+    """Name: inputs of FORMULAS for the option, of every option with a rate"""
+
+    options = {}
+    for name, (loan_type, years, down_payment) in FINANCING.items():
+        try:
+            interest_rate = get_interest_rate(loan_type, years)
+        except KeyError:
+            continue
+        options[name] = {
+            'down_payment_percent': down_payment_percent
+            if down_payment is None else down_payment,
+            'years': years,
+            'interest_rate': interest_rate,
+            **get_loan_fees(loan_type)
+        }
+
+    return options
+
+
+def evaluate_financing(inputs) -> tuple:
+    """Names of the options and the Evaluation of FORMULAS for them, with a
+    row per option. inputs are those of a property, or of a batch under a
+    single set of assumptions as arrays of shape (1, properties). The
+    Evaluation is None without any option. amortization_table and what
+    depends on it can't be read from it.
+    """
+
+    options = get_options(
+        float(np.ravel(inputs['down_payment_percent'])[0]))
+    if not options:
+        return [], None
+
+    given = dict(inputs)
+    for name in next(iter(options.values())):
+        given[name] = np.array([option[name] for option in options.values()],
+                               dtype=float)[:, np.newaxis]
+    return list(options), Evaluation(FORMULAS, given)
+
+
+def get_best_financing(names, evaluation, column=0) -> dict:
+    """Best options of the property in column, as saved in analysis.json"""
+
+    if evaluation is None:
+        return {}
+
+    shape = (len(names), np.size(evaluation['price']))
+    best_financing = {}
+    for title, metric in BEST_BY.items():
+        row = int(np.argmax(np.broadcast_to(evaluation[metric],
+                                            shape)[:, column]))
+        best_financing[title] = format_option(names, evaluation, row, column)
+
+    return best_financing
+
+
+def format_option(names, evaluation, row, column=0) -> dict:
+    """Option in row for the property in column, as saved in analysis.json"""
+
+    shape = (len(names), np.size(evaluation['price']))
+
+    def value(name) -> float:
+        return float(np.broadcast_to(evaluation[name], shape)[row, column])
+
+    return {
+        "Loan": names[row],
+        "Down Payment (Fraction)": float(
+            f"{value('down_payment_percent'):.3f}"),
+        "Interest Rate (Fraction)": float(f"{value('interest_rate'):.4f}"),
+        "Mortgage Payment [Monthly] ($)": float(
+            f"{-value('monthly_payment'):.2f}"),
+        "Cash on Cash Return": f"{round(value('c_on_c_return_percent'), 2)}%",
+        "Cashflow per month": f"${value('cashflow_per_month'):.2f}"
+    }
@@ -0,0 +1,364 @@
+"""Every formula of the analysis as a metric of the FORMULAS graph.
+
+Inputs are the scraped values of WebScraper (price, property_taxes,
+num_units, rent_per_unit, interest_rate), the assumptions of UserValues by
+the same names and minimum_conc_percent, MINIMUM_ConC_PERCENT of values.py.
+Percentages aren't rounded, round() them when displaying.
+
+The formulas only use arithmetic and numpy, so they work the same on arrays
+of many properties, except amortization_table. src/data/batch.py gives
+principal_paydown from its closed form instead.
+
+Add a metric with @FORMULAS.metric, naming its parameters after the values
+it needs. Add it to RETURNS to save it with every analysis.
+"""
+
+import numpy as np
+import numpy_financial as npf
+
+from src.data.depreciation import get_depreciation_schedule
+from src.data.graph import Graph
+
+INSURANCE_PERCENT = 0.00425  # Of the price, yearly
+# Bounds the break-even interest rate, found to within 1e-12 of it
+MAX_INTEREST_RATE = 1
+BISECTIONS = 40
+
+FORMULAS = Graph()
+
+# Inputs, named as in WebScraper
+SCRAPED = ('price', 'property_taxes', 'num_units', 'rent_per_unit',
+           'interest_rate')
+# Inputs, named as in UserValues. loan_type decides the interest rate and
+# the fees from get_loan_fees(), the two other inputs.
+ASSUMPTIONS = ('down_payment_percent', 'years', 'loan_type', 'fix_up_cost',
+               'closing_percent', 'vacancy_percent', 'maintenance_percent',
+               'management_percent', 'depreciation_short_percent',
+               'depreciation_medium_percent', 'depreciation_long_percent',
+               'placed_in_service_month', 'tax_bracket', 'is_first_rental')
+
+# Loan type: fractions of the loan financed when it is taken out and paid
+# yearly. The FHA mortgage insurance premium, and the VA funding fee for a
+# first use with less than 5% down.
+LOAN_FEES = {
+    'Conventional': (0, 0),
+    'FHA': (0.0175, 0.0055),
+    'VA': (0.0215, 0)
+}
+
+# Name in analysis.json: metric
+RETURNS = {
+    'Return On Investment': 'return_on_investment_percent',
+    'Cash on Cash Return': 'c_on_c_return_percent',
+    'Caprate': 'caprate_percent',
+    'Cashflow per month': 'cashflow_per_month',
+    'Max Offer (Approximately)': 'max_offer',
+    'Emergency Fund (Recommended)': 'emergency_fund'
+}
+
+# Name in analysis.json: metric. Rents and rates at which a property breaks
+# even, or reaches MINIMUM_ConC_PERCENT.
+BREAK_EVENS = {
+    'Rent Per Unit ($)': 'break_even_rent_per_unit',
+    'Vacancy (Fraction)': 'break_even_vacancy',
+    'Interest Rate (Fraction)': 'break_even_interest_rate',
+    'Rent Per Unit for Minimum ConC ($)': 'minimum_conc_rent_per_unit'
+}
+
+
+# Purchase
+@FORMULAS.metric
+def down_payment(price, down_payment_percent):
+    return price * down_payment_percent
+
+
+@FORMULAS.metric
+def loan(price, down_payment, upfront_fee_percent):
+    """Including the fees financed with it"""
+    borrowed = price - down_payment
+    return borrowed + borrowed * upfront_fee_percent
+
+
+@FORMULAS.metric
+def capital_required(down_payment, fix_up_cost, loan, closing_percent):
+    """Amount required to purchase the property"""
+    return down_payment + fix_up_cost + loan * closing_percent
+
+
+# Mortgage
+@FORMULAS.metric
+def interest_rate_monthly(interest_rate):
+    return interest_rate / 12
+
+
+@FORMULAS.metric
+def months(years):
+    return years * 12
+
+
+@FORMULAS.metric
+def monthly_payment(interest_rate_monthly, months, loan):
+    """Negative, as paid"""
+    return npf.pmt(interest_rate_monthly, months, loan)
+
+
+@FORMULAS.metric
+def amortization_table(interest_rate_monthly, months, loan, monthly_payment
+                       ) -> dict:
+    """Table includes: 'Period', 'Monthly Payment', 'Principal Payment',
+    'Interest Payment' and 'Loan Balance'
+    """
+
+    amortization = {
+        'Period': [], 'Monthly Payment': [], 'Principal Payment': [],
+        'Interest Payment': [], 'Loan Balance': []
+    }
+
+    for period in range(1, months + 1):
+        amortization['Period'].append(period)
+        amortization['Monthly Payment'].append(monthly_payment)
+        amortization['Principal Payment'].append(
+            npf.ppmt(interest_rate_monthly, period, months, loan))
+        amortization['Interest Payment'].append(
+            npf.ipmt(interest_rate_monthly, period, months, loan))
+        amortization['Loan Balance'].append(
+            npf.fv(interest_rate_monthly, period, monthly_payment, loan))
+
+    return amortization
+
+
+@FORMULAS.metric
+def amortization_schedule(interest_rate_monthly, months, loan,
+                          monthly_payment) -> dict:
+    """amortization_table in closed form for arrays of loans, the periods on
+    a new last axis as long as the longest loan. 0 once a loan is paid off.
+    """
+
+    rate = np.expand_dims(interest_rate_monthly, -1)
+    loan = np.expand_dims(loan, -1)
+    payment = np.expand_dims(monthly_payment, -1)
+    period = np.arange(1, int(np.max(months, initial=0)) + 1)
+    paid_off = period > np.expand_dims(months, -1)
+
+    def balance(periods):
+        growth = (1 + rate) ** periods
+        return loan * growth + payment * (growth - 1) / rate
+
+    interest = -rate * balance(period - 1)
+    return {
+        'Monthly Payment': np.where(paid_off, 0, payment),
+        'Principal Payment': np.where(paid_off, 0, payment - interest),
+        'Interest Payment': np.where(paid_off, 0, interest),
+        'Loan Balance': np.where(paid_off, 0, -balance(period))
+    }
+
+
+@FORMULAS.metric
+def principal_paydown(amortization_table):
+    """Principal paid in the first year"""
+    return -sum(amortization_table['Principal Payment'][0:12])
+
+
+# Income and expenses
+@FORMULAS.metric
+def gross_potential_income(rent_per_unit, num_units):
+    return rent_per_unit * num_units * 12
+
+
+@FORMULAS.metric
+def effective_gross_income(gross_potential_income, vacancy_percent):
+    return gross_potential_income + -(gross_potential_income
+                                      * vacancy_percent)
+
+
+@FORMULAS.metric
+def maintenance_cost(effective_gross_income, maintenance_percent):
+    return -(effective_gross_income * maintenance_percent)
+
+
+@FORMULAS.metric
+def management_cost(effective_gross_income, management_percent):
+    return -(effective_gross_income * management_percent)
+
+
+@FORMULAS.metric
+def insurance_cost(price):
+    return -(price * INSURANCE_PERCENT)
+
+
+@FORMULAS.metric
+def property_taxes_monthly(property_taxes):
+    return property_taxes / 12
+
+
+@FORMULAS.metric
+def total_cost(maintenance_cost, management_cost, property_taxes,
+               insurance_cost):
+    """Yearly cost of owning the property, without the mortgage"""
+    return maintenance_cost + management_cost + -property_taxes \
+        + insurance_cost
+
+
+# Profit
+@FORMULAS.metric
+def net_operating_income(effective_gross_income, total_cost):
+    return effective_gross_income + total_cost
+
+
+@FORMULAS.metric
+def mortgage_insurance(loan, mortgage_insurance_percent):
+    return -(loan * mortgage_insurance_percent)
+
+
+@FORMULAS.metric
+def debt_service(monthly_payment, mortgage_insurance):
+    return monthly_payment * 12 + mortgage_insurance
+
+
+@FORMULAS.metric
+def cashflow(net_operating_income, debt_service):
+    return net_operating_income + debt_service
+
+
+@FORMULAS.metric
+def yearly_cost(total_cost, debt_service):
+    return total_cost + debt_service
+
+
+@FORMULAS.metric
+def depreciation_schedule(price, fix_up_cost, depreciation_short_percent,
+                          depreciation_medium_percent,
+                          depreciation_long_percent, placed_in_service_month):
+    """Depreciation of each tax year, the years on the last axis. See
+    src/data/depreciation.py
+    """
+
+    return get_depreciation_schedule(
+        price + fix_up_cost,
+        {'depreciation_short_percent': depreciation_short_percent,
+         'depreciation_medium_percent': depreciation_medium_percent,
+         'depreciation_long_percent': depreciation_long_percent},
+        placed_in_service_month)
+
+
+@FORMULAS.metric
+def tax_savings_schedule(depreciation_schedule, tax_bracket):
+    """Taxes saved by depreciation each tax year"""
+    return depreciation_schedule * np.expand_dims(tax_bracket, -1)
+
+
+@FORMULAS.metric
+def tax_exposure_decrease(tax_savings_schedule):
+    """Taxes saved by depreciation of the property the first year"""
+    return tax_savings_schedule[..., 0]
+
+
+@FORMULAS.metric
+def total_return(cashflow, tax_exposure_decrease, principal_paydown):
+    return cashflow + tax_exposure_decrease + principal_paydown
+
+
+# Returns
+@FORMULAS.metric
+def return_on_investment_percent(total_return, capital_required):
+    return total_return / capital_required * 100
+
+
+@FORMULAS.metric
+def c_on_c_return_percent(cashflow, capital_required):
+    return cashflow / capital_required * 100
+
+
+@FORMULAS.metric
+def caprate_percent(net_operating_income, price):
+    return net_operating_income / price * 100
+
+
+@FORMULAS.metric
+def cashflow_per_month(cashflow):
+    return cashflow / 12
+
+
+@FORMULAS.metric
+def max_offer(effective_gross_income, property_taxes, closing_percent,
+              down_payment_percent, fix_up_cost):
+    return ((effective_gross_income * 0.75 + -property_taxes - 600)
+            * (0.37 / 0.12)) / (closing_percent + down_payment_percent) \
+        - fix_up_cost
+
+
+@FORMULAS.metric
+def emergency_fund(yearly_cost, is_first_rental):
+    """Half a year of costs, a quarter if it isn't the first rental"""
+    return -yearly_cost / (4 - 2 * is_first_rental)
+
+
+# Break-evens. The cashflow is fixed_cashflow plus rent_per_unit times
+# rent_cashflow_per_unit, solved for the rent or the vacancy.
+@FORMULAS.metric
+def fixed_cashflow(property_taxes, insurance_cost, debt_service):
+    """Yearly cashflow that doesn't depend on the rent"""
+    return -property_taxes + insurance_cost + debt_service
+
+
+@FORMULAS.metric
+def rent_cashflow_per_unit(num_units, vacancy_percent, maintenance_percent,
+                           management_percent):
+    """Yearly cashflow of each dollar of monthly rent per unit"""
+    return num_units * 12 * (1 - vacancy_percent) \
+        * (1 - maintenance_percent - management_percent)
+
+
+@FORMULAS.metric
+def break_even_rent_per_unit(fixed_cashflow, rent_cashflow_per_unit):
+    """inf or nan without units"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -fixed_cashflow / rent_cashflow_per_unit
+
+
+@FORMULAS.metric
+def break_even_vacancy(fixed_cashflow, gross_potential_income,
+                       maintenance_percent, management_percent):
+    """Negative if the property doesn't break even when fully rented, -inf
+    or nan without rent
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 + fixed_cashflow / (
+            gross_potential_income
+            * (1 - maintenance_percent - management_percent))
+
+
+@FORMULAS.metric
+def minimum_conc_rent_per_unit(fixed_cashflow, rent_cashflow_per_unit,
+                               capital_required, minimum_conc_percent):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (minimum_conc_percent / 100 * capital_required
+                - fixed_cashflow) / rent_cashflow_per_unit
+
+
+@FORMULAS.metric
+def break_even_interest_rate(loan, months, net_operating_income,
+                             mortgage_insurance):
+    """Yearly rate at which the cashflow is 0, by bisection since the payment
+    has no inverse. nan if it's negative even without interest,
+    MAX_INTEREST_RATE if it's positive even at that rate.
+    """
+
+    affordable_payment = (net_operating_income + mortgage_insurance) / 12
+    low, high = 0, MAX_INTEREST_RATE
+    for _ in range(BISECTIONS):
+        rate = (low + high) / 2
+        payment = loan * rate / 12 / (1 - (1 + rate / 12) ** -months)
+        low = np.where(payment < affordable_payment, rate, low)
+        high = np.where(payment < affordable_payment, high, rate)
+
+    return np.where(affordable_payment > loan / months, (low + high) / 2,
+                    np.nan)
+
+
+def get_loan_fees(loan_type) -> dict:
+    """Fee inputs of a loan type"""
+
+    upfront_fee_percent, mortgage_insurance_percent = LOAN_FEES[loan_type]
+    return {'upfront_fee_percent': upfront_fee_percent,
+            'mortgage_insurance_percent': mortgage_insurance_percent}
@@ -0,0 +1,97 @@
+"""Dependency graph of named values, evaluated lazily and memoized.
+
+A metric is a function whose parameters are named after the values it
+depends on, registered with the metric decorator of a Graph:
+
+    @FORMULAS.metric
+    def loan(price, down_payment):
+        return price - down_payment
+
+Names no metric defines are inputs, given when an Evaluation is created.
+Each value is calculated at most once per Evaluation, only when something
+needs it. Changing a value with Evaluation.set() only drops the values
+depending on it, so the rest are reused the next time they are needed.
+"""
+
+import inspect
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Node:
+    """A metric and the names of the values it depends on"""
+    name: str
+    function: callable
+    inputs: tuple
+
+
+@dataclass
+class Graph:
+    """Metrics by name"""
+    nodes: dict = field(default_factory=dict)
+    dependents: dict = field(default_factory=dict, repr=False)
+
+    def metric(self, function):
+        """Decorator registering function as the metric of its name"""
+
+        self.nodes[function.__name__] = Node(
+            function.__name__, function,
+            tuple(inspect.signature(function).parameters))
+        self.dependents.clear()
+        return function
+
+    def get_inputs(self) -> set:
+        """Names the metrics depend on that no metric defines"""
+        return {name for node in self.nodes.values() for name in node.inputs
+                if name not in self.nodes}
+
+    def get_dependents(self, name) -> set:
+        """Every metric depending on name, directly or not"""
+
+        if not self.dependents:
+            for node in self.nodes.values():
+                for input_name in node.inputs:
+                    self.dependents.setdefault(input_name, set()).add(
+                        node.name)
+
+        found = set()
+        stack = [name]
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return found
+
+
+@dataclass
+class Evaluation:
+    """Values of a graph for a set of inputs.
+    Any metric can be given too, then it isn't calculated.
+    """
+    graph: Graph
+    given: dict
+    values: dict = field(default_factory=dict)
+    calculated: int = 0  # Times a metric was calculated
+
+    def __getitem__(self, name):
+        if name in self.given:
+            return self.given[name]
+        if name not in self.values:
+            node = self.graph.nodes.get(name)
+            if node is None:
+                raise KeyError(f"'{name}' is neither a metric nor an input")
+            self.values[name] = node.function(
+                *(self[input_name] for input_name in node.inputs))
+            self.calculated += 1
+        return self.values[name]
+
+    def set(self, name, value) -> set:
+        """Changes a value, returns the metrics that will be recalculated"""
+
+        self.given[name] = value
+        stale = self.graph.get_dependents(name).intersection(self.values)
+        for dependent in stale:
+            del self.values[dependent]
+        self.values.pop(name, None)
+        return stale
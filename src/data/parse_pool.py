@@ -0,0 +1,104 @@
+"""Parses property pages and calculates their analysis in worker processes.
+Parsing is CPU bound so this lets a run use every core. Workers receive the
+raw html and send back plain records, soup objects never leave the worker.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.data import user
+from src.data.calculations import calculate_analysis, get_property_analysis
+from src.data.error_log import format_error
+from src.data.user import WebScraper
+from src.metrics import take_snapshot
+from src.profiling import get_worker_profile_dir, start_worker_profile
+from src.web import get_property_info
+from src.web.get_current_interest_rates import InterestRates
+from src.web.get_property_info import set_page_property_info, \
+    set_property_urls
+
+PARSE_WORKERS = os.cpu_count() or 1
+
+
+def create_parse_pool(interest_rate, workers=PARSE_WORKERS, offline=False,
+                      interest_rates=None) -> ProcessPoolExecutor:
+    """Starts the worker processes. Each gets the interest rate of the session
+    since they don't share the values set in this process, and the rates of
+    every loan for the financing options. Those are the rates requested this
+    session unless interest_rates is given.
+    """
+
+    if interest_rates is None:
+        interest_rates = InterestRates.interest_rates
+    pool = ProcessPoolExecutor(max_workers=workers,
+                               initializer=_init_worker,
+                               initargs=(interest_rate, offline,
+                                         get_worker_profile_dir(),
+                                         dict(interest_rates)))
+    # The first task starts every worker. Forked later, while the pipeline's
+    # threads run, a worker could inherit a lock one of them holds, such as
+    # Metrics.lock, and wait on it forever.
+    pool.submit(os.getpid).result()
+    return pool
+
+
+def _init_worker(interest_rate, offline, profile_dir=None,
+                 interest_rates=None) -> None:
+    """Runs once in each worker process"""
+
+    WebScraper.interest_rate = interest_rate
+    InterestRates.interest_rates.update(interest_rates or {})
+    get_property_info.OFFLINE = offline
+    if profile_dir is not None:
+        start_worker_profile(profile_dir)
+
+
+def analyze_page(url, page, county_office_page=None) -> dict:
+    """Parses a property page and calculates its analysis.
+    Returns a record with the url and either the scraped facts, the key and
+    analysis for analysis.json or the error record for errors.jsonl.
+    The metrics of the worker since its last record are sent along.
+    """
+
+    try:
+        set_page_property_info(url=url, page=page,
+                               county_office_page=county_office_page)
+        user.set_info()
+        calculate_analysis()
+        key, property_analysis = get_property_analysis()
+    except Exception as exception:
+        return {'url': url, 'error': format_error(url, exception),
+                'metrics': take_snapshot()}
+
+    return {
+        'url': url,
+        'key': key,
+        'facts': user.get_facts(),
+        'analysis': property_analysis,
+        'error': None,
+        'metrics': take_snapshot()
+    }
+
+
+def analyze_facts(url, facts, url_property_taxes=None) -> dict:
+    """Calculates the analysis of facts from user.get_facts() without parsing.
+    Returns the same record as analyze_page().
+    """
+
+    try:
+        set_property_urls(url, url_property_taxes)
+        user.set_facts(facts)
+        calculate_analysis()
+        key, property_analysis = get_property_analysis()
+    except Exception as exception:
+        return {'url': url, 'error': format_error(url, exception),
+                'metrics': take_snapshot()}
+
+    return {
+        'url': url,
+        'key': key,
+        'facts': facts,
+        'analysis': property_analysis,
+        'error': None,
+        'metrics': take_snapshot()
+    }
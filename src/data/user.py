@@ -23,7 +23,9 @@ class UserValues:
     maintenance_percent = MAINTENANCE_PERCENT
     management_percent = MANAGEMENT_PERCENT
     depreciation_short_percent = DEPRECIATION_SHORT_PERCENT
+    depreciation_medium_percent = DEPRECIATION_MEDIUM_PERCENT
     depreciation_long_percent = DEPRECIATION_LONG_PERCENT
+    placed_in_service_month = PLACED_IN_SERVICE_MONTH
     tax_bracket = TAX_BRACKET
     is_first_rental = IS_FIRST_RENTAL
 
@@ -52,6 +54,11 @@ class WebScraper:
 def set_info() -> None:
     """Sets the values from html pages"""
 
+    # Reset as the defaults below only ever set these to False.
+    WebScraper.found_property_taxes = True
+    WebScraper.found_num_units = True
+    WebScraper.found_rent_per_unit = True
+
     tdesc, ttaxes, tnum, trent = get_description(), get_property_taxes(), \
         get_num_units(), get_rent_per_unit()
 
@@ -84,6 +91,35 @@ def set_found() -> None:
                                              f"{WebScraper.rent_per_unit:,}")
 
 
+def get_facts() -> dict:
+    """Compact record of the values scraped for the current property"""
+
+    return {
+        'address': WebScraper.address,
+        'price': WebScraper.price,
+        'year': WebScraper.year,
+        'description': WebScraper.description,
+        'sqft': WebScraper.sqft,
+        'price_per_sqft': WebScraper.price_per_sqft,
+        'lot_size': WebScraper.lot_size,
+        'parking': WebScraper.parking,
+        'property_taxes': WebScraper.property_taxes,
+        'num_units': WebScraper.num_units,
+        'rent_per_unit': WebScraper.rent_per_unit,
+        'found_property_taxes': WebScraper.found_property_taxes,
+        'found_num_units': WebScraper.found_num_units,
+        'found_rent_per_unit': WebScraper.found_rent_per_unit
+    }
+
+
+def set_facts(facts) -> None:
+    """Sets the values from a record made by get_facts()"""
+
+    for name, value in facts.items():
+        setattr(WebScraper, name, value)
+    set_found()
+
+
 # These functions handle not finding certain values that are web scraped
 def use_default_property_taxes() -> int:
     """Returns default value for property_taxes and adjusts relevant variables.
@@ -119,47 +155,38 @@ def use_default_rent_per_unit() -> int:
         return RENT_PER_UNIT_DUPLEX
 
 
-def set_interest_rate() -> None:
-    """Sets interest rate based on loan length"""
-
-    set_page_interest_rates()
-
-    if UserValues.loan_type == 'Conventional':
-        if UserValues.years == 30:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['30-year fixed-rate']
-        elif UserValues.years == 20:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['20-year fixed-rate']
-        elif UserValues.years == 15:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['15-year fixed-rate']
-        elif UserValues.years == 10:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['10-year fixed-rate']
-        else:
-            raise ValueError(f"Invalid combination of loan type "
-                             f"'{UserValues.loan_type}' and years "
-                             f"'{UserValues.years}'."
-                             )
-    elif UserValues.loan_type == 'FHA':
-        if UserValues.years == 30:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['30-year fixed-rate FHA']
-        else:
-            raise ValueError(f"Invalid combination of loan type "
-                             f"'{UserValues.loan_type}' and years "
-                             f"'{UserValues.years}'."
-                             )
-    elif UserValues.loan_type == 'VA':
-        if UserValues.years == 30:
-            WebScraper.interest_rate = \
-                InterestRates.interest_rates['30-year fixed-rate VA']
-        else:
-            raise ValueError(f"Invalid combination of loan type "
-                             f"'{UserValues.loan_type}' and years "
-                             f"'{UserValues.years}'."
-                             )
+def set_interest_rate(page=None) -> None:
+    """Sets interest rate based on loan length.
+    Uses the rates page if given instead of requesting it.
+    """
+
+    set_page_interest_rates(page=page)
+    WebScraper.interest_rate = get_interest_rate(UserValues.loan_type,
+                                                 UserValues.years)
+
+
+def get_interest_rate(loan_type, years) -> float:
+    """Current rate of a loan. The rates must have been set by
+    set_page_interest_rates().
+    """
+
+    check_loan(loan_type, years)
+    if loan_type == 'Conventional':
+        return InterestRates.interest_rates[f"{years}-year fixed-rate"]
+    return InterestRates.interest_rates[f"30-year fixed-rate {loan_type}"]
+
+
+def check_loan(loan_type, years) -> None:
+    """Raises ValueError if there's no such loan"""
+
+    if loan_type == 'Conventional' and years in (30, 20, 15, 10):
+        return
+    elif loan_type in ('FHA', 'VA') and years == 30:
+        return
+    raise ValueError(f"Invalid combination of loan type "
+                     f"'{loan_type}' and years "
+                     f"'{years}'."
+                     )
 
 
 def get_url_from_input() -> str:
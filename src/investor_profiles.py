@@ -0,0 +1,181 @@
+"""Evaluates every analyzed property for each investor profile in
+profiles.json.
+
+A profile is a named set of assumptions, those not given are the defaults in
+values.py. Names are those of UserValues in lowercase, along with
+minimum_conc_percent for what counts as a deal:
+
+    {
+        "Default": {},
+        "Partner": {"down_payment_percent": 0.25, "loan_type": "Conventional",
+                    "years": 15, "vacancy_percent": 0.10,
+                    "minimum_conc_percent": 10}
+    }
+
+The facts of every property in analysis.json are evaluated all at once with
+src/data/batch.py, so a profile adds no requests, only computation. The deals
+of each profile are saved to output/investor_analyses.json, best first.
+"""
+
+import json
+import os.path
+
+import numpy as np
+
+from src.data.batch import get_property_batch, evaluate
+from src.data.calculations import load_property_analyses
+from src.data.colors_for_print import BAD, OK, GOOD, END
+from src.data.facts import load_facts, get_all_facts
+from src.data.formulas import RETURNS, ASSUMPTIONS
+from src.data.user import UserValues, get_interest_rate, check_loan
+from src.metrics import timer
+from src.web.get_current_interest_rates import InterestRates, \
+    set_page_interest_rates
+from values import MINIMUM_ConC_PERCENT
+
+PROFILES_FILE = 'profiles.json'
+INVESTOR_ANALYSES_FILE = os.path.join('output', 'investor_analyses.json')
+THRESHOLD = 'minimum_conc_percent'
+
+
+def load_profiles() -> dict:
+    """Name: every assumption of the profile. Empty if there's no
+    PROFILES_FILE. Raises ValueError if a profile has an unknown value or
+    loan.
+    """
+
+    try:
+        with open(PROFILES_FILE) as file:
+            profiles = json.load(file)
+    except FileNotFoundError:
+        return {}
+
+    loaded = {}
+    for name, values in profiles.items():
+        unknown = set(values).difference(ASSUMPTIONS + (THRESHOLD,))
+        if unknown:
+            raise ValueError(f"Unknown values {sorted(unknown)} in profile "
+                             f"'{name}' of {PROFILES_FILE}. Options are "
+                             f"{list(ASSUMPTIONS + (THRESHOLD,))}.")
+        loaded[name] = {value: getattr(UserValues, value)
+                        for value in ASSUMPTIONS}
+        loaded[name][THRESHOLD] = MINIMUM_ConC_PERCENT
+        loaded[name].update(values)
+        try:
+            check_loan(loaded[name]['loan_type'], loaded[name]['years'])
+        except ValueError as error:
+            raise ValueError(f"{error} In profile '{name}' of "
+                             f"{PROFILES_FILE}.") from error
+
+    return loaded
+
+
+def analyze_profiles(profiles, analysis_json=None) -> dict:
+    """Results and deals of each profile, analysis.json is loaded if
+    analysis_json isn't given. Interest rates are only requested if they
+    weren't already this session.
+    """
+
+    if analysis_json is None:
+        analysis_json = load_property_analyses()
+    if not InterestRates.interest_rates:
+        set_page_interest_rates()
+
+    assumptions = []
+    for values in profiles.values():
+        values = dict(values)
+        values['interest_rate'] = get_interest_rate(values['loan_type'],
+                                                    values['years'])
+        assumptions.append(values)
+
+    with timer('calculation_seconds', step='profiles'):
+        batch = get_property_batch(get_all_facts(analysis_json,
+                                                 load_facts()))
+        returns = None
+        if batch.keys:
+            evaluation = evaluate(batch, assumptions)
+            shape = (len(assumptions), len(batch.keys))
+            returns = {name: np.broadcast_to(evaluation[metric], shape)
+                       for name, metric in RETURNS.items()}
+
+    results = {}
+    for row, (name, values) in enumerate(zip(profiles, assumptions)):
+        deals = {}
+        if returns is not None:
+            scores = np.round(returns['Cash on Cash Return'][row], 2)
+            best = np.flatnonzero(scores > values[THRESHOLD])
+            for column in best[np.argsort(-scores[best], kind='stable')]:
+                deals[batch.keys[column]] = _get_deal(batch, returns, row,
+                                                      column)
+        results[name] = {
+            'Assumptions': values,
+            'Properties': len(batch.keys),
+            'Deals': len(deals),
+            'Best Deals': deals
+        }
+
+    return results
+
+
+def save_investor_analyses(results) -> None:
+    """Overwrites INVESTOR_ANALYSES_FILE"""
+
+    temp_path = f"{INVESTOR_ANALYSES_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(results, file, indent=4)
+    os.replace(temp_path, INVESTOR_ANALYSES_FILE)
+
+
+def print_investor_analyses(results, limit=3) -> None:
+    """Prints the number of deals and the best few of each profile"""
+
+    print(f"\n{OK}--- Investor profiles:{END}")
+    for name, result in results.items():
+        color = GOOD if result['Deals'] else BAD
+        print(f"{OK}{name}: {color}{result['Deals']}{OK} of "
+              f"{result['Properties']} properties above "
+              f"{result['Assumptions'][THRESHOLD]}% ConC{END}")
+        for deal in list(result['Best Deals'].values())[:limit]:
+            print(f"    {deal['Cash on Cash Return']:>7} ConC  "
+                  f"{deal['Cashflow per month']:>10}/mo  "
+                  f"{deal['Property URL']}")
+    print(f"{OK}Every deal of each profile in {INVESTOR_ANALYSES_FILE}{END}")
+
+
+def run_profiles(analysis_json=None) -> None:
+    """Analyzes, saves and prints the profiles, if there are any"""
+
+    profiles = load_profiles()
+    if not profiles:
+        return
+    results = analyze_profiles(profiles, analysis_json)
+    save_investor_analyses(results)
+    print_investor_analyses(results)
+
+
+def _get_deal(batch, returns, row, column) -> dict:
+    """Returns of a property for a profile, formatted as in analysis.json"""
+
+    values = {name: float(returns[name][row, column]) for name in returns}
+    return {
+        'Property URL': batch.urls[column],
+        'Price ($)': int(batch.price[column]),
+        'Return On Investment':
+            f"{round(values['Return On Investment'], 2)}%",
+        'Cash on Cash Return': f"{round(values['Cash on Cash Return'], 2)}%",
+        'Caprate': f"{round(values['Caprate'], 2)}%",
+        'Cashflow per month': f"${values['Cashflow per month']:,.2f}",
+        'Max Offer (Approximately)':
+            f"${values['Max Offer (Approximately)']:,.2f}",
+        'Emergency Fund (Recommended)':
+            f"${values['Emergency Fund (Recommended)']:,.2f}"
+    }
+
+
+def main() -> None:
+    """Main function"""
+
+    if not load_profiles():
+        print(f"{BAD}!!! No profiles in {PROFILES_FILE}. !!!{END}")
+        return
+    run_profiles()
@@ -0,0 +1,258 @@
+"""Timings and counts of a run, exported in the Prometheus text format.
+
+Hot paths are wrapped with timer() or @timed, which add to a histogram per
+metric and labels. Counters are added to with inc(). At the end of a run
+write_metrics() writes output/metrics.prom and print_summary() shows where
+the time went, slowest first.
+
+Parse pool workers have their own copy of the metrics. take_snapshot() empties
+a worker's metrics into its record, and merge() adds them to the main process.
+"""
+
+import os.path
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+from src.data.colors_for_print import OK, GOOD, END
+
+METRICS_FILE = os.path.join('output', 'metrics.prom')
+PREFIX = 'real_estate_calculator_bot_'
+
+# Upper bounds in seconds, +Inf is implied
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1, 2.5, 5, 10, 30)
+
+# Name: (type, help). Every metric that is recorded must be here.
+METRICS = {
+    'fetch_seconds': ('histogram', 'Seconds to get a page, by site'),
+    'requests_total': ('counter', 'Requests sent, by site and signal'),
+    'parse_seconds': ('histogram', 'Seconds to build the soup of a page'),
+    'extract_seconds': ('histogram',
+                        'Seconds spent in each scraper get_* function'),
+    'calculation_seconds': ('histogram', 'Seconds for each calculation step'),
+    'persist_seconds': ('histogram', 'Seconds to load or save a store'),
+    'email_seconds': ('histogram', 'Seconds to build and send the email'),
+    'properties_total': ('counter', 'Properties analyzed, by result'),
+    'strategy_total': ('counter',
+                       'Scraper strategies tried, by field and result'),
+    'strategy_seconds': ('histogram', 'Seconds for each scraper strategy'),
+    'fields_total': ('counter', 'Fields of properties found or defaulted')
+}
+
+
+@dataclass
+class Histogram:
+    """Counts of observations per bucket, not cumulative"""
+    buckets: list = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    sum: float = 0
+    count: int = 0
+
+    def observe(self, value) -> None:
+        """Adds an observation"""
+
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q) -> float:
+        """Upper bound of the bucket holding the q quantile"""
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+@dataclass
+class Metrics:
+    """Histograms and counters of this process.
+    Keys are (name, labels) with labels as a sorted tuple of pairs.
+    """
+    histograms = {}
+    counters = {}
+    lock = threading.Lock()
+
+
+def observe(name, value, **labels) -> None:
+    """Adds value, usually seconds, to the histogram of name and labels"""
+
+    key = (name, tuple(sorted(labels.items())))
+    with Metrics.lock:
+        histogram = Metrics.histograms.get(key)
+        if histogram is None:
+            histogram = Metrics.histograms[key] = Histogram()
+        histogram.observe(value)
+
+
+def inc(name, amount=1, **labels) -> None:
+    """Adds to the counter of name and labels"""
+
+    key = (name, tuple(sorted(labels.items())))
+    with Metrics.lock:
+        Metrics.counters[key] = Metrics.counters.get(key, 0) + amount
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observes the seconds the with block took, even if it raised"""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator observing the seconds every call takes.
+    Labels default to the name of the function.
+    """
+
+    def decorator(function):
+        function_labels = labels or {'function': function.__name__}
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name, **function_labels):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def take_snapshot() -> dict:
+    """Empties the metrics of this process into a picklable dict"""
+
+    with Metrics.lock:
+        snapshot = {
+            'histograms': [(name, labels, histogram.buckets, histogram.sum,
+                            histogram.count)
+                           for (name, labels), histogram
+                           in Metrics.histograms.items()],
+            'counters': list(Metrics.counters.items())
+        }
+        Metrics.histograms = {}
+        Metrics.counters = {}
+
+    return snapshot
+
+
+def merge(snapshot) -> None:
+    """Adds a snapshot from take_snapshot(), such as from a worker"""
+
+    with Metrics.lock:
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            histogram = Metrics.histograms.get((name, labels))
+            if histogram is None:
+                histogram = Metrics.histograms[(name, labels)] = Histogram()
+            histogram.buckets = [a + b for a, b in
+                                 zip(histogram.buckets, buckets)]
+            histogram.sum += total
+            histogram.count += count
+        for key, amount in snapshot['counters']:
+            Metrics.counters[key] = Metrics.counters.get(key, 0) + amount
+
+
+def get_counters(name) -> dict:
+    """Labels: amount of every counter of name"""
+
+    with Metrics.lock:
+        return {labels: amount for (counter_name, labels), amount
+                in Metrics.counters.items() if counter_name == name}
+
+
+def get_histograms(name) -> dict:
+    """Labels: (sum, count) of every histogram of name"""
+
+    with Metrics.lock:
+        return {labels: (histogram.sum, histogram.count)
+                for (histogram_name, labels), histogram
+                in Metrics.histograms.items() if histogram_name == name}
+
+
+def reset() -> None:
+    """Forgets every metric, such as at the start of a run"""
+    take_snapshot()
+
+
+def write_metrics(path=METRICS_FILE) -> None:
+    """Writes every metric in the Prometheus text format"""
+
+    with Metrics.lock:
+        histograms = sorted(Metrics.histograms.items())
+        counters = sorted(Metrics.counters.items())
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        full_name = f"{PREFIX}{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+
+        if kind == 'counter':
+            for (counter_name, labels), amount in counters:
+                if counter_name == name:
+                    lines.append(f"{full_name}{_format_labels(labels)} "
+                                 f"{amount}")
+            continue
+
+        for (histogram_name, labels), histogram in histograms:
+            if histogram_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.buckets):
+                cumulative += count
+                bucket_labels = labels + (('le', str(bound)),)
+                lines.append(f"{full_name}_bucket"
+                             f"{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} "
+                         f"{histogram.sum:.6f}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} "
+                         f"{histogram.count}")
+
+    # Written under a temporary name so a scraper never reads half a file.
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+
+def print_summary(limit=15) -> None:
+    """Prints the timers that took the most time in total, then counters"""
+
+    with Metrics.lock:
+        histograms = sorted(Metrics.histograms.items(),
+                            key=lambda item: item[1].sum, reverse=True)
+        counters = sorted(Metrics.counters.items())
+
+    if not histograms and not counters:
+        return
+
+    print(f"\n{OK}--- Where the time went (slowest first):{END}")
+    print(f"{'timer':<56} {'count':>8} {'total s':>9} {'mean ms':>9} "
+          f"{'p95 ms':>9}")
+    for (name, labels), histogram in histograms[:limit]:
+        label = f"{name}{_format_labels(labels)}"
+        print(f"{label:<56} {histogram.count:>8} {histogram.sum:>9.2f} "
+              f"{histogram.sum / histogram.count * 1000:>9.2f} "
+              f"{histogram.quantile(0.95) * 1000:>9.1f}")
+
+    for (name, labels), amount in counters:
+        print(f"{name}{_format_labels(labels)}: {GOOD}{amount}{END}")
+    print(f"{OK}Full metrics in {METRICS_FILE}{END}")
+
+
+def _format_labels(labels) -> str:
+    """{a="1",b="2"} or nothing without labels"""
+
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels)
+    return f"{{{pairs}}}"
@@ -0,0 +1,268 @@
+"""Streaming pipeline that fetches, analyzes and saves properties.
+
+Network bound fetch workers feed the parse pool which feeds a single writer.
+Stages are connected by bounded queues so downloading overlaps with
+parsing and only a handful of pages are ever held in memory at once,
+no matter how many URLs are in urls.json.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+from src.data.calculations import load_property_analyses, \
+    merge_property_analysis, dump_property_analyses
+from src.data.error_log import format_error, write_error, FETCH
+from src.data.colors_for_print import BAD, END
+from src.data.facts import load_facts, merge_facts, dump_facts
+from src.data.parse_pool import create_parse_pool, analyze_page, \
+    PARSE_WORKERS
+from src.data.user import WebScraper
+from src.metrics import merge, inc
+from src.profiling import record_slow
+from src.progress import Progress, ANALYZED, UNCHANGED, ERROR
+from src.web.get_property_info import fetch_property_page
+from src.web.rate_control import ZILLOW, MAX_CONCURRENCY
+
+# The rate controller decides how many of these are requesting at once.
+FETCH_WORKERS = MAX_CONCURRENCY
+QUEUE_SIZE = 16  # Max items waiting between two stages
+PARSE_IN_FLIGHT = PARSE_WORKERS * 2  # Max pages sent to the parse pool
+WRITE_BATCH_SIZE = 100  # Analyses merged before analysis.json is saved
+
+_DONE = None  # Tells the next stage that no more items are coming
+
+
+@dataclass
+class Stage:
+    """Throughput of a single stage of the pipeline"""
+    name: str
+    workers: int
+    processed: int = 0
+    errors: int = 0
+    busy: float = 0  # Seconds spent working, summed across workers
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, seconds, error=False) -> None:
+        """Records a processed item"""
+        with self.lock:
+            self.processed += 1
+            self.errors += error
+            self.busy += seconds
+
+
+@dataclass
+class Pipeline:
+    """Stages and queues of a single run"""
+    urls: queue.Queue
+    pages: queue.Queue
+    results: queue.Queue
+    fetch: Stage
+    analyze: Stage
+    write: Stage
+    progress: Progress
+    done: threading.Event
+
+
+def run_pipeline(urls, skipped=0) -> None:
+    """Fetches, analyzes and saves every url to analysis.json.
+    skipped is how many urls were left out, such as duplicates, for progress.
+    """
+
+    urls = list(urls)
+    pipeline = Pipeline(
+        urls=queue.Queue(maxsize=QUEUE_SIZE),
+        pages=queue.Queue(maxsize=QUEUE_SIZE),
+        results=queue.Queue(maxsize=QUEUE_SIZE),
+        fetch=Stage('fetch', FETCH_WORKERS),
+        analyze=Stage('analyze', PARSE_WORKERS),
+        write=Stage('write', 1),
+        progress=Progress(total=len(urls), skipped=skipped),
+        done=threading.Event()
+    )
+
+    with create_parse_pool(WebScraper.interest_rate) as pool:
+        threads = [threading.Thread(target=_feed, args=(pipeline, urls))]
+        threads += [threading.Thread(target=_fetch_worker, args=(pipeline,))
+                    for _ in range(FETCH_WORKERS)]
+        threads.append(threading.Thread(target=_analyze_worker,
+                                        args=(pipeline, pool)))
+        writer = threading.Thread(target=_write_worker, args=(pipeline,))
+        monitor = threading.Thread(target=_monitor, args=(pipeline,))
+
+        # Daemon threads so an interrupt doesn't wait on a slow request.
+        for thread in threads + [writer, monitor]:
+            thread.daemon = True
+            thread.start()
+
+        writer.join()
+        pipeline.done.set()
+        monitor.join()
+    stages, extra = _get_progress(pipeline)
+    pipeline.progress.report(stages, extra, final=True)
+
+
+def _feed(pipeline, urls) -> None:
+    """Puts every url on the first queue, blocking while it is full"""
+
+    for url in urls:
+        pipeline.urls.put(url)
+    for _ in range(FETCH_WORKERS):
+        pipeline.urls.put(_DONE)
+
+
+def _fetch_worker(pipeline) -> None:
+    """Downloads property pages. Several of these run at once."""
+
+    while True:
+        url = pipeline.urls.get()
+        if url is _DONE:
+            break
+
+        start = time.perf_counter()
+        try:
+            page, error = fetch_property_page(url), None
+        except Exception as exception:
+            page, error = None, exception
+        pipeline.fetch.record(time.perf_counter() - start, error is not None)
+        pipeline.pages.put((url, page, error))
+
+    pipeline.pages.put(_DONE)
+
+
+def _analyze_worker(pipeline, pool) -> None:
+    """Sends pages to the parse pool and passes on the records it returns.
+    At most PARSE_IN_FLIGHT pages are waiting in the pool at once. If a
+    worker process dies, the pool is broken and every page left becomes an
+    error.
+    """
+
+    pending = {}  # Future: (url, time it was submitted)
+    remaining_fetchers = FETCH_WORKERS
+    broken = None  # BrokenProcessPool once a worker process died
+    try:
+        while remaining_fetchers:
+            item = pipeline.pages.get()
+            if item is _DONE:
+                remaining_fetchers -= 1
+                continue
+
+            url, page, error = item
+            if error is not None:
+                pipeline.analyze.record(0, error=True)
+                pipeline.results.put(
+                    {'url': url, 'error': format_error(url, error, FETCH)})
+                continue
+
+            if broken is None:
+                try:
+                    future = pool.submit(analyze_page, url, page)
+                except BrokenProcessPool as exception:
+                    # The pool fails the pages it had, which become errors.
+                    broken = exception
+                    _collect_parsed(pipeline, pending, ALL_COMPLETED)
+                else:
+                    pending[future] = (url, time.perf_counter())
+                    if len(pending) >= PARSE_IN_FLIGHT:
+                        _collect_parsed(pipeline, pending, FIRST_COMPLETED)
+                    continue
+
+            # Pages keep being taken so the fetch workers can finish.
+            pipeline.analyze.record(0, error=True)
+            pipeline.results.put({'url': url,
+                                  'error': format_error(url, broken)})
+
+        _collect_parsed(pipeline, pending, ALL_COMPLETED)
+    finally:
+        pipeline.results.put(_DONE)
+
+
+def _collect_parsed(pipeline, pending, return_when) -> None:
+    """Waits for parsed pages and puts their records on the results queue"""
+
+    done, _ = wait(pending, return_when=return_when)
+    for future in done:
+        url, submitted = pending.pop(future)
+        try:
+            record = future.result()
+            merge(record.pop('metrics'))
+        except Exception as exception:  # Worker process died
+            record = {'url': url, 'error': format_error(url, exception)}
+        seconds = time.perf_counter() - submitted
+        pipeline.analyze.record(seconds, error=record['error'] is not None)
+        record_slow('analyze', url, seconds,
+                    'error' if record['error'] is not None else '')
+        pipeline.results.put(record)
+
+
+def _write_worker(pipeline) -> None:
+    """Merges analyses into analysis.json, saving every WRITE_BATCH_SIZE.
+    The facts of every property analyzed go to facts.json.
+    """
+
+    analysis_json = load_property_analyses()
+    facts_json = load_facts()
+    unsaved = 0
+
+    while True:
+        item = pipeline.results.get()
+        if item is _DONE:
+            break
+
+        start = time.perf_counter()
+
+        inc('properties_total',
+            result='analyzed' if item['error'] is None else 'error')
+        if item['error'] is not None:
+            write_error(item['error'])
+            pipeline.progress.record(ERROR)
+            pipeline.progress.message(
+                f"{BAD}!!! ERROR ANALYZING THIS PROPERTY. CHECK "
+                f"\\output\\errors.jsonl FOR DETAILS. !!!{END} --- "
+                f"{item['url']}")
+        else:
+            merge_facts(facts_json, item)
+            merged = merge_property_analysis(analysis_json, item['key'],
+                                             item['analysis'])
+            pipeline.progress.record(ANALYZED if merged else UNCHANGED)
+            unsaved += merged
+
+        if unsaved >= WRITE_BATCH_SIZE:
+            dump_property_analyses(analysis_json)
+            dump_facts(facts_json)
+            unsaved = 0
+        pipeline.write.record(time.perf_counter() - start,
+                              error=item['error'] is not None)
+
+    if unsaved:
+        dump_property_analyses(analysis_json)
+    dump_facts(facts_json)
+
+
+def _monitor(pipeline) -> None:
+    """Reports progress until the pipeline is done"""
+
+    while not pipeline.done.wait(1):
+        pipeline.progress.tick(*_get_progress(pipeline))
+
+
+def _get_progress(pipeline) -> tuple:
+    """Finished items of every stage and the state of the queues and zillow.
+    The write stage goes last since it finishes a property.
+    """
+
+    stages = {'requests': ZILLOW.completed}
+    for stage in (pipeline.fetch, pipeline.analyze, pipeline.write):
+        stages[stage.name] = stage.processed
+    extra = {
+        'queued': {'urls': pipeline.urls.qsize(),
+                   'pages': pipeline.pages.qsize(),
+                   'results': pipeline.results.qsize()},
+        'requests_at_once': f"{ZILLOW.active}/{int(ZILLOW.limit)}",
+        'backed_off': ZILLOW.backed_off
+    }
+
+    return stages, extra
@@ -0,0 +1,307 @@
+"""Totals of buying a set of analyzed properties together, and what-ifs.
+
+Properties are selected from analysis.json by a saved search in urls.json, by
+a tag in output/tags.json, or all of them. Every stored property is evaluated
+once as stacked arrays of FORMULAS (src/data/batch.py), from the facts in
+facts.json. The selection is summed from those arrays: capital required,
+monthly cashflow and debt service, emergency fund, the amortization schedules
+in closed form and the tax savings of each year.
+
+With --what-if, properties can then be bought or sold and assumptions changed
+from the terminal. Buying or selling only changes which properties are summed,
+changing an assumption only recalculates the metrics that depend on it.
+
+    python run_portfolio.py --tag duplexes --add URL [URL ...]
+    python run_portfolio.py --search URL --what-if
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os.path
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.data.batch import get_property_batch, get_batch_inputs, \
+    get_user_assumptions
+from src.data.calculations import load_property_analyses
+from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
+from src.data.facts import load_facts, get_all_facts
+from src.data.formulas import FORMULAS, ASSUMPTIONS, amortization_schedule
+from src.data.graph import Evaluation
+from src.data.user import UserValues, WebScraper, set_interest_rate, \
+    get_interest_rate, check_loan
+from src.web.property_keys import get_property_key_from_url
+
+TAGS_FILE = os.path.join('output', 'tags.json')
+BALANCE_YEARS = (1, 5, 10, 15, 30)  # Years after buying to show the balance
+TAX_SAVINGS_YEARS = 5  # First years to show the tax savings of
+# Assumptions that can be changed in a what-if. Changing the loan type would
+# change its fees and rate too. Changing years changes the rate to that of
+# the loan type in values.py.
+CHANGEABLE = tuple(name for name in ASSUMPTIONS if name != 'loan_type') \
+    + ('interest_rate', 'minimum_conc_percent')
+
+
+@dataclass
+class Portfolio:
+    """Every stored property evaluated at once, and which of them are
+    bought. Arrays have an element per property.
+    """
+    keys: list
+    urls: list
+    evaluation: Evaluation
+    bought: np.ndarray  # Of bool
+
+
+def load_tags() -> dict:
+    """Tag: property keys. Empty if there's no TAGS_FILE."""
+
+    try:
+        with open(TAGS_FILE) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def dump_tags(tags) -> None:
+    """Overwrites TAGS_FILE"""
+
+    temp_path = f"{TAGS_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(tags, file, indent=4)
+    os.replace(temp_path, TAGS_FILE)
+
+
+def tag_properties(tag, urls) -> int:
+    """Adds the properties of urls to tag. Returns how many were new."""
+
+    tags = load_tags()
+    keys = tags.setdefault(tag, [])
+    new = [key for key in dict.fromkeys(map(get_property_key_from_url, urls))
+           if key not in keys]
+    keys.extend(new)
+    dump_tags(tags)
+    return len(new)
+
+
+def get_selection(search=None, tag=None) -> set | None:
+    """Keys of the properties of a saved search or a tag, None for all"""
+
+    if tag is not None:
+        return set(load_tags().get(tag, []))
+    if search is None:
+        return None
+
+    try:
+        with open(os.path.join('output', 'urls.json')) as json_file:
+            urls_json = json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        urls_json = {}
+    return {get_property_key_from_url(url)
+            for url in urls_json.get('Search', {}).get(search, [])}
+
+
+def create_portfolio(facts_json, selection=None) -> Portfolio:
+    """Evaluates every property in facts_json under the current UserValues
+    and interest rate, buying those in selection or all of them if None.
+    """
+
+    batch = get_property_batch(facts_json)
+    evaluation = Evaluation(
+        FORMULAS, get_batch_inputs(batch, [get_user_assumptions()]))
+    bought = np.array([selection is None or key in selection
+                       for key in batch.keys], dtype=bool)
+    return Portfolio(batch.keys, batch.urls, evaluation, bought)
+
+
+def get_totals(portfolio) -> dict:
+    """Totals of the bought properties, as saved or printed"""
+
+    def column(metric) -> np.ndarray:
+        return np.broadcast_to(portfolio.evaluation[metric],
+                               (1, len(portfolio.keys)))[0][portfolio.bought]
+
+    capital_required = float(column('capital_required').sum())
+    cashflow = float(column('cashflow').sum())
+    schedule = amortization_schedule(
+        *(column(name) for name in ('interest_rate_monthly', 'months', 'loan',
+                                    'monthly_payment')))
+    balance = schedule['Loan Balance'].sum(axis=0)
+    tax_savings = portfolio.evaluation['tax_savings_schedule'][0][
+        portfolio.bought].sum(axis=0)
+
+    return {
+        "Properties": int(portfolio.bought.sum()),
+        "Capital Required ($)": round(capital_required, 2),
+        "Cashflow [Monthly] ($)": round(cashflow / 12, 2),
+        "Debt Service [Monthly] ($)":
+            round(float(-column('debt_service').sum()) / 12, 2),
+        "Cash on Cash Return":
+            f"{round(cashflow / capital_required * 100, 2)}%"
+            if capital_required else None,
+        "Emergency Fund ($)": round(float(column('emergency_fund').sum()), 2),
+        "Principal Paid [Year 1] ($)":
+            round(float(-schedule['Principal Payment'][:, :12].sum()), 2),
+        "Loan Balance ($)": {
+            # + 0.0 so a paid off balance isn't -0.0
+            f"Year {year}": round(float(-balance[year * 12 - 1]), 2) + 0.0
+            if year * 12 <= len(balance) else 0.0
+            for year in BALANCE_YEARS
+        },
+        "Tax Savings ($)": {
+            f"Year {year + 1}": round(float(savings), 2)
+            for year, savings in enumerate(tax_savings[:TAX_SAVINGS_YEARS])
+        }
+    }
+
+
+def print_totals(totals) -> None:
+    """Prints the totals from get_totals()"""
+
+    print(f"\n{OK}--- Portfolio of {GOOD}{totals['Properties']}{OK} "
+          f"properties:{END}")
+    for name, value in totals.items():
+        if name == 'Properties':
+            continue
+        if isinstance(value, dict):
+            value = ', '.join(f"{year}: ${amount:,.2f}"
+                              for year, amount in value.items())
+        elif isinstance(value, float):
+            value = f"${value:,.2f}"
+        print(f"{OK}{name}: {GREAT}{value}{END}")
+
+
+def buy(portfolio, urls, bought=True) -> list:
+    """Buys, or sells, the properties of urls. Returns the urls of those that
+    aren't stored.
+    """
+
+    columns = {key: column for column, key in enumerate(portfolio.keys)}
+    missing = []
+    for url in urls:
+        column = columns.get(get_property_key_from_url(url))
+        if column is None:
+            missing.append(url)
+        else:
+            portfolio.bought[column] = bought
+    return missing
+
+
+def buy_best(portfolio, count) -> None:
+    """Buys only the count properties with the best Cash on Cash Return"""
+
+    returns = np.broadcast_to(portfolio.evaluation['c_on_c_return_percent'],
+                              (1, len(portfolio.keys)))[0]
+    portfolio.bought[:] = False
+    portfolio.bought[np.argsort(-returns, kind='stable')[:count]] = True
+
+
+def change_assumption(portfolio, name, value) -> int:
+    """Changes an assumption of every property. Returns how many metrics
+    will be recalculated.
+    """
+
+    if name not in CHANGEABLE:
+        raise ValueError(f"Unknown assumption '{name}'. Options are "
+                         f"{list(CHANGEABLE)}.")
+
+    changes = {name: value}
+    if name == 'years':
+        check_loan(UserValues.loan_type, value)
+        try:
+            changes['interest_rate'] = get_interest_rate(UserValues.loan_type,
+                                                         int(value))
+        except KeyError:
+            raise ValueError(f"No interest rate for a {int(value)}-year "
+                             f"{UserValues.loan_type} loan was requested, "
+                             f"run without --rate to change years.")
+
+    stale = set()
+    for changed, changed_value in changes.items():
+        stale |= portfolio.evaluation.set(
+            changed, np.array([[changed_value]], dtype=float))
+    return len(stale)
+
+
+def what_if(portfolio) -> None:
+    """Changes the portfolio from commands typed in the terminal, printing
+    the totals after each
+    """
+
+    print(f"\n{OK}Commands: buy URL..., sell URL..., best N, "
+          f"set ASSUMPTION VALUE, show, quit{END}")
+    while True:
+        try:
+            command, *args = input('> ').split() or ['show']
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        try:
+            if command == 'quit':
+                return
+            elif command in ('buy', 'sell'):
+                for url in buy(portfolio, args, bought=command == 'buy'):
+                    print(f"{BAD}Not analyzed: {url}{END}")
+            elif command == 'best':
+                buy_best(portfolio, int(args[0]))
+            elif command == 'set':
+                recalculated = change_assumption(portfolio, args[0],
+                                                 float(args[1]))
+                print(f"{OK}{recalculated} metrics recalculated.{END}")
+            elif command != 'show':
+                print(f"{BAD}Unknown command '{command}'.{END}")
+                continue
+        except IndexError:
+            print(f"{BAD}Missing a value.{END}")
+            continue
+        except ValueError as error:
+            print(f"{BAD}{error}{END}")
+            continue
+        print_totals(get_totals(portfolio))
+
+
+def main() -> None:
+    """Main function"""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--search', help='only the properties of this saved '
+                                         'search in urls.json')
+    parser.add_argument('--tag', help='only the properties with this tag')
+    parser.add_argument('--add', nargs='+', metavar='URL',
+                        help='with --tag, tags these properties first')
+    parser.add_argument('--rate', type=float,
+                        help='interest rate to use as a fraction instead of '
+                             'requesting the current rate')
+    parser.add_argument('--what-if', action='store_true',
+                        help='change the portfolio from the terminal')
+    # --profile is handled by run_profiled()
+    args, _ = parser.parse_known_args()
+
+    if args.add:
+        if args.tag is None:
+            print(f"{BAD}!!! --add needs a --tag. !!!{END}")
+            return
+        added = tag_properties(args.tag, args.add)
+        print(f"{OK}Tagged {GOOD}{added}{OK} properties as "
+              f"'{args.tag}'.{END}")
+
+    analysis_json = load_property_analyses()
+    facts_json = get_all_facts(analysis_json, load_facts())
+    if not facts_json:
+        print(f"\n{BAD}!!! Error: No analyses... !!!{END}")
+        print(f"{GREAT}Run run_analyses.py first.{END}")
+        return
+
+    if args.rate is None:
+        set_interest_rate()
+    else:
+        WebScraper.interest_rate = args.rate
+
+    portfolio = create_portfolio(facts_json,
+                                 get_selection(args.search, args.tag))
+    print_totals(get_totals(portfolio))
+    if args.what_if:
+        what_if(portfolio)
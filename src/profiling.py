@@ -0,0 +1,278 @@
+"""Profiling mode for the run_*.py entry points.
+
+Passing --profile to an entry point profiles the whole run and writes to a
+new folder in output/profiles/:
+    cpu.prof and cpu.txt - cProfile of every thread and parse pool worker,
+        merged. Open cpu.prof with pstats or snakeviz.
+    memory.txt - Top allocation sites from tracemalloc.
+    slow.txt - The slowest requests and page analyses, by url.
+    samples.folded - Stacks sampled every few milliseconds, only with
+        --profile-sampling. Load it in a flame graph viewer.
+A summary of the hottest functions is printed at the end.
+
+Without --profile nothing is patched or started. The hooks elsewhere only
+check Profile.directory, which is None.
+"""
+
+import argparse
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing.util import Finalize
+
+from src.data.colors_for_print import OK, GOOD, END
+
+PROFILES_DIR = os.path.join('output', 'profiles')
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 40  # Functions listed in cpu.txt, per sort order
+TOP_ALLOCATIONS = 30
+TOP_SLOW = 50  # Slowest requests and analyses kept in slow.txt
+SUMMARY_FUNCTIONS = 10
+
+
+@dataclass
+class Profile:
+    """State of the profiling session. directory is None when not profiling."""
+    directory = None
+    thread_profilers = []
+    slow = []  # Heap of (seconds, stage, url, detail), fastest first
+    lock = threading.Lock()
+
+
+def run_profiled(main, argv=None) -> None:
+    """Runs main, profiling it if --profile is in the arguments"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--profile-sampling', action='store_true')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    if not args.profile and not args.profile_sampling:
+        main()
+        return
+
+    name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    Profile.directory = os.path.join(
+        PROFILES_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{name}")
+    os.makedirs(Profile.directory, exist_ok=True)
+
+    # Started first so the sampler's own thread isn't profiled.
+    sampler = _Sampler() if args.profile_sampling else None
+    if sampler:
+        sampler.start()
+    original_thread_run = threading.Thread.run
+    threading.Thread.run = _profiled_thread_run(original_thread_run)
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+
+    profiler.enable()
+    try:
+        main()
+    finally:
+        profiler.disable()
+        if sampler:
+            sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        threading.Thread.run = original_thread_run
+
+        stats = _merge_cpu_profiles(profiler)
+        _write_cpu(stats)
+        _write_memory(snapshot)
+        _write_slow()
+        if sampler:
+            sampler.write(os.path.join(Profile.directory, 'samples.folded'))
+        _print_summary(stats)
+        Profile.directory = None
+
+
+def record_slow(stage, url, seconds, detail='') -> None:
+    """Keeps the slowest requests and analyses by url. No op unless profiling."""
+
+    if Profile.directory is None:
+        return
+    with Profile.lock:
+        item = (seconds, stage, url, detail)
+        if len(Profile.slow) < TOP_SLOW:
+            heapq.heappush(Profile.slow, item)
+        else:
+            heapq.heappushpop(Profile.slow, item)
+
+
+def get_worker_profile_dir():
+    """Folder parse pool workers write their profile to, None if not profiling.
+    Passed to the workers since they don't share this process' state.
+    """
+    return Profile.directory
+
+
+def start_worker_profile(directory) -> None:
+    """Profiles a parse pool worker until it exits"""
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    path = os.path.join(directory, f"worker-{os.getpid()}.prof")
+    # Finalizers still run when a pool worker exits, atexit handlers don't.
+    Finalize(None, _dump_worker_profile, args=(profiler, path),
+             exitpriority=10)
+
+
+def _dump_worker_profile(profiler, path) -> None:
+    """Writes the profile of a worker when it exits"""
+
+    profiler.disable()
+    profiler.dump_stats(path)
+
+
+def _profiled_thread_run(original_run):
+    """Thread.run that profiles the thread, cProfile only sees its own thread"""
+
+    def run(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler already covers this thread
+            original_run(self)
+            return
+        try:
+            original_run(self)
+        finally:
+            profiler.disable()
+            with Profile.lock:
+                Profile.thread_profilers.append(profiler)
+
+    return run
+
+
+def _merge_cpu_profiles(profiler) -> pstats.Stats:
+    """Main thread, other threads and worker processes in a single profile"""
+
+    stats = pstats.Stats(profiler)
+    with Profile.lock:
+        for thread_profiler in Profile.thread_profilers:
+            stats.add(thread_profiler)
+        Profile.thread_profilers.clear()
+
+    for name in os.listdir(Profile.directory):
+        if name.startswith('worker-'):
+            path = os.path.join(Profile.directory, name)
+            stats.add(path)
+            os.remove(path)
+
+    return stats
+
+
+def _write_cpu(stats) -> None:
+    """cpu.prof for tools, cpu.txt for reading"""
+
+    stats.dump_stats(os.path.join(Profile.directory, 'cpu.prof'))
+
+    text = io.StringIO()
+    stats.stream = text
+    for sort in ('tottime', 'cumulative'):
+        text.write(f"Top {TOP_FUNCTIONS} functions by {sort}\n")
+        stats.sort_stats(sort).print_stats(TOP_FUNCTIONS)
+    stats.stream = sys.stdout
+
+    with open(os.path.join(Profile.directory, 'cpu.txt'), 'w') as file:
+        file.write(text.getvalue())
+
+
+def _write_memory(snapshot) -> None:
+    """Top allocation sites still allocated at the end of the run"""
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>')
+    ))
+    statistics = snapshot.statistics('lineno')
+
+    with open(os.path.join(Profile.directory, 'memory.txt'), 'w') as file:
+        file.write(f"Top {TOP_ALLOCATIONS} allocation sites, "
+                   f"{sum(stat.size for stat in statistics) / 2**20:.1f} "
+                   f"MiB traced in total\n\n")
+        for stat in statistics[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            file.write(f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} "
+                       f"blocks  {frame.filename}:{frame.lineno}\n")
+
+
+def _write_slow() -> None:
+    """Slowest requests and analyses, slowest first"""
+
+    with Profile.lock:
+        slow = sorted(Profile.slow, reverse=True)
+        Profile.slow.clear()
+
+    with open(os.path.join(Profile.directory, 'slow.txt'), 'w') as file:
+        file.write(f"Slowest {TOP_SLOW} requests and analyses\n\n")
+        for seconds, stage, url, detail in slow:
+            file.write(f"{seconds:>8.3f}s {stage:<10} {detail:<12} {url}\n")
+
+
+def _print_summary(stats) -> None:
+    """Prints the functions with the most time spent in them"""
+
+    print(f"\n{OK}--- Hottest functions (own time):{END}")
+    stats.sort_stats('tottime')
+    for function in stats.fcn_list[:SUMMARY_FUNCTIONS]:
+        calls, _, own_time, cumulative, _ = stats.stats[function]
+        filename, line, name = function
+        print(f"{own_time:>8.2f}s own {cumulative:>8.2f}s total "
+              f"{calls:>9} calls  {name} "
+              f"({os.path.basename(filename)}:{line})")
+    print(f"{OK}Profile written to {GOOD}{Profile.directory}{END}")
+
+
+@dataclass
+class _Sampler:
+    """Samples the stack of every thread, for flame graphs"""
+    counts: dict = field(default_factory=dict)  # Folded stack: samples
+    stopped: threading.Event = field(default_factory=threading.Event)
+    thread: threading.Thread = None
+
+    def start(self) -> None:
+        """Starts sampling in the background"""
+
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling"""
+
+        self.stopped.set()
+        self.thread.join()
+
+    def _sample(self) -> None:
+        """Counts the stack of every other thread, every SAMPLE_INTERVAL"""
+
+        own_id = threading.get_ident()
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} "
+                                 f"({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def write(self, path) -> None:
+        """Writes stacks in the folded format, one 'stack count' per line"""
+
+        with open(path, 'w') as file:
+            for stack, count in sorted(self.counts.items()):
+                file.write(f"{stack} {count}\n")
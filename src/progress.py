@@ -0,0 +1,177 @@
+"""Progress of a run with an ETA from the measured throughput.
+
+Throughput of every stage is an exponentially weighted moving average of the
+items it finished between two reports, so the ETA follows slow pages, retries
+and back off instead of a guessed time per request. On a terminal a status
+line is printed every CONSOLE_INTERVAL seconds. When the output isn't a
+terminal, such as a scheduled run logging to a file, a JSON line is printed
+every LOG_INTERVAL seconds instead. Other lines printed during a run, such
+as errors, go through Progress.message() so they don't break into a status
+line.
+"""
+
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from src.data.colors_for_print import GOOD, END
+
+EWMA_ALPHA = 0.3  # Weight of the latest interval in the moving average
+CONSOLE_INTERVAL = 10  # Seconds between status lines on a terminal
+LOG_INTERVAL = 60  # Seconds between JSON lines otherwise
+
+# Outcomes of an item
+ANALYZED, UNCHANGED, ERROR = 'analyzed', 'unchanged', 'error'
+
+
+@dataclass
+class Throughput:
+    """Moving average of items per second of a single stage"""
+    rate: float = 0
+    count: int = 0
+    measured_at: float = field(default_factory=time.perf_counter)
+    started: bool = False
+
+    def update(self, count, now) -> float:
+        """Adds the items finished since the last update"""
+
+        elapsed = now - self.measured_at
+        if elapsed <= 0:
+            return self.rate
+
+        latest = (count - self.count) / elapsed
+        # The first interval has nothing to average with.
+        self.rate = latest if not self.started \
+            else EWMA_ALPHA * latest + (1 - EWMA_ALPHA) * self.rate
+        self.started = True
+        self.count = count
+        self.measured_at = now
+        return self.rate
+
+
+@dataclass
+class Progress:
+    """Counts and throughput of a run of total items"""
+    total: int
+    skipped: int = 0  # Items that were never started, such as duplicates
+    interactive: bool = field(default_factory=sys.stdout.isatty)
+    start: float = field(default_factory=time.perf_counter)
+    reported_at: float = field(default_factory=time.perf_counter)
+    counts: dict = field(default_factory=lambda: {ANALYZED: 0, UNCHANGED: 0,
+                                                  ERROR: 0})
+    throughputs: dict = field(default_factory=dict)  # Stage: Throughput
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, outcome) -> None:
+        """Records a finished item"""
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def message(self, text) -> None:
+        """Prints a line of its own between the reports"""
+
+        # Clears whatever is on the terminal line first.
+        with self.lock:
+            print(f"\r\033[K{text}" if self.interactive else text,
+                  flush=True)
+
+    @property
+    def done(self) -> int:
+        """Items finished, whatever the outcome"""
+        return sum(self.counts.values())
+
+    def tick(self, stages, extra=None) -> None:
+        """Reports if the interval passed since the last report.
+        stages maps a stage name to how many items it has finished, the last
+        one is the stage the ETA is based on. extra is added as is, with
+        snake_case names.
+        """
+
+        interval = CONSOLE_INTERVAL if self.interactive else LOG_INTERVAL
+        if time.perf_counter() - self.reported_at >= interval:
+            self.report(stages, extra)
+
+    def report(self, stages, extra=None, final=False) -> None:
+        """Prints the progress now"""
+
+        now = time.perf_counter()
+        self.reported_at = now
+        if final:  # Average of the whole run
+            rates = {name: count / (now - self.start)
+                     for name, count in stages.items()}
+        else:
+            rates = {name: self.throughputs.setdefault(
+                         name, Throughput(measured_at=self.start)
+                     ).update(count, now) for name, count in stages.items()}
+        rate = list(rates.values())[-1] if rates else 0
+        remaining = self.total - self.done
+        eta = remaining / rate if rate > 0 else None
+        if final:
+            eta = 0
+
+        if self.interactive:
+            self._print_line(now, rates, eta, extra or {})
+        else:
+            self._print_json(now, rates, eta, extra or {}, final)
+
+    def _print_line(self, now, rates, eta, extra) -> None:
+        """Status line for a terminal"""
+
+        percent = self.done / self.total * 100 if self.total else 100
+        counts = ', '.join(f"{name} {count}"
+                           for name, count in self.counts.items())
+        throughput = ', '.join(f"{name} {rate:.2f}/s"
+                               for name, rate in rates.items())
+        details = ' | '.join(f"{name.replace('_', ' ')}: "
+                             f"{_format_value(value)}"
+                             for name, value in extra.items())
+
+        with self.lock:
+            print(f"{GOOD}[{_format_seconds(now - self.start)}] "
+                  f"{self.done}/{self.total} ({percent:.0f}%) | ETA "
+                  f"{_format_seconds(eta)} | {counts}, skipped "
+                  f"{self.skipped} | {throughput}"
+                  f"{' | ' if details else ''}{details}{END}", flush=True)
+
+    def _print_json(self, now, rates, eta, extra, final) -> None:
+        """Structured line for logs"""
+
+        line = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'event': 'finished' if final else 'progress',
+            'elapsed_seconds': round(now - self.start, 1),
+            'done': self.done,
+            'total': self.total,
+            **self.counts,
+            'skipped': self.skipped,
+            'per_second': {name: round(rate, 3)
+                           for name, rate in rates.items()},
+            'eta_seconds': None if eta is None else round(eta),
+            **extra
+        }
+        with self.lock:
+            print(json.dumps(line), flush=True)
+
+
+def _format_value(value) -> str:
+    """Dicts as 'a 1, b 2', anything else as is"""
+
+    if isinstance(value, dict):
+        return ', '.join(f"{name} {item}" for name, item in value.items())
+    return str(value)
+
+
+def _format_seconds(seconds) -> str:
+    """1h02m, 4m05s or 12s. ? if unknown."""
+
+    if seconds is None:
+        return '?'
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
@@ -8,12 +8,20 @@ from dataclasses import dataclass
 from src.data.calculations import write_urls, write_urls_ignore
 from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
 from src.data.user import get_url_from_input
-from src.web.get_property_urls_from_search import is_url_valid, get_all_urls
+from src.web.get_property_urls_from_search import is_url_valid, \
+    get_all_urls, SearchPage
+from src.web.endpoints import ZILLOW_URL
+from src.web.property_keys import get_property_key_from_url
 
 # Used for delaying terminating program so user can read final text
 EXIT_TIMER = 2
 DELAY_TO_GET_URLS = 5
 
+# Refreshing a search stops at the first page of already known listings.
+# Every FULL_CRAWL_INTERVAL seconds all pages are crawled to catch removals.
+INCREMENTAL_CRAWL = True
+FULL_CRAWL_INTERVAL = 24 * 60 * 60
+
 # Use for navigating through menus
 S_P_R_I, SEARCH, PROPERTY, REFRESH, IGNORE = \
     's_p_r_i', 's', 'p', 'r', 'i'
@@ -50,11 +58,12 @@ def _url_is_valid(state, url_test) -> bool:
     _print_captions(verifying_url=True)
 
     # If not zillow URL, return false
-    if url_test[:23] != 'https://www.zillow.com/' or len(url_test) <= 29:
+    if not url_test.startswith(f"{ZILLOW_URL}/") \
+            or len(url_test) <= len(ZILLOW_URL) + 6:
         return False
 
     # Handles special case of search url
-    if url_test[:28] == 'https://www.zillow.com/homes':
+    if url_test.startswith(f"{ZILLOW_URL}/homes"):
         if not state.is_search:
             return False
 
@@ -207,11 +216,12 @@ def _print_captions(mode=None, e=False, verifying_url=False, valid=True,
               )
 
 
-def add_link(state, mode=None, refresh_no_input=False) -> None:
+def add_link(state=None, mode=None, refresh_no_input=False) -> None:
     """Logic for adding URLs"""
 
     # If refreshing urls from run_refresh_listings_and_analyses.py. Skips input.
     if refresh_no_input:
+        state = state or _new_state()
         state.is_search = True
         _commit_updates_to_file(state)
         return
@@ -352,19 +362,41 @@ def _get_urls_from_search() -> None:
         except FileNotFoundError:
             urls_txt = set()
 
+        watermarks = _get_search_watermarks()
+
         # Get property URLs for each Search URL and place them under their
         # respective Search URL. Coverts result list -> set -> list to remove
         # any potential duplicates. Should be none but don't want any
         # chance of making redundant get request for the analysis.
         for search_url in urls_json.setdefault('Search', dict()):
+            # Appending or overwriting search urls clears their saved property
+            # urls, those need a full crawl as there is nothing to keep.
+            watermark = watermarks.get(search_url)
+            full_crawl = not INCREMENTAL_CRAWL or not watermark or \
+                not urls_json['Search'][search_url] or \
+                time.time() - watermark['Last Full Crawl'] > FULL_CRAWL_INTERVAL
 
             # Gets all URLs from the search link. Any duplicate properties
             # compared to urls in 'Property' in urls.json is removed. This
             # way if user deletes a specific property to track,
             # the analysis of that property can be easily deleted as well.
-            urls_search = set(get_all_urls(search_url))
-            urls_properties = set(urls_json.get('Property', set()))
-            urls_search.difference_update(urls_properties)
+            urls_search = set(get_all_urls(
+                search_url, known=None if full_crawl else watermark['Listings']
+            ))
+
+            # Pages after an early stop are unchanged, keep the previous URLs.
+            if SearchPage.complete:
+                watermarks[search_url] = {'Listings': SearchPage.listings,
+                                          'Last Full Crawl': time.time()}
+            else:
+                urls_search.update(urls_json['Search'][search_url])
+                watermark['Listings'].update(SearchPage.listings)
+
+            keys_properties = {get_property_key_from_url(url)
+                               for url in urls_json.get('Property', set())}
+            urls_search = {url for url in urls_search
+                           if get_property_key_from_url(url)
+                           not in keys_properties}
             urls_search.difference_update(urls_txt)
 
             # Converts urls_search back to list to add to json.
@@ -374,15 +406,39 @@ def _get_urls_from_search() -> None:
         with open(os.path.join('output', 'urls.json'), 'w') as json_file:
             json.dump(urls_json, json_file, indent=4)
 
+        # Only keep watermarks of searches that are still tracked.
+        _write_search_watermarks({search_url: watermarks[search_url]
+                                  for search_url in urls_json['Search']
+                                  if search_url in watermarks})
+
     except (FileNotFoundError, json.JSONDecodeError):
         with open(os.path.join('output', 'urls.json'), 'w') as json_file:
             json.dump({'Search': {}, 'Property': {}}, json_file, indent=4)
 
 
-def main() -> None:
-    """Main function"""
+def _get_search_watermarks() -> dict:
+    """Loads the listings seen by each search url at its last crawl"""
+
+    try:
+        with open(os.path.join('output', 'search_watermarks.json')
+                  ) as json_file:
+            return json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-    state = State(
+
+def _write_search_watermarks(watermarks) -> None:
+    """Saves the listings seen by each search url"""
+
+    with open(os.path.join('output', 'search_watermarks.json'), 'w'
+              ) as json_file:
+        json.dump(watermarks, json_file, indent=4)
+
+
+def _new_state() -> State:
+    """State before the user has made any choices"""
+
+    return State(
         is_search=False,
         to_overwrite=False,
         to_delete=False,
@@ -392,4 +448,8 @@ def main() -> None:
         urls=set()
     )
 
-    add_link(state, mode=S_P_R_I)
+
+def main() -> None:
+    """Main function"""
+
+    add_link(_new_state(), mode=S_P_R_I)
@@ -0,0 +1,111 @@
+"""Recalculates every analysis in analysis.json from the facts in facts.json,
+under the current values.py and interest rate. No property page is
+requested, nothing at all if the rate is given. Useful after changing
+values.py, or to see how many deals are left if rates rise:
+
+    python run_reanalyze.py --rate 0.075 --no-save
+"""
+
+import argparse
+import time
+
+from src.data.archive import RATES, get_latest_entries, read_page
+from src.data.batch import analyze_batch
+from src.data.calculations import load_property_analyses, \
+    merge_property_analysis, dump_property_analyses
+from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
+from src.data.deal_index import get_deal_score
+from src.data.facts import load_facts, get_all_facts, dump_facts
+from src.data.user import WebScraper, UserValues, set_interest_rate, \
+    get_interest_rate
+from src.metrics import timer, reset, write_metrics
+from src.web.get_current_interest_rates import InterestRates, \
+    set_page_interest_rates
+from values import MINIMUM_ConC_PERCENT
+
+
+def reanalyze(interest_rate=None, save=True) -> None:
+    """Recalculates and saves every analysis. The rate of the loan in
+    values.py is requested unless interest_rate is given.
+    """
+
+    reset()
+    analysis_json = load_property_analyses()
+    if not analysis_json:
+        print(f"\n{BAD}!!! Error: No analyses... !!!{END}")
+        print(f"{GREAT}Run run_analyses.py first.{END}")
+        return
+
+    if interest_rate is None:
+        set_interest_rate()
+    else:
+        _shift_interest_rates(interest_rate)
+
+    start = time.perf_counter()
+    facts_json = get_all_facts(analysis_json, load_facts())
+    before = _count_deals(analysis_json)
+    with timer('calculation_seconds', step='reanalyze'):
+        analyses = analyze_batch(facts_json)
+    after = _count_deals(analyses)
+    seconds = time.perf_counter() - start
+
+    print(f"\n{GREAT}!!! Re-analyzed {len(analyses)} properties at "
+          f"{WebScraper.interest_rate:.3%} in {seconds:.1f}s !!!{END}")
+    print(f"{OK}Deals above {MINIMUM_ConC_PERCENT}% ConC: {GOOD}{before}{OK} "
+          f"before, {GOOD}{after}{OK} now.{END}")
+    missing = len(analysis_json) - len(analyses)
+    if missing:
+        print(f"{BAD}!!! {missing} analyses are missing values and were left "
+              f"as they were. !!!{END}")
+
+    if not save:
+        return
+    for key, property_analysis in analyses.items():
+        merge_property_analysis(analysis_json, key, {key: property_analysis},
+                                overwrite=True)
+    dump_property_analyses(analysis_json)
+    dump_facts(facts_json)
+    write_metrics()
+
+
+def _shift_interest_rates(interest_rate) -> None:
+    """Sets the rate of the loan in values.py and moves the latest archived
+    rates of every loan by as much, for the financing options. Without an
+    archived rates page, they're left out of the analyses.
+    """
+
+    rates = get_latest_entries(RATES)
+    if rates:
+        set_page_interest_rates(page=read_page(rates.popitem()[1]))
+        shift = interest_rate - get_interest_rate(UserValues.loan_type,
+                                                  UserValues.years)
+        for loan, rate in InterestRates.interest_rates.items():
+            InterestRates.interest_rates[loan] = rate + shift
+    WebScraper.interest_rate = interest_rate
+
+
+def _count_deals(analysis_json) -> int:
+    """Analyses above MINIMUM_ConC_PERCENT"""
+
+    deals = 0
+    for property_analysis in analysis_json.values():
+        try:
+            deals += get_deal_score(property_analysis) > MINIMUM_ConC_PERCENT
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return deals
+
+
+def main() -> None:
+    """Main function"""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float,
+                        help='interest rate to use as a fraction, such as '
+                             '0.07, instead of requesting the current rate')
+    parser.add_argument('--no-save', action='store_true',
+                        help='only print how the deals changed')
+    # --profile is handled by run_profiled()
+    args, _ = parser.parse_known_args()
+
+    reanalyze(interest_rate=args.rate, save=not args.no_save)
@@ -0,0 +1,168 @@
+"""Re-runs the scrapers and analysis over every archived property page.
+Useful after fixing a scraper for a zillow layout change. Nothing is
+downloaded, the latest archived listing, tax and rates pages are used.
+Only properties still in urls.json and not ignored are re-parsed, so those
+that were removed don't come back into analysis.json.
+"""
+
+import json
+import os.path
+import time
+from datetime import datetime
+from concurrent.futures import wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from src.data.archive import get_latest_entries, read_page, LISTING, TAX, \
+    RATES
+from src.data.calculations import load_property_analyses, \
+    merge_property_analysis, dump_property_analyses
+from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
+from src.data.error_log import format_error, write_error, \
+    print_error_summary
+from src.data.facts import load_facts, merge_facts, dump_facts
+from src.data.parse_pool import create_parse_pool, analyze_page, \
+    PARSE_WORKERS
+from src.data.user import WebScraper, set_interest_rate
+from src.metrics import merge, inc, reset, write_metrics, print_summary
+from src.progress import Progress, ANALYZED, ERROR
+from src.property_tracker import EXIT_TIMER
+from src.web.parser_health import save_parser_health, print_parser_health
+from src.web.property_keys import get_property_key_from_url
+
+PARSE_IN_FLIGHT = PARSE_WORKERS * 2  # Max pages sent to the parse pool
+
+
+def reparse_archive() -> None:
+    """Re-analyzes every archived property that is tracked and overwrites
+    analysis.json
+    """
+
+    reset()
+    started = datetime.now().isoformat(timespec='seconds')
+    tracked = _get_tracked_keys()
+    listings = {key: entry
+                for key, entry in get_latest_entries(LISTING).items()
+                if key in tracked}
+    if not listings:
+        print(f"\n{BAD}!!! Error: No archived pages of the properties in "
+              f"urls.json... !!!{END}")
+        print(f"{GREAT}Run run_analyses.py first.{END}")
+        return
+
+    # Uses the archived rates so the analysis matches when pages were fetched.
+    rates = get_latest_entries(RATES)
+    if rates:
+        set_interest_rate(page=read_page(rates.popitem()[1]))
+    else:
+        set_interest_rate()
+    taxes = get_latest_entries(TAX)
+
+    print(f"{OK}--- Re-parsing {GOOD}{len(listings)}{OK} archived "
+          f"properties...{END}\n")
+    progress = Progress(total=len(listings))
+
+    analysis_json = load_property_analyses()
+    facts_json = load_facts()
+    with create_parse_pool(WebScraper.interest_rate, offline=True) as pool:
+        pending = {}  # Future: url
+        broken = None  # BrokenProcessPool once a worker process died
+        for key, entry in listings.items():
+            if broken is None:
+                county_office_page = read_page(taxes[key]) \
+                    if key in taxes else None
+                try:
+                    future = pool.submit(analyze_page, entry['url'],
+                                         read_page(entry), county_office_page)
+                except BrokenProcessPool as exception:
+                    broken = exception
+                else:
+                    pending[future] = entry['url']
+                    # Only PARSE_IN_FLIGHT pages are held in memory at once.
+                    if len(pending) >= PARSE_IN_FLIGHT:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        _merge_records(analysis_json, facts_json, listings,
+                                       done, pending, progress)
+                        progress.tick({'parse': progress.done})
+                    continue
+
+            # The pool fails the pages it had, those left become errors too.
+            _record_error(format_error(entry['url'], broken), progress)
+        done, _ = wait(pending, return_when=ALL_COMPLETED)
+        _merge_records(analysis_json, facts_json, listings, done, pending,
+                       progress)
+
+    dump_property_analyses(analysis_json)
+    dump_facts(facts_json)
+    write_metrics()
+    health = save_parser_health()
+    progress.report({'parse': progress.done}, final=True)
+
+    errors = progress.counts[ERROR]
+    print(f"\n{GREAT}!!! Re-parsed {len(listings) - errors} properties in "
+          f"{time.perf_counter() - progress.start:.1f}s !!!{END}")
+    if errors:
+        print(f"{BAD}!!! {errors} properties failed. !!!{END}")
+        print_error_summary(since=started)
+    print_summary()
+    print_parser_health(health)
+
+
+def _get_tracked_keys() -> set:
+    """Keys of the properties in urls.json, other than the ignored ones"""
+
+    try:
+        with open(os.path.join('output', 'urls.json')) as json_file:
+            urls_json = json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        urls_json = {}
+    urls = list(urls_json.get('Property', {}))
+    for search_urls in urls_json.get('Search', {}).values():
+        urls += search_urls
+
+    try:
+        with open(os.path.join('output', 'ignored_urls.txt')) as txt_file:
+            ignored = {url.strip() for url in txt_file.readlines()}
+    except FileNotFoundError:
+        ignored = set()
+
+    return set(map(get_property_key_from_url, urls)) \
+        - set(map(get_property_key_from_url, ignored))
+
+
+def _merge_records(analysis_json, facts_json, listings, futures, pending,
+                   progress) -> None:
+    """Merges the records of finished futures, with the facts fetched when
+    their archived listing was. The futures are removed from pending.
+    """
+
+    for future in futures:
+        url = pending.pop(future)
+        try:
+            record = future.result()
+            merge(record.pop('metrics'))
+        except Exception as exception:  # Worker process died
+            record = {'url': url, 'error': format_error(url, exception)}
+        if record['error'] is not None:
+            _record_error(record['error'], progress)
+        else:
+            inc('properties_total', result='analyzed')
+            merge_property_analysis(analysis_json, record['key'],
+                                    record['analysis'], overwrite=True)
+            merge_facts(facts_json, record,
+                        listings.get(record['key'], {}).get('fetched'))
+            progress.record(ANALYZED)
+
+
+def _record_error(error, progress) -> None:
+    """Logs the failure of a property from format_error()"""
+
+    inc('properties_total', result='error')
+    write_error(error)
+    progress.record(ERROR)
+
+
+def main() -> None:
+    """Main function"""
+
+    reparse_archive()
+    time.sleep(EXIT_TIMER)  # Delays closing the program so user can read text
@@ -0,0 +1 @@
+"""Local stand-in for zillow, the county office and the rates page. Used for load tests."""
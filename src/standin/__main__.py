@@ -0,0 +1,90 @@
+"""Runs the stand-in server.
+
+    python -m src.standin --port 8000 --listings 10000 --latency 0.2
+
+Then set the printed variables, in the shell or the .env file, before running
+the program. --write-urls fills output/urls.json with a stand-in search and its
+listings so run_analyses.py can be load tested without a browser.
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+from src.data.colors_for_print import OK, END
+from src.standin.corpus import generate_corpus, get_listing_url, \
+    get_search_url
+from src.standin.server import StandIn, create_server
+
+URLS_FILE = os.path.join('output', 'urls.json')
+
+
+def main() -> None:
+    """Parses arguments and serves until interrupted"""
+
+    parser = argparse.ArgumentParser(prog='python -m src.standin',
+                                     description='Local stand-in for zillow, '
+                                                 'the county office and rates')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--listings', type=int, default=10_000,
+                        help='number of listings in the search')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='mean seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='fraction of responses that are error pages')
+    parser.add_argument('--captcha-rate', type=float, default=0,
+                        help='fraction of responses redirected to a captcha')
+    parser.add_argument('--throttle-rate', type=float, default=0,
+                        help='fraction of responses answered with 429')
+    parser.add_argument('--recorded', action='store_true',
+                        help='serve pages from output/archive when there')
+    parser.add_argument('--write-urls', action='store_true',
+                        help=f"write the search and its listings to "
+                             f"{URLS_FILE}, keeping a .bak of the old file")
+    args = parser.parse_args()
+
+    standin = StandIn(num_listings=args.listings, latency=args.latency,
+                      error_rate=args.error_rate,
+                      captcha_rate=args.captcha_rate,
+                      throttle_rate=args.throttle_rate,
+                      recorded=args.recorded)
+    server = create_server(standin, args.host, args.port)
+    base_url = f"http://{args.host}:{args.port}"
+
+    if args.write_urls:
+        _write_urls(base_url, args.listings)
+
+    print(f"{OK}Stand-in serving on {base_url}. Set:{END}")
+    print(f"REAL_ESTATE_CALCULATOR_BOT_ZILLOW_URL={base_url}")
+    print(f"REAL_ESTATE_CALCULATOR_BOT_COUNTY_OFFICE_URL={base_url}")
+    print(f"REAL_ESTATE_CALCULATOR_BOT_RATES_URL="
+          f"{base_url}/mortgages/mortgage-rates")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _write_urls(base_url, num_listings) -> None:
+    """Writes the stand-in search and its listings as the saved urls"""
+
+    if os.path.exists(URLS_FILE):
+        shutil.copyfile(URLS_FILE, f"{URLS_FILE}.bak")
+
+    listings = [get_listing_url(base_url, zpid, facts)
+                for zpid, facts in generate_corpus(num_listings)]
+
+    with open(URLS_FILE, 'w') as file:
+        json.dump({'Search': {get_search_url(base_url): listings},
+                   'Property': {}}, file, indent=4)
+
+    print(f"{OK}Wrote {num_listings} listings to {URLS_FILE}{END}")
+
+
+if __name__ == '__main__':
+    main()
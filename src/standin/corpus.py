@@ -0,0 +1,332 @@
+"""Generates a synthetic corpus of listings for scale tests.
+
+Facts roughly follow small multi family listings in Connecticut, the same
+record format as user.get_facts(), and are always the same for the same zpid
+so runs are reproducible. The corpus can be written as property pages for the
+parsing benchmark, or bulk loaded into urls.json and analysis.json.
+
+    python -m src.standin.corpus --listings 100000 --populate
+    python -m src.standin.corpus --listings 500 --pages corpus
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from src.data import user
+from src.data.calculations import dump_property_analyses
+from src.data.colors_for_print import OK, BAD, END
+from src.data.deal_index import mark_changed
+from src.data.parse_pool import create_parse_pool, analyze_facts, \
+    PARSE_WORKERS
+from src.data.user import WebScraper
+from src.standin.pages import get_listing_path, render_listing_page
+from src.web.endpoints import ZILLOW_URL, COUNTY_OFFICE_URL
+from src.web.property_keys import get_property_key_from_url
+
+FIRST_ZPID = 1_000_000  # zpid of the first listing of the corpus
+INTEREST_RATE = 0.03  # Used when populating so it doesn't need the network
+# Rates of every loan, for the financing options
+INTEREST_RATES = {
+    '30-year fixed-rate': INTEREST_RATE,
+    '20-year fixed-rate': 0.02875,
+    '15-year fixed-rate': 0.0225,
+    '10-year fixed-rate': 0.02125,
+    '30-year fixed-rate FHA': 0.0265,
+    '30-year fixed-rate VA': 0.02375
+}
+SEARCH_PATH = '/homes/for_sale/?searchQueryState=%7B%22mapBounds%22%3A%7B' \
+              '%22west%22%3A-73.72%2C%22east%22%3A-71.79%2C%22south%22%3A' \
+              '40.98%2C%22north%22%3A42.05%7D%2C%22isMapVisible%22%3Afalse' \
+              '%2C%22filterState%22%3A%7B%22sort%22%3A%7B%22value%22%3A' \
+              '%22days%22%7D%7D%7D'
+
+# City, zip code and how its prices compare to the median
+CITIES = [
+    ('Hartford', '06106', 0.7), ('New Haven', '06511', 1.0),
+    ('Bridgeport', '06604', 0.85), ('Waterbury', '06708', 0.6),
+    ('New Britain', '06051', 0.65), ('Norwalk', '06850', 1.6),
+    ('Stamford', '06902', 1.9), ('Meriden', '06450', 0.7),
+    ('Bristol', '06010', 0.75), ('Manchester', '06040', 0.9),
+    ('West Haven', '06516', 0.85), ('East Hartford', '06108', 0.75),
+    ('Middletown', '06457', 0.9), ('Norwich', '06360', 0.65),
+    ('Danbury', '06810', 1.3), ('Torrington', '06790', 0.6)
+]
+STREETS = ['Main', 'Park', 'Elm', 'Maple', 'Oak', 'Washington', 'Chestnut',
+           'Prospect', 'Church', 'High', 'Franklin', 'Broad', 'Union',
+           'Spring', 'Summer', 'Winter', 'Grand', 'Orchard', 'Laurel', 'Hill']
+STREET_SUFFIXES = ['St', 'Ave', 'Rd', 'Pl', 'Ter', 'Dr']
+PARKING = ['Off street', '2 spaces', '4 spaces', 'Garage - Detached',
+           'Garage - Attached', 'Driveway', 'On street', 'None']
+
+# Share of each unit count, and the median price of that kind of listing
+UNIT_WEIGHTS = {1: 0.35, 2: 0.3, 3: 0.22, 4: 0.13}
+MEDIAN_PRICE = {1: 230_000, 2: 260_000, 3: 300_000, 4: 340_000}
+PRICE_SIGMA = 0.35  # Log normal spread of prices
+GROSS_YIELD = {1: 0.075, 2: 0.095, 3: 0.105, 4: 0.11}  # Yearly rent / price
+TAX_RATE = (0.015, 0.032)  # Yearly property taxes / price
+
+# Fraction of listings where zillow has the value, otherwise defaults are used
+FOUND_PROPERTY_TAXES = 0.9
+FOUND_NUM_UNITS = 0.95
+FOUND_RENT_PER_UNIT = 0.85
+
+DESCRIPTION_OPENINGS = [
+    'Welcome home to this well maintained {kind}.',
+    'Investor alert! Fully occupied {kind} with long term tenants.',
+    'Rare opportunity to own a {kind} in a great location.',
+    'Charming {kind} close to shopping, highways and public transit.',
+    'Priced to sell! Spacious {kind} ready for its next owner.'
+]
+DESCRIPTION_DETAILS = [
+    'Updated kitchens with stainless steel appliances.',
+    'Separate utilities for every unit.',
+    'New roof and windows in the last five years.',
+    'Hardwood floors throughout.',
+    'Full basement with laundry hookups.',
+    'Large fenced in yard.',
+    'Tenants pay their own heat and hot water.',
+    'Some updating needed, great value add potential.',
+    'Walking distance to the university and hospital.',
+    'Close to the train station.'
+]
+DESCRIPTION_CLOSINGS = [
+    'Please do not disturb the tenants.',
+    'Showings start at the open house this Saturday.',
+    'Sold as is.',
+    'Highest and best offers due Monday.',
+    ''
+]
+KINDS = {1: 'single family home', 2: 'two family', 3: 'three family',
+         4: 'four family'}
+
+
+def generate_facts(zpid) -> dict:
+    """Facts of a made up listing, always the same for the same zpid"""
+
+    rng = random.Random(zpid)
+
+    num_units = rng.choices(list(UNIT_WEIGHTS), list(UNIT_WEIGHTS.values()))[0]
+    city, zip_code, city_factor = rng.choice(CITIES)
+
+    price = MEDIAN_PRICE[num_units] * city_factor * \
+        math.exp(rng.gauss(0, PRICE_SIGMA))
+    price = max(int(round(price, -3)) - rng.choice((0, 0, 100, 1000)), 30_000)
+
+    sqft = int(round(num_units * max(rng.gauss(1050, 250), 450), -1))
+    yearly_rent = price * rng.gauss(GROSS_YIELD[num_units], 0.015) \
+        / city_factor ** 0.5
+    rent_per_unit = int(round(max(yearly_rent / 12 / num_units, 500), -1))
+    lot_size = int(round(math.exp(rng.gauss(math.log(7000), 0.6)), -1))
+    if lot_size >= 43560:  # Pages show these in acres
+        lot_size = int(round(lot_size / 43560, 2) * 43560)
+
+    return {
+        'address': f"{rng.randint(1, 1200)} {rng.choice(STREETS)} "
+                   f"{rng.choice(STREET_SUFFIXES)}, {city}, CT {zip_code}",
+        'price': price,
+        'year': rng.randint(1880, 1950) if rng.random() < 0.6
+        else rng.randint(1950, 2021),
+        'description': _generate_description(rng, num_units),
+        'sqft': sqft,
+        'price_per_sqft': price // sqft,
+        'lot_size': lot_size,
+        'parking': rng.choice(PARKING),
+        'property_taxes': int(price * rng.uniform(*TAX_RATE)),
+        'num_units': num_units,
+        'rent_per_unit': rent_per_unit,
+        'found_property_taxes': rng.random() < FOUND_PROPERTY_TAXES,
+        'found_num_units': rng.random() < FOUND_NUM_UNITS,
+        'found_rent_per_unit': rng.random() < FOUND_RENT_PER_UNIT
+    }
+
+
+def generate_corpus(num_listings, first_zpid=FIRST_ZPID):
+    """Yields (zpid, facts) for every listing of the corpus"""
+
+    for zpid in range(first_zpid, first_zpid + num_listings):
+        yield zpid, generate_facts(zpid)
+
+
+def get_listing_url(base_url, zpid, facts=None) -> str:
+    """Property url of a listing of the corpus"""
+
+    if facts is None:
+        facts = generate_facts(zpid)
+    return f"{base_url}{get_listing_path(facts, zpid)}"
+
+
+def get_search_url(base_url) -> str:
+    """Search url listing the corpus, long enough to pass the tracker's checks"""
+    return f"{base_url}{SEARCH_PATH}"
+
+
+def get_url_property_taxes(facts) -> str:
+    """County office url the scraper would build from the address"""
+
+    street, city, _ = facts['address'].split(', ')
+    return f"{COUNTY_OFFICE_URL}/property-records-search/?q=" \
+           f"{'+'.join(street.split())}%2C+{'+'.join(city.split())}%2C+CT" \
+           f"%2C+USA"
+
+
+def get_scraped_facts(facts) -> dict:
+    """The facts the scraper gets from the listing's page, which uses the
+    defaults in values.py for anything zillow doesn't have.
+    """
+
+    user.set_facts(facts)
+    if not facts['found_property_taxes']:
+        WebScraper.property_taxes = user.use_default_property_taxes()
+    if not facts['found_rent_per_unit']:
+        WebScraper.rent_per_unit = user.use_default_rent_per_unit()
+
+    return user.get_facts()
+
+
+def write_pages(directory, num_listings, first_zpid=FIRST_ZPID) -> None:
+    """Writes the property page of every listing as <zpid>.html,
+    the layout benchmarks/parsing.py reads.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    for zpid, facts in generate_corpus(num_listings, first_zpid):
+        with open(os.path.join(directory, f"{zpid}.html"), 'w',
+                  encoding='utf-8') as file:
+            file.write(render_listing_page(facts))
+
+
+def generate_analyses(num_listings, base_url=ZILLOW_URL, distinct=None,
+                      interest_rate=INTEREST_RATE, workers=PARSE_WORKERS,
+                      interest_rates=INTEREST_RATES) -> dict:
+    """Calculates the analysis of every listing, in the format of analysis.json.
+    Only the first distinct listings are calculated if given, the rest reuse
+    their analyses under their own key, urls and listing details (address,
+    price, year, sizes). Their returns are still those of the listing they
+    reuse, on purpose. Much faster at 100k listings when only the size of the
+    stores matters.
+    """
+
+    distinct = num_listings if distinct is None \
+        else min(distinct, num_listings)
+
+    calculated = []
+    with create_parse_pool(interest_rate, workers=workers, offline=True,
+                           interest_rates=interest_rates) as pool:
+        pending = set()
+        for zpid, facts in generate_corpus(distinct):
+            # Bounded so a large corpus doesn't sit in memory as futures.
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                calculated.extend(future.result() for future in done)
+            pending.add(pool.submit(
+                analyze_facts, get_listing_url(base_url, zpid, facts),
+                get_scraped_facts(facts), get_url_property_taxes(facts)
+            ))
+        calculated.extend(future.result() for future in wait(pending).done)
+
+    calculated = {record['key']: record['analysis'][record['key']]
+                  for record in calculated if record['error'] is None}
+    reused = [calculated[key] for key in sorted(calculated)]
+
+    analysis_json = {}
+    for i, (zpid, facts) in enumerate(generate_corpus(num_listings)):
+        url = get_listing_url(base_url, zpid, facts)
+        key = get_property_key_from_url(url)
+        if key in calculated:
+            analysis_json[key] = calculated[key]
+        elif reused:
+            property_analysis = dict(reused[i % len(reused)])
+            property_analysis['Property URL'] = url
+            property_analysis['Property Taxes URL'] = \
+                get_url_property_taxes(facts)
+            property_analysis['Property Info'] = {
+                **property_analysis['Property Info'],
+                'Address': facts['address'],
+                'Price ($)': facts['price'],
+                'Year Built': facts['year'],
+                'House Size (sqft)': facts['sqft'],
+                'Price/sqft ($)': facts['price_per_sqft'],
+                'Lot Size (sqft)': facts['lot_size']
+            }
+            analysis_json[key] = property_analysis
+
+    return analysis_json
+
+
+def populate_stores(num_listings, base_url=ZILLOW_URL, distinct=None) -> None:
+    """Replaces urls.json with a search listing the whole corpus, and
+    analysis.json with their analyses. Keeps a .bak of both files.
+    """
+
+    for name in ('urls.json', 'analysis.json'):
+        path = os.path.join('output', name)
+        if os.path.exists(path):
+            shutil.copyfile(path, f"{path}.bak")
+
+    listings = [get_listing_url(base_url, zpid, facts)
+                for zpid, facts in generate_corpus(num_listings)]
+    with open(os.path.join('output', 'urls.json'), 'w') as json_file:
+        json.dump({'Search': {get_search_url(base_url): listings},
+                   'Property': {}}, json_file, indent=4)
+
+    analysis_json = generate_analyses(num_listings, base_url, distinct)
+    # Every analysis is replaced, even those with a key already indexed.
+    for key in analysis_json:
+        mark_changed(key)
+    dump_property_analyses(analysis_json)
+
+
+def _generate_description(rng, num_units) -> str:
+    """Listing description of a few sentences"""
+
+    sentences = [rng.choice(DESCRIPTION_OPENINGS).format(
+        kind=KINDS[num_units])]
+    sentences += rng.sample(DESCRIPTION_DETAILS, rng.randint(1, 4))
+    sentences.append(rng.choice(DESCRIPTION_CLOSINGS))
+
+    return ' '.join(sentences).strip()
+
+
+def main() -> None:
+    """Parses arguments and writes the corpus"""
+
+    parser = argparse.ArgumentParser(prog='python -m src.standin.corpus',
+                                     description='Synthetic listings for '
+                                                 'scale tests')
+    parser.add_argument('--listings', type=int, default=10_000)
+    parser.add_argument('--pages', metavar='DIRECTORY',
+                        help='write every property page as <zpid>.html')
+    parser.add_argument('--populate', action='store_true',
+                        help='replace urls.json and analysis.json with the '
+                             'corpus, keeping a .bak of both')
+    parser.add_argument('--distinct', type=int,
+                        help='only calculate this many analyses when '
+                             'populating, the rest reuse them')
+    parser.add_argument('--base-url', default=ZILLOW_URL,
+                        help='base of the listing urls, such as the stand-in')
+    args = parser.parse_args()
+
+    if not args.pages and not args.populate:
+        print(f"{BAD}Nothing to do, pass --pages and/or --populate.{END}")
+        return
+
+    start = time.perf_counter()
+    if args.pages:
+        write_pages(args.pages, args.listings)
+        print(f"{OK}Wrote {args.listings} pages to {args.pages}{END}")
+    if args.populate:
+        populate_stores(args.listings, args.base_url.rstrip('/'),
+                        args.distinct)
+        print(f"{OK}Populated urls.json and analysis.json with "
+              f"{args.listings} listings{END}")
+    print(f"Took {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Renders pages with the same structure the scrapers in src/web parse.
+Facts use the record format of user.get_facts(). Elements are rendered without
+whitespace between them since the scrapers walk siblings and contents.
+"""
+
+from html import escape
+
+UNIT_TYPES = {1: 'Single Family', 2: 'Duplex', 3: 'Triplex', 4: 'Quadruplex'}
+
+
+def get_listing_path(facts, zpid) -> str:
+    """Path of the property page, the same shape as a zillow homedetails url"""
+
+    slug = '-'.join(facts['address'].replace(',', '').split())
+    return f"/homedetails/{slug}/{zpid}_zpid/"
+
+
+def render_listing_page(facts) -> str:
+    """Renders a zillow property page.
+    Property taxes, rent and the type are left out if their found flag is
+    False, so the scrapers fall back like they would on zillow.
+    Lots of an acre or more should be a whole number of hundredths of an acre
+    to read back exactly.
+    """
+
+    street, city, state_zip = facts['address'].split(', ')
+    # Zillow shows lots under an acre in sqft
+    lot = f"{facts['lot_size']:,} sqft" if facts['lot_size'] < 43560 \
+        else f"{facts['lot_size'] / 43560:.2f} Acres"
+
+    fact_list = ''.join(
+        f'<li class="ds-home-fact-list-item"><span>{name}:</span>'
+        f'<span>{escape(str(value))}</span></li>'
+        for name, value in (
+            ('Type', UNIT_TYPES[facts['num_units']]
+                if facts['found_num_units'] else 'Multi Family'),
+            ('Year built', facts['year']),
+            ('Heating', 'Forced air'),
+            ('Cooling', 'Central'),
+            ('Parking', facts['parking']),
+            ('Lot', lot),
+            ('Price/sqft', f"${facts['price_per_sqft']}")
+        )
+    )
+
+    # Scrapers count full bathrooms as units when the type isn't known.
+    bathrooms = f'<span>Full bathrooms: <!-- -->{facts["num_units"]}</span>' \
+        if not facts['found_num_units'] else ''
+
+    rent = f'<script>{{\\"rentZestimate\\":{facts["rent_per_unit"]},' \
+           f'\\"pricePerSquareFoot\\":null}}</script>' \
+        if facts['found_rent_per_unit'] else ''
+
+    # Listings without taxes still show a '$' amount the scrapers can't read,
+    # which sends them to the county office.
+    taxes = f'${facts["property_taxes"]:,}' if facts['found_property_taxes'] \
+        else '$--'
+    taxes = f'<table><tr><td>2021</td><td><span><!-- -->{taxes}</span></td>' \
+            f'</tr></table>'
+
+    return (
+        f'<!DOCTYPE html><html><head><title>{escape(facts["address"])}'
+        f'</title></head><body>'
+        f'<div class="ds-home-details-chip"><div></div>'
+        f'<h1><span>{escape(street)},</span><!-- --> {escape(city)}, '
+        f'{escape(state_zip)}</h1><span>For sale</span></div>'
+        f'<div class="ds-summary-row"><span><span><span>'
+        f'${facts["price"]:,}</span></span></span></div>'
+        f'<span class="ds-bed-bath-living-area-container">'
+        f'<span><span>{facts["num_units"] * 2}</span> bd</span>'
+        f'<span><span>{facts["sqft"]:,}</span><span> sqft</span></span></span>'
+        f'<div class="ds-overview-section"><div><div>'
+        f'{escape(facts["description"])}</div></div></div>'
+        f'<ul>{fact_list}</ul>{bathrooms}'
+        f'<div class="sc-pbvYO hMYTdE"></div>'
+        f'<div class="sc-pbvYO hMYTdE"><span>Lot</span><span>:</span>'
+        f'<div><span>{lot}</span></div></div>'
+        f'{rent}{taxes}</body></html>'
+    )
+
+
+def render_search_page(cards, num_listings) -> str:
+    """Renders a page of zillow search results.
+    cards is a list of (url, price, status) like the browser would return.
+    """
+
+    items = ''.join(
+        f'<li><article><a href="{escape(url)}">{escape(url)}</a>'
+        f'<div class="list-card-price">${price:,}</div>'
+        f'<ul><li class="list-card-statusText">{escape(status)}</li></ul>'
+        f'</article></li>'
+        for url, price, status in cards
+    )
+
+    # The second total is what 'Other listings' (cat2) searches read.
+    return (
+        f'<!DOCTYPE html><html><head><title>Search</title></head><body>'
+        f'<span class="total-text">{num_listings:,}</span>'
+        f'<span class="total-text">{num_listings:,}</span>'
+        f'<div id="grid-search-results"><ul>{items}</ul></div></body></html>'
+    )
+
+
+def render_tax_page(property_taxes) -> str:
+    """Renders a county office page. The taxes are in the third table."""
+
+    tables = ''.join(
+        f'<table><tbody><tr><td>{name}</td></tr></tbody></table>'
+        for name in ('Owner', 'Assessment')
+    )
+    return (
+        f'<!DOCTYPE html><html><body>{tables}'
+        f'<table><tbody><tr><td>2021</td><td>${property_taxes:,}</td></tr>'
+        f'</tbody></table></body></html>'
+    )
+
+
+def render_rates_page(rates) -> str:
+    """Renders the rates table. rates maps loan type to a fraction."""
+
+    rows = ''.join(
+        f'<tr><th>{escape(loan_type)}</th><td>{rate * 100:.3f}%</td></tr>'
+        for loan_type, rate in rates.items()
+    )
+    return f'<!DOCTYPE html><html><body><table><tbody>{rows}</tbody></table>' \
+           f'</body></html>'
+
+
+def render_captcha_page() -> str:
+    """Renders the captcha zillow redirects to when it detects a bot"""
+    return '<!DOCTYPE html><html><body><div id="px-captcha"></div>' \
+           '</body></html>'
+
+
+def render_error_page() -> str:
+    """Renders zillow's error page"""
+    return '<!DOCTYPE html><html><body><div id="zillow-error-page">' \
+           'Page not found</div></body></html>'
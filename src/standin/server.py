@@ -0,0 +1,168 @@
+"""Local HTTP stand-in for zillow, the county office and the rates page.
+
+Serves property, search, tax and rates pages of the synthetic corpus in
+src/standin/corpus.py, or pages recorded in output/archive, with injectable
+latency, errors, captchas and throttling.
+Point the program at it with the variables in src/web/endpoints.py.
+"""
+
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+from src.data.archive import get_latest_entries, read_page, LISTING, TAX
+from src.standin.corpus import generate_corpus, generate_facts, \
+    get_listing_url, get_url_property_taxes, FIRST_ZPID
+from src.standin.pages import render_listing_page, \
+    render_search_page, render_tax_page, render_rates_page, \
+    render_captcha_page, render_error_page
+from src.web.get_property_urls_from_search import PROPERTIES_PER_PAGE
+from src.web.property_keys import get_property_key_from_url
+
+DEFAULT_RATES = {
+    '30-year fixed-rate': 0.03125,
+    '20-year fixed-rate': 0.03,
+    '15-year fixed-rate': 0.02375,
+    '10-year fixed-rate': 0.0225,
+    '30-year fixed-rate FHA': 0.0275,
+    '30-year fixed-rate VA': 0.025
+}
+
+
+@dataclass
+class StandIn:
+    """How the stand-in behaves"""
+    num_listings: int = 10_000
+    latency: float = 0  # Mean seconds added to every response
+    error_rate: float = 0  # Fraction of responses that are error pages
+    captcha_rate: float = 0  # Fraction redirected to the captcha
+    throttle_rate: float = 0  # Fraction answered with 429
+    recorded: bool = False  # Serve pages from output/archive when there
+    rates: dict = field(default_factory=lambda: dict(DEFAULT_RATES))
+    listings: dict = field(default_factory=dict)  # Key: archive entry
+    taxes: dict = field(default_factory=dict)  # County office query: entry
+    corpus_taxes: dict = field(default_factory=dict)  # Query: property taxes
+
+
+def create_server(standin, host='127.0.0.1', port=8000) -> ThreadingHTTPServer:
+    """Creates the server. Call serve_forever() on it to start."""
+
+    for _, facts in generate_corpus(standin.num_listings):
+        standin.corpus_taxes[_get_query(get_url_property_taxes(facts))] = \
+            facts['property_taxes']
+
+    if standin.recorded:
+        standin.listings = get_latest_entries(LISTING)
+        standin.taxes = {_get_query(entry['url']): entry
+                         for entry in get_latest_entries(TAX).values()}
+
+    class Handler(_StandInHandler):
+        """Handler bound to this stand-in"""
+        config = standin
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Routes requests to the page renderers"""
+    config: StandIn
+
+    def do_GET(self) -> None:
+        """Handles every page"""
+
+        path = urlsplit(self.path).path
+        if path.startswith('/captchaPerimeterX'):
+            self._send(200, render_captcha_page())
+            return
+
+        if self.config.latency:
+            time.sleep(random.uniform(0, 2 * self.config.latency))
+
+        roll = random.random()
+        if roll < self.config.error_rate:
+            self._send(500, render_error_page())
+        elif roll < self.config.error_rate + self.config.captcha_rate:
+            self._redirect(f"/captchaPerimeterX/?url={quote(self.path)}")
+        elif roll < self.config.error_rate + self.config.captcha_rate + \
+                self.config.throttle_rate:
+            self._send(429, render_error_page())
+        elif path.startswith('/homedetails/'):
+            self._send(200, self._get_listing_page())
+        elif path.startswith('/homes/'):
+            self._send(200, self._get_search_page(path))
+        elif path.startswith('/property-records-search/'):
+            self._send(200, self._get_tax_page())
+        elif path.startswith('/mortgages/mortgage-rates'):
+            self._send(200, render_rates_page(self.config.rates))
+        else:
+            self._send(404, render_error_page())
+
+    def _get_listing_page(self) -> str:
+        """Recorded page of the property if there is one, else synthetic"""
+
+        key = get_property_key_from_url(self.path)
+        if key in self.config.listings:
+            return read_page(self.config.listings[key])
+
+        zpid = int(key.split('/')[-2].split('_')[0])
+        return render_listing_page(generate_facts(zpid))
+
+    def _get_search_page(self, path) -> str:
+        """Page of the synthetic search, page number is the '<n>_p' part"""
+
+        match = re.search(r'/(\d+)_p(/|$)', path)
+        page = int(match.group(1)) if match else 1
+
+        first = FIRST_ZPID + (page - 1) * PROPERTIES_PER_PAGE
+        last = FIRST_ZPID + min(page * PROPERTIES_PER_PAGE,
+                                self.config.num_listings)
+        base_url = f"http://{self.headers['Host']}"
+        cards = []
+        for zpid in range(first, last):
+            facts = generate_facts(zpid)
+            cards.append((get_listing_url(base_url, zpid, facts),
+                          facts['price'], 'House for sale'))
+
+        return render_search_page(cards, self.config.num_listings)
+
+    def _get_tax_page(self) -> str:
+        """Recorded county office page if there is one, else the taxes of the
+        listing at the address, else made up ones.
+        """
+
+        query = _get_query(self.path)
+        if query in self.config.taxes:
+            return read_page(self.config.taxes[query])
+        if query in self.config.corpus_taxes:
+            return render_tax_page(self.config.corpus_taxes[query])
+
+        return render_tax_page(random.Random(query).randrange(2000, 12000))
+
+    def _send(self, status, page) -> None:
+        """Sends an html page"""
+
+        body = page.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location) -> None:
+        """Redirects like zillow does to its captcha"""
+
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args) -> None:
+        """Silences the log line printed for every request"""
+
+
+def _get_query(url) -> str:
+    """The 'q' parameter of a county office url"""
+    return parse_qs(urlsplit(url).query).get('q', [''])[0]
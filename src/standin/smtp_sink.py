@@ -0,0 +1,145 @@
+"""Local SMTP server that accepts every email and saves it instead of sending.
+
+    python -m src.standin.smtp_sink --port 8025
+
+Then set REAL_ESTATE_CALCULATOR_BOT_SMTP_HOST and _SMTP_PORT as printed, and
+any email and password in the .env file. Emails are saved to output/sink/ as
+.eml files, which open in a mail client, and each is printed with its size
+and how long it took to receive. Any login is accepted. Only the parts of
+SMTP that smtplib uses are implemented.
+"""
+
+import argparse
+import os
+import socketserver
+import time
+from dataclasses import dataclass, field
+from email import message_from_bytes
+from threading import Lock
+
+from src.data.colors_for_print import OK, GOOD, END
+
+SINK_DIR = os.path.join('output', 'sink')
+
+
+@dataclass
+class Sink:
+    """Emails received by the sink"""
+    directory: str = SINK_DIR
+    received: int = 0
+    lock: Lock = field(default_factory=Lock)
+
+    def save(self, data, seconds) -> str:
+        """Saves an email, returns its path"""
+
+        with self.lock:
+            self.received += 1
+            number = self.received
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{number}.eml")
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        subject = message_from_bytes(data).get('Subject', '')
+        print(f"{OK}#{number} {GOOD}{len(data) / 1024:.1f} KiB{OK} in "
+              f"{seconds * 1000:.1f} ms: {END}{subject}")
+        return path
+
+
+def create_sink(sink, host='127.0.0.1', port=8025
+                ) -> socketserver.ThreadingTCPServer:
+    """Creates the server. Call serve_forever() on it to start."""
+
+    server = socketserver.ThreadingTCPServer((host, port), _SinkHandler)
+    server.daemon_threads = True
+    server.sink = sink
+    return server
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """A single SMTP session, any number of emails"""
+
+    def handle(self) -> None:
+        self._reply('220 real-estate-calculator-bot sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self._reply('250-sink', '250-AUTH PLAIN', '250 8BITMIME')
+            elif verb == 'HELO':
+                self._reply('250 sink')
+            elif verb == 'AUTH':
+                self._authenticate(command)
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._receive()
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+    def _authenticate(self, command) -> None:
+        """Accepts any credentials, with AUTH PLAIN"""
+
+        if len(command.split()) == 2:  # Credentials sent after the prompt
+            self._reply('334 ')
+            self.rfile.readline()
+        self._reply('235 Authentication successful')
+
+    def _receive(self) -> None:
+        """Reads an email until the line with a single '.' and saves it"""
+
+        self._reply('354 End data with <CR><LF>.<CR><LF>')
+        start = time.perf_counter()
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            # Leading dots are doubled by the client.
+            lines.append(line[1:] if line.startswith(b'..') else line)
+
+        self.server.sink.save(b''.join(lines), time.perf_counter() - start)
+        self._reply('250 OK')
+
+    def _reply(self, *lines) -> None:
+        """Sends reply lines"""
+        self.wfile.write(''.join(f"{line}\r\n" for line in lines).encode())
+
+
+def main() -> None:
+    """Parses arguments and serves until interrupted"""
+
+    parser = argparse.ArgumentParser(prog='python -m src.standin.smtp_sink',
+                                     description='Local SMTP server that '
+                                                 'saves every email')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--directory', default=SINK_DIR,
+                        help='where emails are saved')
+    args = parser.parse_args()
+
+    server = create_sink(Sink(directory=args.directory), args.host, args.port)
+
+    print(f"{OK}SMTP sink on {args.host}:{args.port}, saving to "
+          f"{args.directory}. Set:{END}")
+    print(f"REAL_ESTATE_CALCULATOR_BOT_SMTP_HOST={args.host}")
+    print(f"REAL_ESTATE_CALCULATOR_BOT_SMTP_PORT={args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Renders deals as an email digest with a plain text and an HTML table.
+
+A digest holds at most MAX_DEALS deals and about MAX_BYTES of text, the
+best deals first. Any left out are counted at the bottom.
+"""
+
+import html
+from email.message import EmailMessage
+
+MAX_DEALS = 50
+MAX_BYTES = 200_000  # Of the plain text and HTML bodies together
+
+# Column name: function of the alert, in the order shown
+COLUMNS = {
+    'ConC': lambda alert: f"{alert.score}%",
+    'ROI': lambda alert: alert.analysis['Analysis']['Return On Investment'],
+    'Cashflow/mo': lambda alert:
+        alert.analysis['Analysis']['Cashflow per month'],
+    'Price': lambda alert:
+        f"${alert.analysis['Property Info']['Price ($)']:,}",
+    'Units': lambda alert: f"{alert.analysis['Property Info']['Units']}",
+    'Rent/unit': lambda alert:
+        f"${alert.analysis['Property Info']['Rent Per Unit ($)']:,}",
+    'Estimated': lambda alert:
+        '*' * len(alert.analysis['Estimations']),
+    'Why': lambda alert: alert.reason,
+}
+
+
+def build_digest(alerts, sender, receiver, title=None, max_deals=MAX_DEALS,
+                 max_bytes=MAX_BYTES) -> EmailMessage:
+    """Email of alerts, best first, from src/data/alert_state.py"""
+
+    best = alerts[0]
+    subject = f"Real Estate Bot - {best.score}%" \
+              f"{'*' * len(best.analysis['Estimations'])} ConC Return @ " \
+              f"${best.analysis['Property Info']['Price ($)']:,}! " \
+              f"(Total: {len(alerts)})"
+    if title:
+        subject = f"[{title}] {subject}"
+
+    rows = []
+    size = 0
+    for alert in alerts[:max_deals]:
+        cells = [function(alert) for function in COLUMNS.values()]
+        url = alert.analysis['Property URL']
+        size += _get_row_size(cells, url)
+        if rows and size > max_bytes:
+            break
+        rows.append((cells, url))
+
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = sender
+    message['To'] = receiver
+    message.set_content(_render_text(title, rows, len(alerts)))
+    message.add_alternative(_render_html(title, rows, len(alerts)),
+                            subtype='html')
+
+    return message
+
+
+def _render_text(title, rows, total) -> str:
+    """Fixed width table, each deal followed by its url"""
+
+    widths = [max([len(name)] + [len(cells[i]) for cells, _ in rows])
+              for i, name in enumerate(COLUMNS)]
+    lines = [f"{title}\n"] if title else []
+    lines += ['New and changed deals, best first:\n',
+              '  '.join(name.ljust(width)
+                        for name, width in zip(COLUMNS, widths)),
+              '  '.join('-' * width for width in widths)]
+    for cells, url in rows:
+        lines.append('  '.join(cell.ljust(width)
+                               for cell, width in zip(cells, widths)))
+        lines.append(f"    {url}")
+    if total > len(rows):
+        lines.append(f"\n... and {total - len(rows)} more deals not shown.")
+    lines.append('\n* Each is a value that was estimated.')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _render_html(title, rows, total) -> str:
+    """Table of deals, linking to each property"""
+
+    header = ''.join(f"<th>{html.escape(name)}</th>" for name in COLUMNS)
+    body = ''.join(
+        '<tr>' + ''.join(f"<td>{html.escape(cell)}</td>" for cell in cells)
+        + f'<td><a href="{html.escape(url)}">Listing</a></td></tr>'
+        for cells, url in rows)
+    more = f"<p>... and {total - len(rows)} more deals not shown.</p>" \
+        if total > len(rows) else ''
+    heading = f"<h2>{html.escape(title)}</h2>" if title else ''
+
+    return f"<html><body>{heading}<p>New and changed deals, best first:</p>" \
+           f'<table border="1" cellpadding="4" cellspacing="0">' \
+           f"<tr>{header}<th></th></tr>{body}</table>{more}" \
+           f"<p>* Each is a value that was estimated.</p></body></html>"
+
+
+def _get_row_size(cells, url) -> int:
+    """Approximate bytes a row adds to both bodies"""
+    return 2 * (sum(len(cell) for cell in cells) + len(url)) + 150
@@ -0,0 +1,21 @@
+"""Base URLs of the sites that are scraped, and the mail server.
+Each can be overridden by an environment variable, or a line in the .env file,
+such as to point the program at the local stand-ins in src/standin.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ZILLOW_URL = os.getenv('REAL_ESTATE_CALCULATOR_BOT_ZILLOW_URL',
+                       'https://www.zillow.com').rstrip('/')
+COUNTY_OFFICE_URL = os.getenv('REAL_ESTATE_CALCULATOR_BOT_COUNTY_OFFICE_URL',
+                              'https://www.countyoffice.org').rstrip('/')
+RATES_URL = os.getenv('REAL_ESTATE_CALCULATOR_BOT_RATES_URL',
+                      'https://www.nerdwallet.com/mortgages/mortgage-rates')
+
+# SSL from the start on port 465, plain SMTP otherwise such as the local sink
+SMTP_HOST = os.getenv('REAL_ESTATE_CALCULATOR_BOT_SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('REAL_ESTATE_CALCULATOR_BOT_SMTP_PORT', '465'))
@@ -1,5 +1,5 @@
 """Web scrapes current interest rates.
-Uses 'https://www.nerdwallet.com/mortgages/mortgage-rates'.
+Uses 'https://www.nerdwallet.com/mortgages/mortgage-rates' by default.
 """
 
 from dataclasses import dataclass
@@ -7,7 +7,10 @@ from dataclasses import dataclass
 import requests
 from bs4 import BeautifulSoup
 
+from src.data.archive import archive_page, RATES
 from src.data.colors_for_print import OK, END
+from src.metrics import timer
+from src.web.endpoints import RATES_URL
 
 
 @dataclass
@@ -16,13 +19,18 @@ class InterestRates:
     interest_rates = {}
 
 
-def set_page_interest_rates() -> None:
-    """Get page and stores interest rates. Only ran once the per session."""
+def set_page_interest_rates(page=None) -> None:
+    """Get page and stores interest rates. Only ran once the per session.
+    Uses page instead if given, such as from the archive.
+    """
 
-    print(f"{OK}--- Getting current interest rates...{END}\n")
+    if page is None:
+        print(f"{OK}--- Getting current interest rates...{END}\n")
+
+        with timer('fetch_seconds', site='rates'):
+            page = requests.get(RATES_URL).text
+        archive_page(RATES, RATES_URL, page)
 
-    url = 'https://www.nerdwallet.com/mortgages/mortgage-rates'
-    page = requests.get(url).text
     doc = BeautifulSoup(page, 'html.parser')
 
     table = doc.find('tbody')
@@ -7,9 +7,20 @@ import requests
 import time
 from dataclasses import dataclass
 
+from src.data.archive import archive_page, LISTING, TAX
+from src.metrics import timer, timed
+from src.web.endpoints import ZILLOW_URL, COUNTY_OFFICE_URL
+from src.web.parser_health import Chain
+from src.web.property_keys import get_property_key_from_url
+from src.web.rate_control import rate_limited_get, ZILLOW, COUNTY_OFFICE, \
+    CLEAN, CAPTCHA, THROTTLED
+
 TIME_BETWEEN_REQUESTS = 0
 NUM_TIMES_TO_RETRY_REQUESTS = 5
 
+# Never request the county office when set. Used when parsing saved pages.
+OFFLINE = False
+
 
 @dataclass
 class PropertyPage:
@@ -18,11 +29,42 @@ class PropertyPage:
     url_property_taxes: str
     zillow: BeautifulSoup
     county_office: BeautifulSoup
+    county_office_page: str
     page: requests.models.Response()
 
 
-def set_page_property_info(url=None) -> None:
-    """Gets html page to parse"""
+def set_page_property_info(url=None, page=None, county_office_page=None
+                           ) -> None:
+    """Gets html page to parse. Uses page instead if it was already fetched.
+    Likewise county_office_page is used instead of requesting the county office.
+    """
+
+    PropertyPage.url_property = _set_url_property(url)
+    if page is None:
+        page = fetch_property_page(PropertyPage.url_property)
+    PropertyPage.page = page
+
+    # Creates beautiful soup object
+    with timer('parse_seconds', page='listing'):
+        PropertyPage.zillow = BeautifulSoup(page, 'html.parser')
+    PropertyPage.url_property_taxes = None
+    PropertyPage.county_office = None
+    PropertyPage.county_office_page = county_office_page
+
+
+def set_property_urls(url, url_property_taxes=None) -> None:
+    """Sets the urls of the property without a page.
+    Used when analyzing facts that were already scraped.
+    """
+
+    PropertyPage.url_property = url
+    PropertyPage.url_property_taxes = url_property_taxes
+
+
+def fetch_property_page(url) -> str:
+    """Gets the html of a zillow property page. Safe to call from threads.
+    Retries after backing off if zillow answers with a captcha or throttling.
+    """
 
     # Zillow has bot detection. This handles it.
     req_headers = {
@@ -36,13 +78,18 @@ def set_page_property_info(url=None) -> None:
                       ' (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36'
     }
     with requests.Session() as s:
-        PropertyPage.url_property = _set_url_property(url)
-        zillow_page = s.get(PropertyPage.url_property, headers=req_headers).text
-        PropertyPage.page = zillow_page
+        for _ in range(NUM_TIMES_TO_RETRY_REQUESTS):
+            response, signal = rate_limited_get(ZILLOW, s, url,
+                                                headers=req_headers)
+            if signal not in (CAPTCHA, THROTTLED):
+                break
 
-    # Creates beautiful soup object
-    PropertyPage.zillow = BeautifulSoup(zillow_page, 'html.parser')
-    PropertyPage.county_office = BeautifulSoup('', 'html.parser')
+    # A block page would replace the last good one when re-parsing.
+    if signal == CLEAN:
+        archive_page(LISTING, url, response.text,
+                     key=get_property_key_from_url(url))
+
+    return response.text
 
 
 def _set_url_property(url=None) -> str:
@@ -53,7 +100,8 @@ def _set_url_property(url=None) -> str:
     else:
         _url = input("Enter full URL for zillow property: ")
 
-        while _url[:27] != 'https://www.zillow.com/home' or len(_url) < 35:
+        while not _url.startswith(f"{ZILLOW_URL}/home") \
+                or len(_url) < len(ZILLOW_URL) + 13:
             _url = str(input("Enter full URL for zillow property: "))
         print("\n---   Gathering data for analysis...   ---\n")
 
@@ -64,12 +112,44 @@ def _set_url_property_taxes(house_number, street_name, city, state) -> None:
     """Set the county office URL based on the address from zillow"""
 
     PropertyPage.url_property_taxes = \
-        'https://www.countyoffice.org/property-records-search/?q='
+        f"{COUNTY_OFFICE_URL}/property-records-search/?q="
     PropertyPage.url_property_taxes += \
         f"{house_number}+{street_name}%2C+{city}%2C+{state}%2C+USA"
-    county_office_page = requests.get(PropertyPage.url_property_taxes).text
-    PropertyPage.county_office = \
-        BeautifulSoup(county_office_page, 'html.parser')
+    PropertyPage.county_office = None
+
+
+def _get_county_office() -> BeautifulSoup:
+    """Gets the county office page for the property.
+    Only requested when zillow doesn't have the property taxes.
+    """
+
+    if PropertyPage.url_property_taxes is None:
+        get_address()
+
+    if PropertyPage.county_office is None:
+        county_office_page = PropertyPage.county_office_page
+        if county_office_page is None:
+            county_office_page = '' if OFFLINE \
+                else _fetch_county_office_page()
+        with timer('parse_seconds', page='tax'):
+            PropertyPage.county_office = \
+                BeautifulSoup(county_office_page, 'html.parser')
+
+    return PropertyPage.county_office
+
+
+def _fetch_county_office_page() -> str:
+    """Requests the county office page and archives it, unless blocked"""
+
+    response, signal = rate_limited_get(
+        COUNTY_OFFICE, requests, PropertyPage.url_property_taxes
+    )
+    county_office_page = response.text
+    if signal == CLEAN:
+        archive_page(TAX, PropertyPage.url_property_taxes, county_office_page,
+                     key=get_property_key_from_url(PropertyPage.url_property))
+
+    return county_office_page
 
 
 def get_url(property_url=False, taxes_url=False) -> str:
@@ -83,6 +163,7 @@ def get_url(property_url=False, taxes_url=False) -> str:
         return PropertyPage.url_property
 
 
+@timed('extract_seconds')
 def get_address() -> str:
     """Get the address of the house from zillow."""
 
@@ -152,6 +233,7 @@ def get_address() -> str:
     return f"{house_number} {_street_name}, {_city}, {state} {zip_code}"
 
 
+@timed('extract_seconds')
 def get_price() -> int:
     """Get the price of the listing"""
 
@@ -161,6 +243,7 @@ def get_price() -> int:
     return price
 
 
+@timed('extract_seconds')
 def get_year() -> int:
     """Get the year of the listing"""
 
@@ -170,6 +253,7 @@ def get_year() -> int:
     return house_year
 
 
+@timed('extract_seconds')
 def get_sqft() -> int:
     """Get the sqft of the listing"""
 
@@ -186,6 +270,7 @@ def get_sqft() -> int:
     return sqft
 
 
+@timed('extract_seconds')
 def get_price_per_sqft() -> int:
     """Get the price per sqft of the listing"""
 
@@ -196,20 +281,11 @@ def get_price_per_sqft() -> int:
     return price_sqft
 
 
+@timed('extract_seconds')
 def get_lot_size() -> int:
     """Get the lot size of the listing"""
 
-    lot_size = 0
-    terms_to_try = ("sc-pbvYO hMYTdE", "sc-qQKeD bSwWwA")
-
-    for i in terms_to_try:
-        try:
-            lot_size = float(str(PropertyPage.zillow.find_all(
-                class_=i)[1].contents[2].span)
-                             .split('>')[-2].split('s')[0].replace('Acre', '')
-                             .strip().replace(',', ''))
-        except (IndexError, ValueError):
-            pass
+    lot_size = LOT_SIZE.run()[0] or 0
 
     # Lot size can be sqft or acres so this handles it. Always returns sqft.
     if lot_size > 100:
@@ -220,6 +296,16 @@ def get_lot_size() -> int:
     return lot_size
 
 
+def _get_lot_size_by_class(class_name) -> float:
+    """Lot size in the fact list with class_name, in sqft or acres"""
+
+    return float(str(PropertyPage.zillow.find_all(
+        class_=class_name)[1].contents[2].span)
+                 .split('>')[-2].split('s')[0].replace('Acre', '')
+                 .strip().replace(',', ''))
+
+
+@timed('extract_seconds')
 def get_parking() -> str:
     """Get parking of the listing"""
 
@@ -229,115 +315,149 @@ def get_parking() -> str:
     return parking
 
 
+@timed('extract_seconds')
 def get_description() -> tuple:
     """Get the description of listing"""
 
-    try:
-        description = PropertyPage.zillow.find(
-            class_="ds-overview-section").contents[0].contents[0].string
-        found_description = True
-    except AttributeError:
-        description = ""
-        found_description = False
+    description, found_description = DESCRIPTION.run()
+    return description or "", found_description
 
-    return description, found_description
 
+def _get_description_from_overview() -> str:
+    """Description from the overview section"""
+    return PropertyPage.zillow.find(
+        class_="ds-overview-section").contents[0].contents[0].string
 
+
+@timed('extract_seconds')
 def get_property_taxes() -> tuple:
     """Get property tax from zillow if it exist. Else use county_office.
     Must call get_address prior.
     """
 
-    property_taxes = 0
-    found_property_taxes = True
-    check_tax_records = False
+    property_taxes, found_property_taxes = PROPERTY_TAXES.run()
+    return property_taxes or 0, found_property_taxes
+
+
+def _get_property_taxes_from_zillow() -> int:
+    """Property taxes after the last '-->$' on the page, or the first if the
+    last isn't a number. Properties with HOA fees or price range in
+    additional details causes finding the wrong values with either one, so
+    the first is only a retry of the last and never tried on its own.
+    """
 
     temp = PropertyPage.page.rfind('-->$')
+    if temp == -1:
+        return None
+    try:
+        return _parse_zillow_property_taxes(temp)
+    except ValueError:
+        return _parse_zillow_property_taxes(PropertyPage.page.find('-->$'))
+
 
-    # Properties with HOA fees or price range in additional details
-    # causes finding the wrong values.
-    if temp > -1:
-        try:
-            property_taxes = int(PropertyPage.page[temp+4:temp+11].split('<')[0]
-                                 .replace(',', ''))
-        except ValueError:
-            temp = PropertyPage.page.find('-->$')
+def _parse_zillow_property_taxes(temp) -> int:
+    """Property taxes after the '-->$' at temp"""
+    return int(PropertyPage.page[temp + 4:temp + 11].split('<')[0]
+               .replace(',', ''))
+
+
+def _get_property_taxes_from_county_office() -> int:
+    """Property taxes from the county office, requesting it if needed"""
+
+    try:
+        return _parse_county_office_taxes()
+    except TypeError:
+        return None
+    except IndexError:
+        # Sometimes it fails to get the data but it exists.
+        # Retrying usually works
+        for _ in range(NUM_TIMES_TO_RETRY_REQUESTS):
+            time.sleep(TIME_BETWEEN_REQUESTS)
+            get_address()
             try:
-                property_taxes = int(PropertyPage.page[temp + 4:temp + 11]
-                                     .split('<')[0].replace(',', ''))
-            except ValueError:
-                check_tax_records = True
-
-    if check_tax_records:
-        try:
-            property_taxes = \
-                str(PropertyPage.county_office.find_all('tbody')[2]).split(
-                    '<td>$')[1].split('<')[0].replace(',', '')
-            property_taxes = int(property_taxes)
-        except TypeError:
-            found_property_taxes = False
-            property_taxes = 0
-        except IndexError:
-            # Sometimes it fails to get the data but it exists.
-            # Retrying usually works
-            for i in range(NUM_TIMES_TO_RETRY_REQUESTS):
-                time.sleep(TIME_BETWEEN_REQUESTS)
-                get_address()
-                try:
-                    property_taxes = str(
-                        PropertyPage.county_office.find_all('tbody')[2])\
-                        .split('<td>$')[1].split('<')[0].replace(',', '')
-                    property_taxes = int(property_taxes)
-                    break
-                except (TypeError, IndexError):
-                    pass
-                if i == NUM_TIMES_TO_RETRY_REQUESTS - 1:
-                    found_property_taxes = False
-                    property_taxes = 0
-
-    return property_taxes, found_property_taxes
+                return _parse_county_office_taxes()
+            except (TypeError, IndexError):
+                pass
+        return None
+
+
+def _parse_county_office_taxes() -> int:
+    """Property taxes in the tax table of the county office"""
+
+    return int(str(_get_county_office().find_all('tbody')[2])
+               .split('<td>$')[1].split('<')[0].replace(',', ''))
 
 
+@timed('extract_seconds')
 def get_num_units() -> tuple:
-    """Get number of units from zillow. Fall backs to full bathrooms."""
+    """Get number of units from zillow. Fall backs to full bathrooms,
+    which is only an estimate so it isn't found.
+    """
+
+    num_units, found_num_units = NUM_UNITS.run()
+    return num_units or 0, found_num_units
+
+
+def _get_num_units_from_house_type() -> int:
+    """Number of units from the type of the house, None if not multi family"""
 
     house_type = PropertyPage.zillow.find(
-        class_="ds-home-fact-list-item").contents[-1].string
-    found_num_units = True
-
-    if 'single' in house_type.lower():
-        num_units = 1
-    elif 'duplex' in house_type.lower():
-        num_units = 2
-    elif 'triplex' in house_type.lower():
-        num_units = 3
-    elif 'quadruplex' in house_type.lower():
-        num_units = 4
-    else:
-        found_num_units = False
-        temp = PropertyPage.page.find('Full bathrooms:')
+        class_="ds-home-fact-list-item").contents[-1].string.lower()
+
+    for name, num_units in (('single', 1), ('duplex', 2), ('triplex', 3),
+                            ('quadruplex', 4)):
+        if name in house_type:
+            return num_units
+    return None
 
-        if temp > -1:
-            num_units = int(PropertyPage.page[temp+24:temp+25])
-            num_units = num_units if num_units < 5 else 4
-        else:
-            num_units = 0
 
-    return num_units, found_num_units
+def _get_num_units_from_bathrooms() -> int:
+    """Estimates the number of units from the number of full bathrooms"""
 
+    temp = PropertyPage.page.find('Full bathrooms:')
+    if temp == -1:
+        return None
+    num_units = int(PropertyPage.page[temp+24:temp+25])
+    return num_units if num_units < 5 else 4
 
+
+@timed('extract_seconds')
 def get_rent_per_unit() -> tuple:
     """Get rent per unit from zillow. If it does not exist, returns 0."""
 
-    temp = PropertyPage.page.find('"pricePerSquareFoot\\":null')-7
-    found_rent_per_unit = True
+    rent_per_unit, found_rent_per_unit = RENT_PER_UNIT.run()
+    return rent_per_unit or 0, found_rent_per_unit
 
-    if temp > -1:
-        rent_per_unit = int(
-            PropertyPage.page[temp:temp+7].lstrip('"')
-            .lstrip(':').rstrip('\\').rstrip(','))
-    else:
-        found_rent_per_unit = False
-        rent_per_unit = 0
 
-    return rent_per_unit, found_rent_per_unit
+def _get_rent_per_unit_from_script() -> int:
+    """Rent estimate next to pricePerSquareFoot in the page's data script"""
+
+    temp = PropertyPage.page.find('"pricePerSquareFoot\\":null')-7
+    if temp < 0:
+        return None
+    return int(PropertyPage.page[temp:temp+7].lstrip('"')
+               .lstrip(':').rstrip('\\').rstrip(','))
+
+
+# Strategies of each field, see src/web/parser_health.py. The names are
+# stored in output/parser_health.json so renaming one resets its counts.
+DESCRIPTION = Chain('description', {
+    'overview_section': _get_description_from_overview
+})
+LOT_SIZE = Chain('lot_size', {
+    'class sc-pbvYO hMYTdE': lambda: _get_lot_size_by_class("sc-pbvYO hMYTdE"),
+    'class sc-qQKeD bSwWwA': lambda: _get_lot_size_by_class("sc-qQKeD bSwWwA")
+})
+PROPERTY_TAXES = Chain('property_taxes', {
+    'zillow': _get_property_taxes_from_zillow
+}, fallbacks={
+    'county_office': _get_property_taxes_from_county_office
+}, fallbacks_found=True)
+NUM_UNITS = Chain('num_units', {
+    'house_type': _get_num_units_from_house_type
+}, fallbacks={
+    'full_bathrooms': _get_num_units_from_bathrooms
+})
+RENT_PER_UNIT = Chain('rent_per_unit', {
+    'price_per_sqft_script': _get_rent_per_unit_from_script
+})
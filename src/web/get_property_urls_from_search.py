@@ -1,13 +1,21 @@
 """Web scrapes properties from zillow search URL."""
 
 import bs4.element
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.keys import Keys
+import re
 import requests
 import time
 from dataclasses import dataclass
 
+from src.data.archive import archive_page, SEARCH
+from src.metrics import timer, inc
+from src.web.property_keys import get_property_key_from_url
+from src.web.rate_control import rate_limited_get, is_error_page, ZILLOW, \
+    CLEAN, CAPTCHA, ERROR
+
 # Delay between actions for selenium driver
 SCROLL_DELAY = 0.05
 PAGE_LOAD_WAIT = 1
@@ -17,6 +25,26 @@ REDIRECT_WAIT = 10
 
 PROPERTIES_PER_PAGE = 40  # Number of properties zillow displays per search page
 
+# Runs inside the browser. Returns [href, price, status] for every listing card
+# in the result grid, skipping ads. Returns null if the grid isn't rendered.
+GRID_CARDS_SCRIPT = """
+const grid = document.getElementById('grid-search-results');
+const ul = grid ? grid.querySelector('ul') : null;
+if (!ul) { return null; }
+const cards = [];
+for (const li of ul.children) {
+    if (li.querySelector('#nav-ad-container')) { continue; }
+    const a = li.querySelector('a[href]');
+    if (!a) { continue; }
+    const price = li.querySelector('.list-card-price');
+    const status = li.querySelector('li.list-card-statusText');
+    cards.push([a.getAttribute('href'),
+                price ? price.textContent : '',
+                status ? status.textContent : '']);
+}
+return cards;
+"""
+
 
 @dataclass
 class SearchPage:
@@ -25,14 +53,34 @@ class SearchPage:
     chrome: webdriver.Chrome
     zillow: BeautifulSoup
     extra: int  # Sometimes urls have an extra '/' at the end.
+    listings: dict  # Property key: price of every card crawled.
+    complete: bool  # False if the crawl stopped early at known listings.
 
 
-def get_all_urls(url) -> list:
-    """Gets urls and prices for all properties on a zillow search page"""
+@dataclass
+class SearchCard:
+    """Lightweight record of a single listing card in the result grid"""
+    url: str
+    price: int
+    status: str
+
+    @property
+    def is_auction(self) -> bool:
+        """Checks if card is an auction"""
+        return 'auction' in self.status.lower()
+
+
+def get_all_urls(url, known=None) -> list:
+    """Gets urls and prices for all properties on a zillow search page.
+    If known (property key: price) is given, stops paginating once a full page
+    only has listings in known with an unchanged price.
+    """
 
     _url_has_extra_slash(url)
     current_page_num = _get_current_page(url)
     SearchPage.url_search = _set_url_to_first_page(url, current_page_num)
+    SearchPage.listings = {}
+    SearchPage.complete = True
     url = SearchPage.url_search
 
     _open_chrome(url)
@@ -53,20 +101,22 @@ def get_all_urls(url) -> list:
 
         _scroll_to_page_bottom()
 
-        _set_page_search()
-        base = SearchPage.zillow.find(
-            'div', id="grid-search-results").find('ul')
+        # Auctions are still recorded so they count as known listings.
+        cards = get_grid_cards()
+        for card in cards:
+            SearchPage.listings[get_property_key_from_url(card.url)] = \
+                card.price
+            if not card.is_auction:
+                property_urls.append(card.url)
 
-        for li in base.contents:
-            if li.find('div', id="nav-ad-container"):
-                continue
-            if _is_auction(li):
-                continue
-            property_urls.append(_get_property_url_from_search(li))
+        if known is not None and _is_page_known(cards, known) \
+                and page < num_pages:
+            SearchPage.complete = False
+            break
 
         if page < num_pages:
             url = _get_url_for_next_page(url, page)
-            SearchPage.chrome.get(url)
+            _get_search_page(url)
             curr_url = SearchPage.chrome.current_url
             if curr_url != url and 'captcha' not in curr_url.lower():
                 break
@@ -76,6 +126,16 @@ def get_all_urls(url) -> list:
     return property_urls
 
 
+def _is_page_known(cards, known) -> bool:
+    """Checks if every card on a full page is known with an unchanged price"""
+
+    if len(cards) < PROPERTIES_PER_PAGE:
+        return False
+
+    return all(known.get(get_property_key_from_url(card.url)) == card.price
+               for card in cards)
+
+
 def is_url_valid(url) -> bool:
     """Checks if URL was incorrectly inputted by looking for an error page.
     For both individual properties and search
@@ -93,12 +153,13 @@ def is_url_valid(url) -> bool:
                       ' (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36'
     }
     with requests.Session() as s:
-        zillow_page = s.get(url, headers=req_headers).text
+        zillow_page = rate_limited_get(ZILLOW, s, url,
+                                       headers=req_headers)[0].text
 
     # Creates beautiful soup object
     temp = BeautifulSoup(zillow_page, 'html.parser')
 
-    valid = False if temp.find(id="zillow-error-page") else True
+    valid = False if is_error_page(zillow_page) else True
 
     try:
         valid_2 = True if 'auction' not in \
@@ -114,15 +175,99 @@ def _open_chrome(url) -> None:
     """Opens chromedriver using selenium"""
 
     SearchPage.chrome = webdriver.Chrome()
-    SearchPage.chrome.get(url)
+    _get_search_page(url)
+
+
+def _get_search_page(url) -> None:
+    """Loads a search page once the rate controller allows it.
+    Landing on a captcha makes every request to zillow back off.
+    """
+
+    ZILLOW.acquire()
+    signal = ERROR
+    try:
+        with timer('fetch_seconds', site='zillow_search'):
+            SearchPage.chrome.get(url)
+        signal = CAPTCHA if 'captcha' in \
+            SearchPage.chrome.current_url.lower() else CLEAN
+    finally:
+        ZILLOW.release(signal)
+        inc('requests_total', site='zillow_search', signal=signal)
+
+    if signal == CLEAN:
+        archive_page(SEARCH, url, SearchPage.chrome.page_source,
+                     key=SearchPage.url_search)
 
 
 def _set_page_search() -> None:
-    """Opens chromedriver using selenium"""
+    """Parses the listing totals from the search page.
+    Only the 'total-text' elements are built, the rest of the page is skipped.
+    """
 
     # Creates beautiful soup object
     zillow_page = SearchPage.chrome.page_source
-    SearchPage.zillow = BeautifulSoup(zillow_page, 'html.parser')
+    SearchPage.zillow = BeautifulSoup(
+        zillow_page, 'html.parser',
+        parse_only=SoupStrainer(class_="total-text")
+    )
+
+
+def get_grid_cards() -> list:
+    """Gets the listing cards of the current search page as SearchCard.
+    Asks the browser for only the card data in one call. Falls back to
+    parsing just the grid subtree of the page source if that fails.
+    """
+
+    try:
+        rows = SearchPage.chrome.execute_script(GRID_CARDS_SCRIPT)
+    except WebDriverException:
+        rows = None
+
+    if rows is None:
+        return _get_grid_cards_from_source(SearchPage.chrome.page_source)
+
+    return [SearchCard(url=href, price=_parse_card_price(price),
+                       status=status)
+            for href, price, status in rows]
+
+
+def _get_grid_cards_from_source(page_source) -> list:
+    """Parses only the result grid of the page source into SearchCard"""
+
+    grid = BeautifulSoup(
+        page_source, 'html.parser',
+        parse_only=SoupStrainer('div', id="grid-search-results")
+    ).find('ul')
+    if grid is None:
+        return []
+
+    cards = []
+    for li in grid.find_all('li', recursive=False):
+        if li.find('div', id="nav-ad-container"):
+            continue
+        a = li.find('a', href=True)
+        if a is None:
+            continue
+        price = li.find('div', class_="list-card-price")
+        status = li.find('li', class_="list-card-statusText")
+        cards.append(SearchCard(
+            url=a['href'],
+            price=_parse_card_price(price.text if price else ''),
+            status=status.text if status else ''
+        ))
+
+    return cards
+
+
+def _parse_card_price(price) -> int:
+    """Converts the price text of a card to int. 0 if it has no price."""
+
+    match = re.search(r'\$([\d,]+(?:\.\d+)?)\s*([KM]?)', price.upper())
+    if not match:
+        return 0
+
+    multiplier = {'K': 1_000, 'M': 1_000_000}.get(match.group(2), 1)
+    return int(float(match.group(1).replace(',', '')) * multiplier)
 
 
 def _scroll_to_page_bottom() -> None:
@@ -261,26 +406,6 @@ def _get_url_for_next_page(url, current_page_num) -> str:
     return next_page_url
 
 
-def _is_auction(li: bs4.element.Tag) -> bool:
-    """Checks if house is an auction"""
-
-    try:
-        is_auction = False if 'auction' not in li.find(
-            'li', class_="list-card-statusText").text.lower() else True
-    except AttributeError:
-        is_auction = False
-
-    return is_auction
-
-
-def _get_property_url_from_search(li: bs4.element.Tag) -> str:
-    """Gets url for property from search url"""
-
-    property_url = li.find('a', href=True)['href']
-
-    return property_url
-
-
 # Currently not used. No reason to delete however.
 def _get_price_from_search(li: bs4.element.Tag) -> int:
     """Gets price for property from search url"""
@@ -0,0 +1,215 @@
+"""Fallback chains for the scraper and how well each of their strategies does.
+
+A field that can be found in more than one way is a Chain of strategies,
+functions that return the value or raise/return None when they miss. The
+strategy that last succeeded is tried first, so when zillow switches layout
+the chain settles on the new one after a single miss. Fallbacks, such as the
+county office for property taxes, are always tried last in their given order
+since they are slow or only estimate the value.
+
+Tries, successes and timings of every strategy, and whether each field was
+found or defaulted, are counted with src.metrics so parse pool workers send
+them back with their records. save_parser_health() adds the counts of a run
+to output/parser_health.json and print_parser_health() reports the coverage
+of every field, flagging those that dropped compared to previous runs.
+"""
+
+import json
+import os.path
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from src.data.colors_for_print import BAD, OK, GOOD, END
+from src.metrics import observe, inc, get_counters, get_histograms
+
+PARSER_HEALTH_FILE = os.path.join('output', 'parser_health.json')
+DEGRADED_DROP = 0.1  # Drop in coverage from previous runs that is flagged
+
+# Errors that mean a strategy didn't find its value on the page
+MISSES = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+
+@dataclass
+class ParserHealth:
+    """Chains by field and the order their strategies are tried in.
+    Orders start from PARSER_HEALTH_FILE and are kept per process.
+    """
+    chains = {}
+    orders = {}
+    saved_orders = None
+    lock = threading.Lock()
+
+
+@dataclass
+class Chain:
+    """Strategies that find the value of a field, by name"""
+    name: str
+    strategies: dict
+    fallbacks: dict = field(default_factory=dict)
+    fallbacks_found: bool = False  # Whether fallbacks find the real value
+
+    def __post_init__(self):
+        ParserHealth.chains[self.name] = self
+
+    def run(self) -> tuple:
+        """Tries the strategies, most recently successful first, then the
+        fallbacks. Returns the value and whether it was found, or
+        (None, False) if every strategy missed.
+        """
+
+        order = _get_order(self)
+        for name in order + list(self.fallbacks):
+            strategy = self.strategies.get(name) or self.fallbacks[name]
+            start = time.perf_counter()
+            try:
+                value = strategy()
+            except MISSES:
+                value = None
+            observe('strategy_seconds', time.perf_counter() - start,
+                    field=self.name, strategy=name)
+            inc('strategy_total', field=self.name, strategy=name,
+                result='miss' if value is None else 'success')
+            if value is None:
+                continue
+
+            found = name in self.strategies or self.fallbacks_found
+            if name in self.strategies and order[0] != name:
+                with ParserHealth.lock:
+                    order.remove(name)
+                    order.insert(0, name)
+            inc('fields_total', field=self.name,
+                result='found' if found else 'defaulted')
+            return value, found
+
+        inc('fields_total', field=self.name, result='defaulted')
+        return None, False
+
+
+def load_parser_health() -> dict:
+    """Contents of PARSER_HEALTH_FILE"""
+
+    try:
+        with open(PARSER_HEALTH_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'fields': {}}
+
+
+def save_parser_health() -> dict:
+    """Adds the counts of this run to PARSER_HEALTH_FILE and stores the
+    order of every chain. Strategies that succeeded most this run go first.
+    Returns the updated contents.
+    """
+
+    health = load_parser_health()
+    tries = get_counters('strategy_total')
+    seconds = get_histograms('strategy_seconds')
+    fields = get_counters('fields_total')
+
+    for name, chain in ParserHealth.chains.items():
+        record = health['fields'].setdefault(name, {
+            'order': [], 'found': 0, 'defaulted': 0, 'strategies': {}})
+        found = fields.get((('field', name), ('result', 'found')), 0)
+        defaulted = fields.get((('field', name), ('result', 'defaulted')), 0)
+        if not found + defaulted:
+            continue
+
+        record['found'] += found
+        record['defaulted'] += defaulted
+        record['last_run'] = {'found': found, 'defaulted': defaulted}
+
+        run_successes = {}
+        for strategy in list(chain.strategies) + list(chain.fallbacks):
+            successes = tries.get((('field', name), ('result', 'success'),
+                                   ('strategy', strategy)), 0)
+            misses = tries.get((('field', name), ('result', 'miss'),
+                                ('strategy', strategy)), 0)
+            total_seconds = seconds.get((('field', name),
+                                         ('strategy', strategy)), (0, 0))[0]
+            stats = record['strategies'].setdefault(
+                strategy, {'tried': 0, 'succeeded': 0, 'seconds': 0})
+            stats['tried'] += successes + misses
+            stats['succeeded'] += successes
+            stats['seconds'] = round(stats['seconds'] + total_seconds, 6)
+            if successes:
+                stats['last_success'] = datetime.now().isoformat(
+                    timespec='seconds')
+            run_successes[strategy] = successes
+
+        previous = _get_saved_order(chain, record['order'])
+        record['order'] = sorted(
+            previous, key=lambda strategy: -run_successes[strategy])
+
+    health['updated'] = datetime.now().isoformat(timespec='seconds')
+    temp_path = f"{PARSER_HEALTH_FILE}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(health, file, indent=4)
+    os.replace(temp_path, PARSER_HEALTH_FILE)
+
+    return health
+
+
+def print_parser_health(health=None) -> None:
+    """Prints the coverage of every field in the last run and overall"""
+
+    if health is None:
+        health = load_parser_health()
+    if not health['fields']:
+        return
+
+    print(f"\n{OK}--- Parser health (found / analyzed):{END}")
+    print(f"{'field':<18} {'last run':>16} {'all runs':>16}  strategies")
+    for name, record in health['fields'].items():
+        last_run = record.get('last_run', {'found': 0, 'defaulted': 0})
+        coverage = _get_coverage(last_run)
+        overall = _get_coverage(record)
+        # Compares to the runs before the last one.
+        previous = _get_coverage({
+            'found': record['found'] - last_run['found'],
+            'defaulted': record['defaulted'] - last_run['defaulted']})
+        color = BAD if previous is not None and coverage is not None \
+            and coverage < previous - DEGRADED_DROP else GOOD
+
+        strategies = ', '.join(
+            f"{strategy} {stats['succeeded']}/{stats['tried']}"
+            for strategy, stats in record['strategies'].items())
+        print(f"{name:<18} {color}{_format_coverage(coverage):>16}{END} "
+              f"{_format_coverage(overall):>16}  {strategies}")
+
+
+def _get_order(chain) -> list:
+    """Order the strategies of chain are tried in by this process"""
+
+    order = ParserHealth.orders.get(chain.name)
+    if order is None:
+        with ParserHealth.lock:
+            if ParserHealth.saved_orders is None:
+                ParserHealth.saved_orders = {
+                    name: record['order'] for name, record
+                    in load_parser_health()['fields'].items()}
+            order = ParserHealth.orders[chain.name] = _get_saved_order(
+                chain, ParserHealth.saved_orders.get(chain.name, []))
+
+    return order
+
+
+def _get_saved_order(chain, saved) -> list:
+    """Saved order of the strategies still in chain, then any new ones"""
+
+    order = [strategy for strategy in saved if strategy in chain.strategies]
+    return order + [strategy for strategy in chain.strategies
+                    if strategy not in order]
+
+
+def _get_coverage(counts):
+    """Fraction found, None if nothing was analyzed"""
+
+    total = counts['found'] + counts['defaulted']
+    return counts['found'] / total if total else None
+
+
+def _format_coverage(coverage) -> str:
+    """97.5% or - if unknown"""
+    return '-' if coverage is None else f"{coverage:.1%}"
@@ -0,0 +1,63 @@
+"""Maps zillow property URLs to the key used to identify the property.
+The same listing can show up with different slugs, query strings or without
+the trailing '/', those all map to the same zpid based key.
+
+Keys used to be the second to last part of the URL, which for a URL without
+the trailing '/' is the slug rather than the zpid. migrate_legacy_keys()
+moves entries stored under those keys.
+"""
+
+from urllib.parse import urlsplit
+
+
+def get_property_key_from_url(url) -> str:
+    """Get key used to hash different properties from its url"""
+
+    segments = [segment for segment in urlsplit(url).path.split('/')
+                if segment]
+
+    # Zillow ids end in '_zpid'. Falls back to the last part of the path.
+    zpid = segments[-1] if segments else ''
+    for segment in segments:
+        if segment.endswith('_zpid'):
+            zpid = segment
+
+    return f"https://www.zillow.com/homedetails/{zpid}/"
+
+
+def get_legacy_property_key(url) -> str:
+    """Key the property of url had before get_property_key_from_url()"""
+    return f"https://www.zillow.com/homedetails/{url.split('/')[-2]}/"
+
+
+def migrate_legacy_keys(store, urls) -> int:
+    """Moves entries of store, such as analysis.json, from the legacy key of
+    a url in urls to its key, unless that key has one already. Returns how
+    many were moved.
+    """
+
+    moved = 0
+    for url in urls:
+        legacy_key = get_legacy_property_key(url)
+        key = get_property_key_from_url(url)
+        if legacy_key != key and legacy_key in store and key not in store:
+            store[key] = store.pop(legacy_key)
+            moved += 1
+
+    return moved
+
+
+def coalesce_urls(urls) -> tuple:
+    """Removes urls of properties already in urls, keeping the first url.
+    Returns the remaining urls in order and how many were removed.
+    """
+
+    keys = set()
+    unique_urls = []
+    for url in urls:
+        key = get_property_key_from_url(url)
+        if key not in keys:
+            keys.add(key)
+            unique_urls.append(url)
+
+    return unique_urls, len(urls) - len(unique_urls)
@@ -1,33 +1,156 @@
-"""Email self whenever program finds a good deal"""
+"""Email self whenever program finds a good deal.
+Deals already emailed are only emailed again if they changed, see
+src/data/alert_state.py.
+"""
 
 import json
 import os
 import smtplib
 import ssl
+from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
+from src.data.alert_state import load_alert_state, save_alert_state, \
+    get_alerts, mark_alerted
 from src.data.colors_for_print import BAD, OK, GOOD, GREAT, END
+from src.data.deal_index import load_deal_index, build_deal_index, \
+    save_deal_index, get_best_deals
+from src.metrics import timer, timed
+from src.web.digest import build_digest
+from src.web.endpoints import SMTP_HOST, SMTP_PORT
+from src.web.property_keys import get_property_key_from_url
 from values import MINIMUM_ConC_PERCENT
 
+SMTP_SSL_PORT = 465
+# Hosts the password may be sent to without TLS, such as the local sink of
+# src/standin/smtp_sink.py
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+DIGEST_PER_SEARCH = False  # An email per saved search instead of a single one
+
+
+@dataclass
+class Mailer:
+    """Connection to the mail server, opened on the first message and kept
+    for the next ones. Reconnects once if the server dropped it.
+    """
+    sender: str
+    password: str
+    server: smtplib.SMTP = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, message) -> None:
+        """Sends an EmailMessage"""
+
+        try:
+            self._get_server().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self.server.close()
+            self.server = None
+            self._get_server().send_message(message)
+
+    def close(self) -> None:
+        """Ends the session"""
+
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPServerDisconnected:
+                pass
+            self.server = None
+
+    def _get_server(self) -> smtplib.SMTP:
+        """The open connection, logged in. Other than on SMTP_SSL_PORT, the
+        connection is upgraded with STARTTLS, which only LOCAL_HOSTS may
+        lack.
+        """
+
+        if self.server is None:
+            if SMTP_PORT == SMTP_SSL_PORT:
+                self.server = smtplib.SMTP_SSL(
+                    SMTP_HOST, SMTP_PORT,
+                    context=ssl.create_default_context())
+            else:
+                self.server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+                self.server.ehlo()
+                if self.server.has_extn('starttls'):
+                    self.server.starttls(
+                        context=ssl.create_default_context())
+                    self.server.ehlo()
+                elif SMTP_HOST not in LOCAL_HOSTS:
+                    self.server.close()
+                    self.server = None
+                    raise smtplib.SMTPNotSupportedError(
+                        f"{SMTP_HOST} doesn't support STARTTLS, the "
+                        f"password isn't sent unencrypted.")
+            self.server.login(self.sender, self.password)
+        return self.server
+
 
 def email_best_deals() -> None:
     """Function to call to email best deals"""
 
-    analysis_json = _get_analyses_from_json()
-
-    # If analysis_json is empty, there is no analyses
-    if not analysis_json:
-        print(f"{BAD}\n!!!   No email sent. Ending program...   !!!{END}")
+    with timer('email_seconds', step='find'):
+        alert_state = load_alert_state()
+        alerts = get_alerts(_get_deal_index(), alert_state)
+
+    # Nothing analyzed, nothing good enough or nothing changed since the
+    # last email
+    if not alerts:
+        save_alert_state(alert_state)
+        print(f"{BAD}\n!!!   No new or improved deals above "
+              f"{MINIMUM_ConC_PERCENT}% ConC. "
+              f"No email sent. Ending program...   !!!{END}")
         return
 
-    print(f"{GOOD}\n!!!   Emailing best deals!   !!!{END}")
-
-    best_deal, best_deals = _find_best_deals(analysis_json)
-    message = _construct_message(analysis_json, best_deal, best_deals)
-    _send_email(message)
+    print(f"{GOOD}\n!!!   Emailing {len(alerts)} new or improved deals!   "
+          f"!!!{END}")
+
+    digests = _group_by_search(alerts) if DIGEST_PER_SEARCH \
+        else [(None, alerts)]
+    send_digests(digests, alert_state)
+    save_alert_state(alert_state)
+
+
+def send_digests(digests, alert_state) -> int:
+    """Sends every (title, alerts) digest over a single connection and marks
+    the alerts of those sent. Returns how many were sent. Unsent alerts are
+    tried again next run.
+    """
+
+    sender, password = _get_credentials()
+    if sender is None:
+        return 0
+
+    sent = 0
+    with Mailer(sender, password) as mailer:
+        for title, alerts in digests:
+            with timer('email_seconds', step='construct'):
+                message = build_digest(alerts, sender, sender, title)
+            try:
+                with timer('email_seconds', step='send'):
+                    mailer.send(message)
+            except (smtplib.SMTPException, OSError) as exception:
+                print(f"\n{BAD}!!!   Error sending email: {exception}   "
+                      f"!!!{END}")
+                break
+            mark_alerted(alert_state, alerts)
+            sent += 1
+
+    if sent:
+        print(f"\n{GREAT}"
+              f"!!!   {sent} email{'s' if sent != 1 else ''} successfully "
+              f"sent! Ending program...   !!!{END}"
+              )
+    return sent
 
 
+@timed('persist_seconds', store='analysis.json', operation='load')
 def _get_analyses_from_json() -> dict:
     """Opens analysis.json and stores value in dict."""
 
@@ -41,86 +164,57 @@ def _get_analyses_from_json() -> dict:
     return analysis_json
 
 
-def _get_deal_value(analysis_json, deal) -> float:
-    """Gets the value of a property"""
-
-    return float(
-        analysis_json[deal]['Analysis']['Cash on Cash Return']
-            .lstrip('$').rstrip('%')
-    )
-
-
-def _find_best_deals(analysis_json) -> tuple:
-    """Finds the best deal out of the analysis"""
-
-    best_deals = []
+def _get_deal_index() -> dict:
+    """Reads the deal index, analysis.json is only loaded if the index has
+    to be rebuilt
+    """
 
-    for deal in analysis_json:
-        if _get_deal_value(analysis_json, deal) > MINIMUM_ConC_PERCENT:
-            best_deals.append(deal)
+    deal_index = load_deal_index()
+    if deal_index is None:
+        deal_index = build_deal_index(_get_analyses_from_json())
+        save_deal_index(deal_index)
 
-    best_deals.sort(key=lambda x: _get_deal_value(analysis_json, x),
-                    reverse=True
-                    )
-    best_deal = best_deals[0]
+    return deal_index
 
-    return best_deal, best_deals
 
+def _find_best_deals(max_deals=None) -> list:
+    """(key, Cash on Cash Return, analysis) of the deals above
+    MINIMUM_ConC_PERCENT, best first
+    """
+    return get_best_deals(_get_deal_index(), max_deals)
 
-def _construct_message(analysis_json, best_deal, best_deals) -> str:
-    """Constructs the message with the subject line to email"""
 
-    best_property = analysis_json[best_deal]
+def _group_by_search(alerts) -> list:
+    """(title, alerts) of every saved search in urls.json with alerts.
+    Individually added properties are in a digest of their own.
+    """
 
-    # For each estimation in analysis, add an asterisk to subject line
-    est = ''
-    for _ in analysis_json[best_deal]['Estimations']:
-        est += '*'
-
-    subject_line = f"Subject: Real Estate Bot - " \
-                   f"{_get_deal_value(analysis_json, best_deal)}" \
-                   f"%{est} ConC Return" \
-                   f" @ ${best_property['Property Info']['Price ($)']:,}! " \
-                   f"(Total: {len(best_deals)})"
-
-    # Body of message filled according to find_best_deals()
-    deals = "ORDERED FROM BEST TO WORST - " \
-            "THIS DOES NOT CONTAIN ALL THE PROPERTY ANALYSES, " \
-            "JUST THE BEST ONES:\n\n" \
-            f"{'-' * 196}\n"
-    for deal in best_deals:
-
-        info = analysis_json[deal]['Property Info']
-
-        # 'https://' Doesn't get sent in email so slicing to zillow.
-        deals += f"Property: {analysis_json[deal]['Property URL'][12:]}\n"
+    try:
+        with open(os.path.join('output', 'urls.json')) as json_file:
+            urls_json = json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        urls_json = {}
 
-        deals += f'    Property Info: {{\n' \
-                 f'        "Price": ${info["Price ($)"]:,}\n' \
-                 f'        "Units": {info["Units"]:,}\n' \
-                 f'        "Rent": ${info["Rent Per Unit ($)"]:,}\n}}\n' \
-                 f'    Analysis: ' \
-                 f'{json.dumps(analysis_json[deal]["Analysis"], indent=8)}\n' \
-                 f'    Estimations: ' \
-                 f'{json.dumps(analysis_json[deal]["Estimations"], indent=8)}' \
-                 f'\n' \
-                 f'{"-" * 196}\n'
+    searches = {}  # Property key: search url
+    for search_url, urls in urls_json.get('Search', {}).items():
+        for url in urls:
+            searches.setdefault(get_property_key_from_url(url), search_url)
 
-    # Entire message with subject line and body to send
-    message = f"{subject_line}\n\n" \
-              f"{deals}"
+    digests = {}
+    for alert in alerts:
+        title = searches.get(alert.key, 'Saved properties')
+        digests.setdefault(title, []).append(alert)
 
-    return message
+    return list(digests.items())
 
 
-def _send_email(message) -> None:
-    """Sends the email with relevant analyses."""
+def _get_credentials() -> tuple:
+    """Email and password from the .env file, (None, None) if missing"""
 
     # Load credentials for email login from local environmental variable .env
     load_dotenv()
     sender = os.getenv('REAL_ESTATE_CALCULATOR_BOT_EMAIL')
     password = os.getenv('REAL_ESTATE_CALCULATOR_BOT_PASSWORD')
-    receiver = sender
 
     # Handles if .env file is missing
     if not sender or not password:
@@ -128,15 +222,6 @@ def _send_email(message) -> None:
         print(f"{OK}This is likely due to missing .env file. "
               f"Follow instructions for emailing on github.{END}"
               )
-        return
-
-    # Send email
-    PORT = 465
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL("smtp.gmail.com", PORT, context=context) as server:
-        server.login(sender, password)
-        server.sendmail(sender, receiver, message)
+        return None, None
 
-    print(f"\n{GREAT}"
-          f"!!!   Email successfully sent! Ending program...   !!!{END}"
-          )
+    return sender, password
@@ -0,0 +1,158 @@
+"""Adapts how many requests are sent to a site at once.
+
+Additive increase, multiplicative decrease: after a round of clean responses
+one more request may run at once. A captcha, 403/429 or error page halves
+that number and pauses every request for a backoff that doubles while the
+site keeps pushing back. The effective request rate is logged to
+output/request_rate.log so the limits can be tuned. Controllers are per
+process, they don't coordinate across parse pool workers.
+"""
+
+import os.path
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from src.metrics import observe, inc
+from src.profiling import record_slow
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+START_CONCURRENCY = 2
+DECREASE_FACTOR = 0.5
+BACKOFF_SECONDS = 5  # First pause after being throttled
+MAX_BACKOFF_SECONDS = 300
+RATE_LOG_INTERVAL = 30  # Seconds between lines in request_rate.log
+
+# Signals from classify_response()
+CLEAN, CAPTCHA, THROTTLED, ERROR = 'clean', 'captcha', 'throttled', 'error'
+BACK_OFF_SIGNALS = {CAPTCHA, THROTTLED, ERROR}
+
+# Same check is_url_valid() does, without building a soup.
+ERROR_PAGE = re.compile(r'id=["\']?zillow-error-page')
+
+
+@dataclass
+class RateController:
+    """Limits requests to a site at once using AIMD"""
+    name: str
+    limit: float = START_CONCURRENCY
+    active: int = 0
+    clean_streak: int = 0
+    backoff: float = BACKOFF_SECONDS
+    resume_at: float = 0  # No request starts before this time.monotonic()
+    completed: int = 0
+    backed_off: int = 0
+    logged_at: float = field(default_factory=time.monotonic)
+    logged_completed: int = 0
+    condition: threading.Condition = field(default_factory=threading.Condition,
+                                           repr=False)
+
+    def acquire(self) -> None:
+        """Blocks until a request may start"""
+
+        with self.condition:
+            while True:
+                pause = self.resume_at - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.active >= int(self.limit):
+                    self.condition.wait()
+                else:
+                    break
+            self.active += 1
+
+    def release(self, signal) -> None:
+        """Records how a request started by acquire() went"""
+
+        with self.condition:
+            self.active -= 1
+            self.completed += 1
+            now = time.monotonic()
+
+            if signal in BACK_OFF_SIGNALS:
+                self.backed_off += 1
+                self.clean_streak = 0
+                # Requests that were already running when the first one got
+                # pushed back shouldn't decrease the limit again.
+                if now >= self.resume_at:
+                    self.limit = max(MIN_CONCURRENCY,
+                                     self.limit * DECREASE_FACTOR)
+                    self.resume_at = now + self.backoff
+                    self.backoff = min(self.backoff * 2, MAX_BACKOFF_SECONDS)
+            else:
+                self.clean_streak += 1
+                self.backoff = BACKOFF_SECONDS
+                if self.clean_streak >= int(self.limit):
+                    self.limit = min(MAX_CONCURRENCY, int(self.limit) + 1)
+                    self.clean_streak = 0
+
+            if now - self.logged_at >= RATE_LOG_INTERVAL:
+                self._log_rate(now)
+            self.condition.notify_all()
+
+    def rate(self) -> float:
+        """Requests per second since the last log line"""
+
+        elapsed = time.monotonic() - self.logged_at
+        return (self.completed - self.logged_completed) / elapsed \
+            if elapsed > 0 else 0
+
+    def _log_rate(self, now) -> None:
+        """Appends the effective request rate to output/request_rate.log"""
+
+        line = f"{datetime.now().isoformat(timespec='seconds')} " \
+               f"{self.name}: {self.rate():.2f} requests/s, " \
+               f"limit {int(self.limit)}, completed {self.completed}, " \
+               f"backed off {self.backed_off}\n"
+        with open(os.path.join('output', 'request_rate.log'), 'a') as file:
+            file.write(line)
+
+        self.logged_at = now
+        self.logged_completed = self.completed
+
+
+def classify_response(response) -> str:
+    """Tells if the site is pushing back on the request"""
+
+    if 'captcha' in response.url.lower():
+        return CAPTCHA
+    if response.status_code in (403, 429):
+        return THROTTLED
+    if response.status_code >= 500 or is_error_page(response.text):
+        return ERROR
+    return CLEAN
+
+
+def is_error_page(page) -> bool:
+    """Checks if the page is zillow's error page"""
+    return ERROR_PAGE.search(page) is not None
+
+
+def rate_limited_get(controller, session, url, **kwargs) -> tuple:
+    """Sends a get request once the controller allows it.
+    Returns the response and its signal from classify_response().
+    """
+
+    controller.acquire()
+    signal = ERROR  # Connection errors count as being pushed back.
+    start = time.perf_counter()
+    try:
+        response = session.get(url, **kwargs)
+        signal = classify_response(response)
+        return response, signal
+    finally:
+        seconds = time.perf_counter() - start
+        controller.release(signal)
+        observe('fetch_seconds', seconds, site=controller.name)
+        inc('requests_total', site=controller.name, signal=signal)
+        record_slow(controller.name, url, seconds, signal)
+
+
+# Shared by everything in a process that requests zillow, including the
+# search crawler. Each process has its own: the county office is requested
+# by the parse pool workers, so its limit applies to each worker, not the run.
+ZILLOW = RateController('zillow')
+COUNTY_OFFICE = RateController('countyoffice', limit=1)
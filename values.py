@@ -1,7 +1,7 @@
 """DEFAULT VALUES USED FOR ANALYSIS. CHANGE THESE VALUES ACCORDING TO YOUR HEURISTICS. TOUCH NOTHING ELSE."""
 
 '''If you want to change the criteria for a 'good deal' that it emails, that would be changed in
-/web/push_best_deals_to_email.py with the functions _get_deal_value() and _find_best_deals().
+/data/deal_index.py with the functions get_deal_score() and _index_analysis().
 Currently it just emails any property with a Cash On Cash Return greater than 12%. That is universally considered
 a 'good deal'. You may increase or decrease the percentage by changing MINIMUM_ConC_PERCENT from 12. Different areas
 may have too many deals above 12% or too little.
@@ -26,8 +26,10 @@ RENT_PER_UNIT_QUADRUPLEX = 575
 VACANCY_PERCENT = 0.08
 MAINTENANCE_PERCENT = 0.15
 MANAGEMENT_PERCENT = 0.10
-DEPRECIATION_SHORT_PERCENT = 0.08
-DEPRECIATION_LONG_PERCENT = 0.75
+DEPRECIATION_SHORT_PERCENT = 0.08  # 5-year class. Fractions of price and fix up cost, from cost segregation.
+DEPRECIATION_MEDIUM_PERCENT = 0.0  # 15-year class, land improvements.
+DEPRECIATION_LONG_PERCENT = 0.75  # 27.5-year class, the building. The rest is land.
+PLACED_IN_SERVICE_MONTH = 1  # 1 to 12. Depreciation starts mid-month.
 TAX_BRACKET = 0.24
 IS_FIRST_RENTAL = True  # If 'False', halves emergency fund recommendation.
 
@@ -47,7 +49,9 @@ IS_FIRST_RENTAL = True  # If 'False', halves emergency fund recommendation.
 # VACANCY_PERCENT = 0.08
 # MAINTENANCE_PERCENT = 0.15
 # MANAGEMENT_PERCENT = 0.10
-# DEPRECIATION_SHORT_PERCENT = 0.08
-# DEPRECIATION_LONG_PERCENT = 0.75
+# DEPRECIATION_SHORT_PERCENT = 0.08  # 5-year class. Fractions of price and fix up cost, from cost segregation.
+# DEPRECIATION_MEDIUM_PERCENT = 0.0  # 15-year class, land improvements.
+# DEPRECIATION_LONG_PERCENT = 0.75  # 27.5-year class, the building. The rest is land.
+# PLACED_IN_SERVICE_MONTH = 1  # 1 to 12. Depreciation starts mid-month.
 # TAX_BRACKET = 0.24
 # IS_FIRST_RENTAL = True  # If 'False', halves emergency fund recommendation.